@@ -0,0 +1,94 @@
+import json
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.tools import StructuredTool
+
+from agents.outputs import get_output_json_schema, validate_output
+from metrics import metrics
+
+FINAL_ANSWER_TOOL = "final_answer"
+
+
+def make_final_answer_tool(schema_class: type) -> StructuredTool:
+    """
+    Typed final-answer tool for a ReAct agent.
+
+    Its arguments are the JSON schema of ``schema_class``, so the agent's last
+    tool call already carries the structured result and no separate
+    structurer pass is needed. ``return_direct`` ends the ReAct loop on it.
+    """
+
+    def submit(**kwargs: Any) -> str:
+        return json.dumps(kwargs)
+
+    async def asubmit(**kwargs: Any) -> str:
+        return submit(**kwargs)
+
+    return StructuredTool(
+        name=FINAL_ANSWER_TOOL,
+        description=(
+            f"Submit your final answer as a {schema_class.__name__}. Call this exactly "
+            "once, as your last action, with the complete structured result."
+        ),
+        args_schema=get_output_json_schema(schema_class),
+        func=submit,
+        coroutine=asubmit,
+        return_direct=True,
+    )
+
+
+def extract_final_answer(messages: list[BaseMessage], schema_class: type) -> Optional[dict]:
+    """Return the validated final_answer arguments, or None if absent or invalid."""
+    for message in reversed(messages):
+        for call in getattr(message, "tool_calls", None) or []:
+            if call.get("name") != FINAL_ANSWER_TOOL:
+                continue
+            try:
+                result = validate_output(schema_class, call.get("args", {}))
+            except Exception as e:
+                print(f"[single-pass] invalid {schema_class.__name__} final answer: {e}")
+                metrics.incr("single_pass.fallbacks")
+                return None
+            metrics.incr("single_pass.hits")
+            return result
+
+    print(f"[single-pass] no final_answer call for {schema_class.__name__}")
+    metrics.incr("single_pass.fallbacks")
+    return None
+
+
+def final_answer_text(messages: list[BaseMessage]) -> str:
+    """Free text handed to the structurer when the typed final answer is unusable."""
+    parts = []
+    for message in messages:
+        if not isinstance(message, AIMessage):
+            continue
+        if message.content:
+            parts.append(str(message.content))
+        for call in message.tool_calls or []:
+            if call.get("name") == FINAL_ANSWER_TOOL:
+                parts.append(json.dumps(call.get("args", {})))
+    return "\n\n".join(parts[-2:])
+
+
+def final_answer_message(messages: list[BaseMessage]) -> BaseMessage:
+    """
+    The agent's last turn as a plain AIMessage for the shared history.
+
+    The trailing final_answer ToolMessage cannot go there: without the
+    AIMessage that made the call it is an orphan tool result. The call's
+    arguments become the message content instead.
+    """
+    for message in reversed(messages):
+        if not isinstance(message, AIMessage):
+            continue
+        if not message.tool_calls:
+            return message
+        answers = [
+            json.dumps(call.get("args", {}))
+            for call in message.tool_calls
+            if call.get("name") == FINAL_ANSWER_TOOL
+        ]
+        return AIMessage(content="\n\n".join(answers) or message.content, name=message.name)
+    return AIMessage(content=str(messages[-1].content) if messages else "")
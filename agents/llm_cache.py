@@ -0,0 +1,167 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable
+
+from metrics import metrics
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of parsed structured LLM responses.
+
+    Entries are keyed on (model, options, full prompt, schema name) and stored
+    in SQLite so re-runs and replays of a campaign skip every call whose inputs
+    have not changed. Identical calls that are in flight at the same time are
+    coalesced into a single request.
+    """
+
+    def __init__(
+        self,
+        path: str = ".llm_cache.db",
+        max_entries: int = 5000,
+        max_age_seconds: float = 7 * 24 * 3600,
+        enabled: bool = True,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self._conn: sqlite3.Connection | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._puts = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    schema_name TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, options: dict, prompt: str, schema_name: str) -> str:
+        raw = json.dumps(
+            {"model": model, "options": options, "prompt": prompt, "schema": schema_name},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any | None:
+        row = self.conn.execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        response, created_at = row
+        now = time.time()
+        if now - created_at > self.max_age_seconds:
+            self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.conn.commit()
+            return None
+
+        self.conn.execute(
+            "UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+        )
+        self.conn.commit()
+        return json.loads(response)
+
+    def put(self, key: str, model: str, schema_name: str, value: Any) -> None:
+        now = time.time()
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO llm_cache
+                (key, model, schema_name, response, created_at, last_used, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+            """,
+            (key, model, schema_name, json.dumps(value), now, now),
+        )
+        self.conn.commit()
+        self._puts += 1
+        if self._puts % 50 == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones over max_entries."""
+        cutoff = time.time() - self.max_age_seconds
+        removed = self.conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (cutoff,)
+        ).rowcount
+        count = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            removed += self.conn.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (count - self.max_entries,),
+            ).rowcount
+        self.conn.commit()
+        if removed:
+            metrics.incr("llm_cache.evicted", removed)
+        return removed
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM llm_cache")
+        self.conn.commit()
+
+    async def get_or_compute(
+        self,
+        key: str,
+        model: str,
+        schema_name: str,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if not self.enabled:
+            return await compute()
+
+        cached = self.get(key)
+        if cached is not None:
+            metrics.incr("llm_cache.hits")
+            print(f"[llm_cache] hit for {schema_name} ({key[:12]})")
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.incr("llm_cache.coalesced")
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        metrics.incr("llm_cache.misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            self.put(key, model, schema_name, value)
+            future.set_result(copy.deepcopy(value))
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+llm_cache = LLMResponseCache(
+    path=os.environ.get("LLM_CACHE_PATH", ".llm_cache.db"),
+    enabled=os.environ.get("LLM_CACHE", "on").lower() not in ("0", "off", "false"),
+)
@@ -0,0 +1,101 @@
+import time
+from typing import Any, AsyncIterator, Mapping, Optional
+
+import httpx
+from langchain_core.messages import BaseMessage
+from langchain_ollama.chat_models import ChatOllama
+
+from agents.llm_pool import llm_pool
+from campaign_clock import mark_llm_token
+from limits import limits
+from metrics import metrics
+from replay import recorder
+from tracing import tracer
+
+
+class ManagedChatOllama(ChatOllama):
+    """
+    ChatOllama whose async requests go through the process-wide LLM
+    concurrency cap, so concurrent campaigns queue for the model instead of
+    overloading it, and are routed across the Ollama endpoint pool.
+
+    Passing an explicit ``base_url`` pins the model to that server and skips
+    the pool. The time to the first streamed chunk of every request is
+    recorded as llm.time_to_first_token, and every request is traced as an
+    "llm" span with its endpoint, token counts and failovers. Requests go
+    through the traffic recorder, so a replayed run never reaches Ollama.
+    """
+
+    async def _acreate_chat_stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Mapping[str, Any] | str]:
+        first = True
+        start = time.perf_counter()
+        # Not made current: the span would leak to the consumer between yields.
+        span = tracer.start_span("llm", self.model, messages=len(messages))
+        error = None
+        try:
+            parts = recorder.llm(
+                self._chat_params(messages, stop, **kwargs),
+                lambda: self._routed_chat_stream(span, messages, stop, **kwargs),
+            )
+            async for part in parts:
+                if first:
+                    first = False
+                    ttft = time.perf_counter() - start
+                    metrics.observe("llm.time_to_first_token", ttft)
+                    span.set(ttft=ttft)
+                    mark_llm_token()
+                if getattr(part, "done", False):
+                    span.set(
+                        prompt_tokens=part.get("prompt_eval_count"),
+                        completion_tokens=part.get("eval_count"),
+                    )
+                yield part
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            span.end(error)
+
+    async def _routed_chat_stream(
+        self,
+        span,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Mapping[str, Any] | str]:
+        queued_at = time.perf_counter()
+        async with limits.llm:
+            span.set(queued=time.perf_counter() - queued_at)
+            if self.base_url:
+                span.set(endpoint=self.base_url)
+                async for part in super()._acreate_chat_stream(messages, stop, **kwargs):
+                    yield part
+                return
+
+            chat_params = self._chat_params(messages, stop, **kwargs)
+            tried: set = set()
+            while True:
+                yielded = False
+                try:
+                    async with llm_pool.endpoint(chat_params["model"], exclude=tried) as endpoint:
+                        tried.add(endpoint)
+                        span.set(endpoint=endpoint.base_url, failovers=len(tried) - 1)
+                        if chat_params["stream"]:
+                            async for part in await endpoint.client.chat(**chat_params):
+                                yielded = True
+                                yield part
+                        else:
+                            yield await endpoint.client.chat(**chat_params)
+                    return
+                except (httpx.TransportError, ConnectionError, OSError):
+                    # Fail over only if nothing reached the caller yet and
+                    # another endpoint is left to try.
+                    if yielded or len(tried) >= len(llm_pool.endpoints):
+                        raise
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from ollama import AsyncClient
+
+from metrics import metrics
+
+
+DEFAULT_OLLAMA_HOST = "http://localhost:11434"
+
+
+class OllamaEndpoint:
+    """One Ollama base URL with a long-lived (connection pooled) async client."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.client = AsyncClient(host=self.base_url)
+        self.outstanding = 0
+        self.healthy = True
+        self.unhealthy_until = 0.0
+        self.available_models: set[str] = set()
+        self.loaded_models: set[str] = set()
+        self.last_refresh = 0.0
+
+    def __repr__(self) -> str:
+        state = "up" if self.healthy else "down"
+        return f"<OllamaEndpoint {self.base_url} {state} outstanding={self.outstanding}>"
+
+
+class OllamaPool:
+    """
+    Routes LLM requests across one or more Ollama servers.
+
+    Each request goes to the healthy endpoint with the fewest outstanding
+    requests, preferring endpoints that already have the model loaded, then
+    ones that have it pulled. Endpoints that fail a request or a health
+    refresh are taken out of rotation for ``cooldown`` seconds.
+    """
+
+    def __init__(self, base_urls: list[str], refresh_interval: float = 30.0, cooldown: float = 15.0) -> None:
+        self.refresh_interval = refresh_interval
+        self.cooldown = cooldown
+        self.configure(base_urls)
+
+    def configure(self, base_urls: list[str]) -> None:
+        self.endpoints = [OllamaEndpoint(url) for url in base_urls or [DEFAULT_OLLAMA_HOST]]
+        self._refresh_lock = asyncio.Lock()
+
+    def mark_unhealthy(self, endpoint: OllamaEndpoint, reason: str) -> None:
+        if endpoint.healthy:
+            print(f"[llm_pool] {endpoint.base_url} out of rotation: {reason}")
+        endpoint.healthy = False
+        endpoint.unhealthy_until = time.monotonic() + self.cooldown
+        metrics.incr("llm_pool.endpoint_failures")
+
+    async def _refresh(self, endpoint: OllamaEndpoint) -> None:
+        try:
+            listed, running = await asyncio.wait_for(
+                asyncio.gather(endpoint.client.list(), endpoint.client.ps()), timeout=5
+            )
+        except Exception as e:
+            self.mark_unhealthy(endpoint, f"health check failed: {e!r}")
+            return
+        endpoint.available_models = {m.model for m in listed.models}
+        endpoint.loaded_models = {m.model for m in running.models}
+        if not endpoint.healthy:
+            print(f"[llm_pool] {endpoint.base_url} back in rotation")
+        endpoint.healthy = True
+        endpoint.last_refresh = time.monotonic()
+
+    async def refresh(self, force: bool = False) -> None:
+        """Re-check endpoints whose status is stale or whose cooldown has expired."""
+        if not force and not self._stale_endpoints():
+            return
+        async with self._refresh_lock:
+            # Concurrent callers queue here; only the first one does the work.
+            stale = self.endpoints if force else self._stale_endpoints()
+            await asyncio.gather(*(self._refresh(endpoint) for endpoint in stale))
+
+    def _stale_endpoints(self) -> list[OllamaEndpoint]:
+        now = time.monotonic()
+        return [
+            endpoint for endpoint in self.endpoints
+            if (endpoint.healthy and now - endpoint.last_refresh > self.refresh_interval)
+            or (not endpoint.healthy and now >= endpoint.unhealthy_until)
+        ]
+
+    def pick(self, model: str, exclude: Optional[set] = None) -> OllamaEndpoint:
+        candidates = [e for e in self.endpoints if e.healthy and e not in (exclude or set())]
+        if not candidates:
+            # Everything is marked down: try the endpoint that failed longest ago.
+            candidates = sorted(
+                (e for e in self.endpoints if e not in (exclude or set())),
+                key=lambda e: e.unhealthy_until,
+            )[:1]
+        if not candidates:
+            raise RuntimeError("No Ollama endpoints available")
+
+        for tier in (
+            [e for e in candidates if model in e.loaded_models],
+            [e for e in candidates if model in e.available_models],
+            candidates,
+        ):
+            if tier:
+                return min(tier, key=lambda e: e.outstanding)
+
+    @asynccontextmanager
+    async def endpoint(self, model: str, exclude: Optional[set] = None):
+        """Reserve the least-loaded endpoint for ``model`` for one request."""
+        if len(self.endpoints) > 1:
+            await self.refresh()
+        endpoint = self.pick(model, exclude)
+        endpoint.outstanding += 1
+        metrics.incr(f"llm_pool.requests.{endpoint.base_url}")
+        try:
+            yield endpoint
+        except (httpx.TransportError, ConnectionError, OSError) as e:
+            self.mark_unhealthy(endpoint, repr(e))
+            raise
+        else:
+            endpoint.loaded_models.add(model)
+        finally:
+            endpoint.outstanding -= 1
+
+    @classmethod
+    def from_env(cls) -> "OllamaPool":
+        hosts = os.environ.get("OLLAMA_HOSTS") or os.environ.get("OLLAMA_HOST") or DEFAULT_OLLAMA_HOST
+        return cls([host.strip() for host in hosts.split(",") if host.strip()])
+
+
+llm_pool = OllamaPool.from_env()
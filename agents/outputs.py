@@ -1,17 +1,33 @@
-from typing import TypedDict, Union
-from pydantic import Field
+from typing import Any, Literal, Optional, TypedDict, Union
+from pydantic import Field, TypeAdapter
+from pydantic.fields import FieldInfo
+import functools
 import json
+import os
 import warnings
 import nest_asyncio
 from langchain_ollama.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage
 
+from agents.llm_cache import llm_cache
+from agents.llm_client import ManagedChatOllama
+from metrics import metrics
+from tracing import tracer
+
 nest_asyncio.apply()
 warnings.filterwarnings("ignore", category=ResourceWarning)
 
+class PlannerPayload(TypedDict):
+    field_names: list[str] = Field(description="Fields to inject into")
+    payloads: list[Union[str, dict[str, Any]]] = Field(
+        description="Injection payloads, string or json, in the same order as field_names"
+    )
+    description: str = Field(description="What this payload tests")
+
+
 class PlannerOutput(TypedDict):
     endpoint: str = Field(description="The full URL endpoint to target")
-    payloads: list[dict[str, str]] = Field(
+    payloads: list[PlannerPayload] = Field(
         description="""
 List of 5 payloads to test. Each payload should have:
 - field_names: list of fields to inject into
@@ -20,8 +36,17 @@ List of 5 payloads to test. Each payload should have:
 """
     )
 
+class AttemptAnalysis(TypedDict):
+    page_url: str = Field(description="page_url of the attempt being analysed")
+    payloads: dict[str, Any] = Field(description="Payloads of the attempt, exactly as in the attempt")
+    analysis: str = Field(description="Why this attempt failed or what it revealed")
+
+
 class CriticOutput(TypedDict):
-    decision: str = Field(
+    analysis: list[AttemptAnalysis] = Field(
+        description="One entry per attempt worth commenting on"
+    )
+    decision: Literal["rescan", "replan", "success", "failure"] = Field(
         description="Must be one of: 'rescan', 'replan', 'success', 'failure'"
     )
     reasoning: str = Field(
@@ -32,6 +57,33 @@ class CriticOutput(TypedDict):
     )
 
 
+class AttackAttempt(TypedDict):
+    entry_point: str = Field(description="Full URL of the endpoint that was attacked")
+    page_url: str = Field(description="Full URL of the page with the form")
+    payloads: dict[str, Any] = Field(description="Payload sent for each field name")
+    response_excerpt: str = Field(description="Excerpt of the response")
+    notes: str = Field(description="Observations about the response")
+
+
+class AttackerOutput(TypedDict):
+    final_output: list[AttackAttempt] = Field(
+        description="One entry per payload the attacker sent"
+    )
+
+
+class ExploitEvaluatorOutput(TypedDict):
+    should_terminate: bool = Field(
+        description="True if the pentest loop should terminate"
+    )
+    reason: str = Field(description="Reason for verdict")
+    successful_payload: Optional[dict[str, Any]] = Field(
+        description="""
+If the loop should terminate and the exploit was successful, the payload that
+was successful for each field ({"<field_name>": "<payload>"}). Else null.
+"""
+    )
+
+
 class ScannerInputOutput(TypedDict):
     """
     Output from the scanner input generator agent.
@@ -181,6 +233,14 @@ def get_json_schema_prompt(schema_class: type) -> str:
     elif schema_class.__name__ == "CriticOutput":
         return """
 {
+  "analysis": [
+    {
+      "page_url": "string (page_url of the attempt, exactly as given)",
+      "payloads": {payloads of the attempt, exactly as given},
+      "analysis": "string (why this attempt failed or what it revealed)"
+    },
+    ... (one entry per attempt worth commenting on; [] if none)
+  ],
   "decision": "rescan|replan|success|failure",
   "reasoning": "string (explanation of decision)",
   "suggestions": "string (specific suggestions for next iteration)"
@@ -214,6 +274,92 @@ def get_json_schema_prompt(schema_class: type) -> str:
     return schema_desc
 
 
+def _inline_refs(node: Any, defs: dict) -> Any:
+    if isinstance(node, dict):
+        if "$ref" in node:
+            return _inline_refs(defs[node["$ref"].split("/")[-1]], defs)
+        return {k: _inline_refs(v, defs) for k, v in node.items() if k != "$defs"}
+    if isinstance(node, list):
+        return [_inline_refs(item, defs) for item in node]
+    return node
+
+
+def _add_field_descriptions(schema_class: type, schema: dict) -> None:
+    """Copy Field(description=...) from TypedDict class bodies into the schema."""
+    for name, prop in schema.get("properties", {}).items():
+        field_info = schema_class.__dict__.get(name)
+        if isinstance(field_info, FieldInfo) and field_info.description:
+            prop["description"] = field_info.description.strip()
+
+
+@functools.lru_cache(maxsize=None)
+def get_output_validator(schema_class: type) -> TypeAdapter:
+    """Compiled pydantic validator for an output TypedDict, built once per schema."""
+    return TypeAdapter(schema_class)
+
+
+def _nested_typeddicts(schema_class: type) -> list[type]:
+    found = []
+    pending = list(getattr(schema_class, "__annotations__", {}).values())
+    while pending:
+        hint = pending.pop()
+        if isinstance(hint, type) and hasattr(hint, "__required_keys__"):
+            if hint not in found:
+                found.append(hint)
+                pending.extend(hint.__annotations__.values())
+        pending.extend(getattr(hint, "__args__", ()))
+    return found
+
+
+@functools.lru_cache(maxsize=None)
+def _output_json_schema(schema_class: type) -> str:
+    schema = get_output_validator(schema_class).json_schema()
+    defs = schema.get("$defs", {})
+    _add_field_descriptions(schema_class, schema)
+    for def_name, def_schema in defs.items():
+        nested = next(
+            (
+                hint for hint in _nested_typeddicts(schema_class)
+                if hint.__name__ == def_name
+            ),
+            None,
+        )
+        if nested is not None:
+            _add_field_descriptions(nested, def_schema)
+    return json.dumps(_inline_refs(schema, defs))
+
+
+def get_output_json_schema(schema_class: type) -> dict:
+    """
+    JSON schema for an output TypedDict, derived from its annotations and
+    Field descriptions, with $refs inlined so Ollama can compile it into a
+    decoding grammar.
+    """
+    return json.loads(_output_json_schema(schema_class))
+
+
+def validate_output(schema_class: type, result: Any) -> dict:
+    return get_output_validator(schema_class).validate_python(result)
+
+
+def print_structured_output_stats() -> None:
+    """Print the structurer retry rate for each decoding mode used this run."""
+    print(f"\n{'='*80}")
+    print("STRUCTURED OUTPUT RETRY RATE")
+    print(f"{'='*80}")
+    for mode in ("json", "schema"):
+        calls = metrics.counters.get(f"structured_output.{mode}.calls", 0)
+        if not calls:
+            continue
+        retries = metrics.counters.get(f"structured_output.{mode}.retries", 0)
+        failures = metrics.counters.get(f"structured_output.{mode}.failures", 0)
+        print(
+            f"  {mode:>6}: {calls:g} calls, {retries:g} retries "
+            f"({retries / calls:.2f} per call), {failures:g} failed"
+        )
+    print(f"{'='*80}\n")
+
+
 def safe_parse_json(content: str) -> dict:
     content = content.strip()
     
@@ -234,27 +380,37 @@ def safe_parse_json(content: str) -> dict:
         raise
 
 
-async def call_ollama_with_json(
-    model_name: str, 
-    prompt: str, 
-    schema_class: type, 
-    max_retries: int = 3, 
-    print_output: bool = True
+async def _generate_json(
+    model_name: str,
+    prompt: str,
+    schema_class: type,
+    schema_name: str,
+    options: dict,
+    max_retries: int,
 ) -> dict:
 
-    schema_name = schema_class.__name__ if hasattr(schema_class, '__name__') else 'dict'
-    
+    constrained = isinstance(options.get("format"), dict)
+    mode = "schema" if constrained else "json"
+    metrics.incr(f"structured_output.{mode}.calls")
+    metrics.incr(f"structured_output.{mode}.{schema_name}.calls")
+
     for attempt in range(max_retries):
+        if attempt:
+            metrics.incr(f"structured_output.{mode}.retries")
+            metrics.incr(f"structured_output.{mode}.{schema_name}.retries")
+            tracer.current().set(retries=attempt)
         try:
-            llm = ChatOllama(
+            llm = ManagedChatOllama(
                 model=model_name,
-                format="json",
-                temperature=0.1,
                 timeout=120,
-                verbose=False
+                verbose=False,
+                **options
             )
             
-            schema_desc = get_json_schema_prompt(schema_class)
+            if constrained:
+                schema_desc = json.dumps(options["format"], indent=2)
+            else:
+                schema_desc = get_json_schema_prompt(schema_class)
             
             enhanced_prompt = f"""{prompt}
 
@@ -274,41 +430,82 @@ Your response should start with {{ and end with }}"""
             response = await llm.ainvoke([HumanMessage(content=enhanced_prompt)])
             result = safe_parse_json(response.content)
             
-            if schema_name == "CriticOutput":
-                required_fields = ["decision", "reasoning", "suggestions"]
-                if not all(field in result for field in required_fields):
-                    raise ValueError(f"Invalid CriticOutput structure. Missing required fields.")
-                
-                valid_decisions = ["rescan", "replan", "success", "failure"]
-                if result["decision"] not in valid_decisions:
-                    raise ValueError(f"Invalid decision: {result['decision']}. Must be one of {valid_decisions}")
-            
-            elif schema_name == "PlannerOutput":
-                if "endpoint" not in result or "payloads" not in result:
-                    raise ValueError(f"Invalid PlannerOutput structure. Missing required fields.")
-                if not isinstance(result["payloads"], list):
-                    raise ValueError(f"'payloads' must be a list")
-            
-            elif schema_name == "ScannerInputOutput":
-                if "scanner_tool_inputs" not in result:
-                    raise ValueError(f"Invalid ScannerInputOutput structure. Missing 'scanner_tool_inputs' field.")
-            
-            if print_output:
-                if schema_name == "PlannerOutput":
-                    print_planner_output(result)
-                elif schema_name == "CriticOutput":
-                    print_critic_output(result)
-                elif schema_name == "ScannerInputOutput":
-                    print_scanner_input_output(result)
+            if schema_class is not dict:
+                result = validate_output(schema_class, result)
             
             return result
             
         except Exception as e:
             print(f'Error on attempt {attempt + 1}/{max_retries}: {e}')
             if attempt == max_retries - 1:
+                metrics.incr(f"structured_output.{mode}.failures")
                 raise
 
             import asyncio
             await asyncio.sleep(1)
     
-    raise ValueError(f"Failed to get valid JSON after {max_retries} attempts")
\ No newline at end of file
+    raise ValueError(f"Failed to get valid JSON after {max_retries} attempts")
+
+
+async def call_ollama_with_json(
+    model_name: str, 
+    prompt: str, 
+    schema_class: type, 
+    max_retries: int = 3, 
+    print_output: bool = True,
+    use_cache: bool = True,
+    constrained: Optional[bool] = None,
+    model_options: Optional[dict] = None,
+) -> dict:
+    """
+    Call Ollama and return the parsed, validated response.
+
+    With ``constrained`` (the default unless STRUCTURED_OUTPUT=json), the JSON
+    schema derived from ``schema_class`` is passed as Ollama's ``format`` so
+    the model can only emit conforming JSON; otherwise plain JSON mode is used.
+    Validated responses are cached on (model, options, prompt, schema name),
+    so an unchanged call is served from llm_cache instead of the model.
+    ``model_options`` (num_ctx, num_predict, keep_alive, temperature) come
+    from the calling node's profile.
+    """
+
+    schema_name = schema_class.__name__ if hasattr(schema_class, '__name__') else 'dict'
+    if constrained is None:
+        constrained = os.environ.get("STRUCTURED_OUTPUT", "schema") != "json"
+    if constrained and schema_class is not dict:
+        output_format = get_output_json_schema(schema_class)
+    else:
+        output_format = "json"
+    options = {"format": output_format, "temperature": 0.1, **(model_options or {})}
+
+    generated = False
+
+    async def generate() -> dict:
+        nonlocal generated
+        generated = True
+        return await _generate_json(
+            model_name, prompt, schema_class, schema_name, options, max_retries
+        )
+
+    with tracer.span("structured_output", schema_name, model=model_name, mode="schema" if isinstance(output_format, dict) else "json") as span:
+        if use_cache:
+            key = llm_cache.make_key(model_name, options, prompt, schema_name)
+            result = await llm_cache.get_or_compute(key, model_name, schema_name, generate)
+        else:
+            result = await generate()
+        span.set(cache_hit=not generated)
+
+    if print_output:
+        if schema_name == "PlannerOutput":
+            print_planner_output(result)
+        elif schema_name == "CriticOutput":
+            print_critic_output(result)
+        elif schema_name == "ScannerInputOutput":
+            print_scanner_input_output(result)
+        elif schema_name == "AttackerOutput":
+            print_attacker_output(result)
+        elif schema_name == "ExploitEvaluatorOutput":
+            print_evaluator_output(result)
+
+    return result
+
@@ -0,0 +1,84 @@
+import json
+import os
+from typing import Any, Optional
+
+from metrics import metrics
+
+
+PROFILE_KEYS = ("model", "num_ctx", "num_predict", "keep_alive", "temperature")
+MODEL_PROFILES_PATH = os.environ.get("MODEL_PROFILES", "model_profiles.json")
+
+
+class ModelProfiles:
+    """
+    Per-node model and Ollama options, loaded from a JSON file:
+
+        {
+          "default": {"keep_alive": "30m"},
+          "nodes": {
+            "planner_agent": {"num_ctx": 16384},
+            "planner_structurer": {"model": "qwen2.5:3b", "num_predict": 2048}
+          }
+        }
+
+    Keys are model, num_ctx, num_predict, keep_alive and temperature. Nodes
+    without a "model" use the campaign's model; options a node leaves unset
+    fall back to "default" and then to the caller's own defaults. Without a
+    profiles file every node keeps the campaign's model.
+    """
+
+    def __init__(self, path: Optional[str] = MODEL_PROFILES_PATH) -> None:
+        self.load(path)
+
+    def load(self, path: Optional[str]) -> None:
+        self.path = path
+        self.default: dict[str, Any] = {}
+        self.nodes: dict[str, dict[str, Any]] = {}
+        self._resolved_models: dict[str, set[str]] = {}
+        if not path or not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.default = self._checked("default", config.get("default", {}))
+        self.nodes = {
+            node: self._checked(node, profile) for node, profile in config.get("nodes", {}).items()
+        }
+        print(f"[profiles] loaded {len(self.nodes)} node profiles from {path}")
+
+    @staticmethod
+    def _checked(node: str, profile: dict) -> dict:
+        unknown = set(profile) - set(PROFILE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown keys in model profile '{node}': {sorted(unknown)}")
+        return {key: value for key, value in profile.items() if value is not None}
+
+    def resolve(self, node: str, default_model: str) -> tuple[str, dict[str, Any]]:
+        """(model name, Ollama options) for ``node``."""
+        profile = {**self.default, **self.nodes.get(node, {})}
+        model = profile.pop("model", default_model)
+        self._resolved_models.setdefault(node, set()).add(model)
+        return model, profile
+
+    def print_latency_report(self) -> None:
+        """Per-node latency, with the model(s) each node ran on."""
+        nodes = sorted(
+            name.removeprefix("node_latency.")
+            for name in metrics.timings
+            if name.startswith("node_latency.")
+        )
+        if not nodes:
+            return
+        print(f"\n{'='*80}")
+        print("NODE LATENCY BY PROFILE")
+        print(f"{'='*80}")
+        for node in nodes:
+            values = metrics.timings[f"node_latency.{node}"]
+            models = ", ".join(sorted(self._resolved_models.get(node, ()))) or "-"
+            print(
+                f"  {node:<28} {models:<24} n={len(values):<3} "
+                f"mean={sum(values) / len(values):.2f}s max={max(values):.2f}s"
+            )
+        print(f"{'='*80}\n")
+
+
+model_profiles = ModelProfiles()
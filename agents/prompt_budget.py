@@ -0,0 +1,158 @@
+import functools
+import hashlib
+import json
+import re
+from typing import Any
+
+from metrics import metrics
+
+
+# Per-node token budgets for the state sections that are inlined into prompts.
+NODE_BUDGETS = {
+    "exploit_evaluator": {"attempts": 2500, "initial_scan_report": 1000, "recommendation": 300},
+    "critic_agent": {"attempts": 3000, "initial_scan_report": 1500, "recommendation": 400},
+}
+
+RECENT_ATTEMPTS = 5
+RECENT_EXCERPT_CHARS = 800
+OLD_EXCERPT_CHARS = 160
+
+
+@functools.lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when its encoding is available, ~4 chars/token otherwise."""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _dumps(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of ``text`` so it fits ``max_tokens``."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep_chars = max(0, int(len(text) * max_tokens / tokens) - 40)
+    head = text[: keep_chars * 2 // 3]
+    tail = text[len(text) - keep_chars // 3:] if keep_chars // 3 else ""
+    return f"{head}\n... [{tokens - max_tokens} tokens truncated] ...\n{tail}"
+
+
+def _clip(text: Any, max_chars: int) -> Any:
+    if not isinstance(text, str) or len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"... [+{len(text) - max_chars} chars]"
+
+
+def _response_fingerprint(text: str) -> str:
+    """Hash a response with volatile details (numbers, hex ids, whitespace) removed."""
+    normalized = re.sub(r"[0-9a-f]{8,}|\d+", "#", text.lower())
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def compact_attempts(attempts: list[dict], max_tokens: int) -> list[dict]:
+    """
+    Shrink the attempt history to ``max_tokens`` without losing the fields the
+    critic merges on (page_url, payloads).
+
+    Near-identical responses are kept once and referenced afterwards, the most
+    recent attempts keep a long excerpt while older ones keep a short one, and
+    if that is still too large the oldest attempts are dropped.
+    """
+    seen: dict[str, int] = {}
+    compacted = []
+    recent_from = len(attempts) - RECENT_ATTEMPTS
+
+    for idx, attempt in enumerate(attempts):
+        if not isinstance(attempt, dict):
+            continue
+        entry = dict(attempt)
+        excerpt_chars = RECENT_EXCERPT_CHARS if idx >= recent_from else OLD_EXCERPT_CHARS
+        if "response_delta" in entry:
+            # The structured delta carries the signal; the excerpt is only context.
+            excerpt_chars = OLD_EXCERPT_CHARS
+
+        excerpt = entry.get("response_excerpt")
+        if isinstance(excerpt, str) and excerpt:
+            fingerprint = _response_fingerprint(excerpt)
+            if fingerprint in seen:
+                entry["response_excerpt"] = f"(same response as attempt #{seen[fingerprint]})"
+            else:
+                seen[fingerprint] = idx + 1
+                entry["response_excerpt"] = _clip(excerpt, excerpt_chars)
+
+        for key in ("notes", "analysis", "reflection"):
+            if key in entry:
+                entry[key] = _clip(entry[key], excerpt_chars)
+
+        entry["attempt"] = idx + 1
+        compacted.append(entry)
+
+    omitted = 0
+    while len(compacted) > 1 and count_tokens(_dumps(compacted)) > max_tokens:
+        compacted.pop(0)
+        omitted += 1
+    if omitted:
+        compacted.insert(0, {"omitted_attempts": omitted})
+
+    return compacted
+
+
+def _shrink_recommendation(recommendation: Any, max_tokens: int) -> Any:
+    if not isinstance(recommendation, dict) or count_tokens(_dumps(recommendation)) <= max_tokens:
+        return recommendation
+    chars = max(40, max_tokens * 4 // max(1, len(recommendation)))
+    shrunk = {}
+    for key, value in recommendation.items():
+        if isinstance(value, dict):
+            shrunk[key] = {k: _clip(v, chars) for k, v in value.items()}
+        else:
+            shrunk[key] = _clip(value, chars)
+    return shrunk
+
+
+def budget_state(node: str, state: dict) -> dict:
+    """
+    Return budgeted copies of the prompt-bound sections of ``state`` for
+    ``node`` (attempts, initial_scan_report, recommendation), and log how many
+    tokens were removed.
+    """
+    budgets = NODE_BUDGETS.get(node, {})
+    overrides = {}
+    before = after = 0
+
+    for section, max_tokens in budgets.items():
+        value = state.get(section)
+        if not value:
+            continue
+        original_tokens = count_tokens(_dumps(value))
+
+        if section == "attempts":
+            shrunk = compact_attempts(value, max_tokens)
+        elif section == "recommendation":
+            shrunk = _shrink_recommendation(value, max_tokens)
+        else:
+            shrunk = truncate_to_tokens(_dumps(value), max_tokens)
+
+        before += original_tokens
+        after += count_tokens(_dumps(shrunk))
+        overrides[section] = shrunk
+
+    removed = max(0, before - after)
+    metrics.incr(f"prompt_budget.{node}.tokens_removed", removed)
+    metrics.incr(f"prompt_budget.{node}.tokens_sent", after)
+    print(f"[prompt_budget] {node}: {before} -> {after} tokens ({removed} removed)")
+    return overrides
@@ -0,0 +1,137 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Union
+
+from langgraph.prebuilt import create_react_agent
+
+from agents.llm_client import ManagedChatOllama
+
+from metrics import metrics
+
+
+ToolsFactory = Callable[[], Union[list, Awaitable[list]]]
+
+
+class AgentRegistry:
+    """
+    Builds each ReAct agent, its tool list and its model client once per process.
+
+    Graph nodes ask the registry for an agent on every step; only the first
+    request pays for create_react_agent, the ChatOllama client and the tool
+    factory (which may boot MCP servers). Every later request is a cache hit and
+    the setup time it avoided is accounted per loop iteration.
+    """
+
+    def __init__(self, model_name: str, debug: bool = True) -> None:
+        self.model_name = model_name
+        self.debug = debug
+        self._models: dict[tuple, ManagedChatOllama] = {}
+        self._tools: dict[str, list] = {}
+        self._agents: dict[str, Any] = {}
+        self._build_seconds: dict[str, float] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._saved_since_report = 0.0
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def _record_hit(self, key: str) -> None:
+        saved = self._build_seconds.get(key, 0.0)
+        self._saved_since_report += saved
+        metrics.incr("registry.cache_hits")
+        metrics.incr("registry.setup_seconds_saved", saved)
+
+    def model(self, temperature: float = 0, model: str | None = None, **kwargs: Any) -> ManagedChatOllama:
+        model = model or self.model_name
+        key = (model, temperature, tuple(sorted(kwargs.items())))
+        if key not in self._models:
+            self._models[key] = ManagedChatOllama(
+                model=model, temperature=temperature, verbose=False, **kwargs
+            )
+        return self._models[key]
+
+    async def tools(self, key: str, factory: ToolsFactory) -> list:
+        cache_key = f"tools:{key}"
+        async with self._lock(cache_key):
+            if key in self._tools:
+                return self._tools[key]
+
+            start = time.perf_counter()
+            tools = factory()
+            if inspect.isawaitable(tools):
+                tools = await tools
+            self._tools[key] = tools
+            self._build_seconds[cache_key] = time.perf_counter() - start
+            return tools
+
+    async def agent(
+        self,
+        name: str,
+        *,
+        prompt: Any,
+        tools_key: str,
+        tools_factory: ToolsFactory,
+        state_schema: Any,
+        temperature: float = 0,
+        extra_tools: list | None = None,
+        model_options: dict | None = None,
+        **kwargs: Any,
+    ):
+        """
+        Return the cached agent ``name``, building it on first use.
+
+        ``extra_tools`` are appended to the shared tool list for this agent only,
+        so agents that share ``tools_key`` still build that list once. The
+        agent is cached per set of extra tool names: a single-pass campaign
+        (with final_answer) and a two-pass one get separate agents even when
+        they share this registry.
+        ``model_options`` (model, num_ctx, ...) come from the node's profile and
+        override the registry model and ``temperature``.
+        """
+        extra_names = sorted(tool.name for tool in extra_tools or [])
+        key = f"{name}+{','.join(extra_names)}" if extra_names else name
+        async with self._lock(key):
+            if key in self._agents:
+                self._record_hit(key)
+                return self._agents[key]
+
+            start = time.perf_counter()
+            tools = await self.tools(tools_key, tools_factory) + list(extra_tools or [])
+            options = dict(model_options or {})
+            options.setdefault("temperature", temperature)
+            self._agents[key] = create_react_agent(
+                model=self.model(**options),
+                prompt=prompt,
+                name=name,
+                tools=tools,
+                state_schema=state_schema,
+                debug=self.debug,
+                **kwargs,
+            )
+            self._build_seconds[key] = time.perf_counter() - start
+            metrics.observe(f"registry.build.{name}", self._build_seconds[key])
+            print(f"[registry] built {key} in {self._build_seconds[key]:.2f}s")
+            return self._agents[key]
+
+    def print_iteration_report(self, iteration: int) -> None:
+        """Print the agent/tool setup time avoided since the previous report."""
+        total = metrics.counters.get("registry.setup_seconds_saved", 0.0)
+        print(
+            f"[registry] iteration {iteration}: saved {self._saved_since_report:.2f}s "
+            f"of agent setup ({total:.2f}s total, {len(self._agents)} agents cached)"
+        )
+        metrics.observe("registry.setup_saved_per_iteration", self._saved_since_report)
+        self._saved_since_report = 0.0
+
+
+_registries: dict[str, AgentRegistry] = {}
+
+
+def registry_for(model_name: str) -> AgentRegistry:
+    """Process-wide registry for ``model_name``, shared by concurrent campaigns."""
+    if model_name not in _registries:
+        _registries[model_name] = AgentRegistry(model_name)
+    return _registries[model_name]
@@ -0,0 +1,134 @@
+import hashlib
+import itertools
+import os
+import re
+import threading
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+from metrics import metrics
+from success_detector import SIGNAL_PATTERN, parse_tool_response
+
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", ".artifacts")
+ARTIFACT_THRESHOLD = int(os.environ.get("ARTIFACT_THRESHOLD", 4000))
+HEAD_CHARS = 300
+SNIPPET_CHARS = 160
+MAX_SNIPPETS = 6
+
+HANDLE_PATTERN = re.compile(r"^\s*artifact:([0-9a-f]{12,64})\s*$")
+_NOTABLE = re.compile(r"(?i)\b(?:error|exception|invalid|denied|unauthori[sz]ed|forbidden|success|welcome|mongo\w*|syntax)\b")
+
+
+def _window(start: int, end: int) -> tuple[int, int]:
+    pad = max(0, (SNIPPET_CHARS - (end - start)) // 2)
+    return max(0, start - pad), end + pad
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for large tool outputs. Outputs over the
+    threshold are written to ARTIFACT_DIR under their sha256 and the agent
+    gets a short digest with an ``artifact:<hash>`` handle instead, which
+    read_artifact (and the HTML tools) accept in place of the content.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR, threshold: int = ARTIFACT_THRESHOLD) -> None:
+        self.root = root
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, content: str) -> str:
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+        return digest
+
+    def get(self, handle: str) -> str:
+        """Content of ``artifact:<hash>`` (any unique hash prefix of 12+ chars works)."""
+        m = HANDLE_PATTERN.match(handle) or HANDLE_PATTERN.match(f"artifact:{handle}")
+        if not m:
+            raise KeyError(f"Not an artifact handle: {handle!r}")
+        prefix = m.group(1)
+        folder = os.path.join(self.root, prefix[:2])
+        matches = [name for name in (os.listdir(folder) if os.path.isdir(folder) else []) if name.startswith(prefix)]
+        if len(matches) != 1:
+            raise KeyError(f"Unknown artifact: {handle}")
+        with open(os.path.join(folder, matches[0]), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def resolve(self, text: str) -> str:
+        """``text`` itself, or the content it names if it is an artifact handle."""
+        return self.get(text) if isinstance(text, str) and HANDLE_PATTERN.match(text) else text
+
+    def offload(self, text: str, source: str = "", status: Optional[int] = None) -> str:
+        """``text`` if it is small, else a digest of it with an artifact handle."""
+        if not isinstance(text, str) or len(text) <= self.threshold:
+            return text
+        digest = self.put(text)
+        metrics.incr("artifacts.offloaded")
+        summary = self.describe(digest, text, source, status)
+        metrics.incr("artifacts.chars_saved", len(text) - len(summary))
+        return summary
+
+    def describe(self, digest: str, text: str, source: str = "", status: Optional[int] = None) -> str:
+        if status is None:
+            status, _ = parse_tool_response(text)
+        lines = [
+            f"[artifact:{digest[:12]}] {len(text)} chars" + (f" from {source}" if source else "")
+            + (f", status {status}" if status is not None else ""),
+            f"sha256: {digest}",
+        ]
+
+        if "<" in text and re.search(r"(?i)<(?:html|body|form|div|title)\b", text):
+            soup = BeautifulSoup(text, "html.parser")
+            if soup.title and soup.title.string:
+                lines.append(f"title: {soup.title.string.strip()[:120]}")
+            for form in soup.find_all("form")[:5]:
+                fields = [i.get("name") for i in form.find_all(["input", "textarea", "select"]) if i.get("name")]
+                lines.append(
+                    f"form: action={form.get('action', '')} method={form.get('method', 'GET').upper()} "
+                    f"fields={','.join(fields)}"
+                )
+
+        windows = []
+        for m in itertools.chain(SIGNAL_PATTERN.finditer(text), _NOTABLE.finditer(text)):
+            if len(windows) >= MAX_SNIPPETS:
+                break
+            if not any(lo <= m.start() < hi for lo, hi in windows):
+                windows.append(_window(m.start(), m.end()))
+        for lo, hi in windows:
+            snippet = re.sub(r"\s+", " ", text[lo:hi]).strip()
+            lines.append(f"notable: ...{snippet}...")
+        head = re.sub(r"\s+", " ", text[:HEAD_CHARS]).strip()
+        lines.append(f"head: {head}")
+        lines.append(
+            f'Full output stored out of band: read_artifact(handle="artifact:{digest[:12]}", start=0, length=2000) '
+            f'or read_artifact(handle=..., selector="form"). HTML tools also accept the handle in place of html.'
+        )
+        return "\n".join(lines)
+
+    def read(self, handle: str, start: int = 0, length: int = 2000, selector: Optional[str] = None) -> str:
+        """A character range of an artifact, optionally of only the parts matching a CSS selector."""
+        content = self.get(handle)
+        if selector:
+            parts = BeautifulSoup(content, "html.parser").select(selector)
+            if not parts:
+                return f"No elements match {selector!r} in {handle}"
+            content = "\n".join(str(part) for part in parts)
+        start = max(0, start)
+        end = min(len(content), start + max(1, length))
+        more = f"; {len(content) - end} more chars" if end < len(content) else ""
+        return f"[{handle.strip()} chars {start}-{end} of {len(content)}{more}]\n{content[start:end]}"
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import json
+from typing import Optional
+
+from checkpoints import checkpoints
+from metrics import metrics
+from payload_index import canonical_endpoint, canonicalize
+
+
+def attempt_ref(attempt: dict) -> str:
+    """Stable id of an attempt: its page URL and canonical payload set."""
+    url = attempt.get("page_url") or attempt.get("entry_point") or ""
+    payloads = attempt.get("payloads") if isinstance(attempt.get("payloads"), dict) else {}
+    key = f"{canonical_endpoint(url)}\0{canonicalize(payloads)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class CampaignAttempts:
+    """
+    One campaign's attempts, keyed by attempt_ref. The graph state carries
+    only the refs; upserts and critic merges are O(1) dict operations and
+    only changed attempts are written to the checkpoint database on flush().
+    """
+
+    def __init__(self, thread_id: str) -> None:
+        self.thread_id = thread_id
+        self._attempts: dict[str, dict] = {}
+        self._dirty: set[str] = set()
+
+    def upsert(self, attempt: dict) -> str:
+        """Store ``attempt``; a critic analysis of an earlier, different response is dropped."""
+        ref = attempt_ref(attempt)
+        stored = self._attempts.setdefault(ref, {})
+        if stored.get("response_excerpt") != attempt.get("response_excerpt", stored.get("response_excerpt")):
+            stored.pop("analysis", None)
+        stored.update(attempt)
+        self._dirty.add(ref)
+        return ref
+
+    def merge(self, analysis: dict) -> Optional[str]:
+        """Merge a critic analysis entry into the attempt it refers to, if known."""
+        ref = attempt_ref(analysis)
+        if ref not in self._attempts:
+            metrics.incr("attempt_store.unmatched_analysis")
+            return None
+        self._attempts[ref].update(analysis)
+        self._dirty.add(ref)
+        return ref
+
+    def resolve(self, refs: list[str]) -> list[dict]:
+        return [self._attempts[ref] for ref in refs if ref in self._attempts]
+
+    async def load(self) -> None:
+        conn = await checkpoints.connection()
+        async with conn.execute(
+            "SELECT ref, data FROM attempts WHERE thread_id = ?", (self.thread_id,)
+        ) as cursor:
+            async for ref, data in cursor:
+                self._attempts[ref] = json.loads(data)
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        rows = [
+            (self.thread_id, ref, json.dumps(self._attempts[ref], default=str))
+            for ref in self._dirty
+        ]
+        self._dirty.clear()
+        conn = await checkpoints.connection()
+        await conn.executemany(
+            "INSERT INTO attempts (thread_id, ref, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (thread_id, ref) DO UPDATE SET data = excluded.data",
+            rows,
+        )
+        await conn.commit()
+        metrics.incr("attempt_store.rows_written", len(rows))
+
+
+class AttemptStore:
+    """Process-wide registry of campaign attempt stores, persisted in the checkpoint database."""
+
+    def __init__(self) -> None:
+        self._campaigns: dict[str, CampaignAttempts] = {}
+        self._lock = asyncio.Lock()
+        self._ready = False
+
+    async def campaign(self, thread_id: str) -> CampaignAttempts:
+        """The attempts of ``thread_id``, loaded from earlier runs of the same thread."""
+        async with self._lock:
+            if not self._ready:
+                conn = await checkpoints.connection()
+                await conn.execute(
+                    "CREATE TABLE IF NOT EXISTS attempts ("
+                    "thread_id TEXT NOT NULL, ref TEXT NOT NULL, data TEXT NOT NULL, "
+                    "PRIMARY KEY (thread_id, ref))"
+                )
+                await conn.commit()
+                self._ready = True
+            if thread_id not in self._campaigns:
+                attempts = CampaignAttempts(thread_id)
+                await attempts.load()
+                self._campaigns[thread_id] = attempts
+            return self._campaigns[thread_id]
+
+
+attempt_store = AttemptStore()
@@ -0,0 +1,226 @@
+"""
+Run many pentest campaigns concurrently in one process.
+
+Usage:
+    python batch.py jobs.jsonl [--out results.jsonl] [--max-llm 4]
+                    [--max-per-host 4] [--max-rps-per-host 0] [--fixed-rate]
+                    [--max-browsers 2] [--single-pass] [--speculative-critic]
+                    [--direct-attacker [json|form|query]]
+                    [--ollama-host URL ...] [--profiles model_profiles.json] [--trace trace.jsonl]
+                    [--record cassette.jsonl | --replay cassette.jsonl]
+
+Each job is a JSON object with "url", "goal" and "model" (and optionally
+"id", "thread_id" and per-job "single_pass", "speculative_critic" or
+"direct_attacker" overrides; "direct_attacker" is true, false or one of
+json/form/query). The jobs file is either JSON Lines or a single JSON array.
+One result record per job is appended to the output file as soon as the job
+finishes. Records carry the job's checkpoint thread id, so a failed
+job can be resumed by adding that "thread_id" to it and running it again.
+"""
+import argparse
+import asyncio
+import json
+import time
+import traceback
+
+from agents.llm_pool import llm_pool
+from agents.profiles import model_profiles
+from checkpoints import checkpoints, new_thread_id
+from http_client import http_client
+from replay import recorder
+from startup import startup
+from tracing import tracer
+from limits import limits
+from main import run_campaign
+from mcp_client import mcp_pool
+from metrics import metrics
+from agents.outputs import print_structured_output_stats
+
+
+DIRECT_ATTACKER_ENCODINGS = ("json", "form", "query")
+
+
+def load_jobs(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        jobs = json.loads(content)
+    else:
+        jobs = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    for idx, job in enumerate(jobs):
+        missing = [key for key in ("url", "goal", "model") if not job.get(key)]
+        if missing:
+            raise ValueError(f"Job #{idx + 1} is missing {missing}: {job}")
+        if "direct_attacker" in job:
+            # true means the default encoding, false/null turns it off for this job.
+            encoding = job["direct_attacker"]
+            if encoding is True:
+                encoding = "json"
+            elif encoding is False:
+                encoding = None
+            if encoding is not None and encoding not in DIRECT_ATTACKER_ENCODINGS:
+                raise ValueError(
+                    f"Job #{idx + 1} has direct_attacker={job['direct_attacker']!r}; "
+                    f"expected true, false or one of {', '.join(DIRECT_ATTACKER_ENCODINGS)}"
+                )
+            job["direct_attacker"] = encoding
+        job.setdefault("id", f"job-{idx + 1}")
+        job.setdefault("thread_id", new_thread_id(job["url"]))
+    return jobs
+
+
+def result_record(job: dict, state: dict | None, elapsed: float, error: str | None = None) -> dict:
+    record = {
+        "id": job["id"],
+        "url": job["url"],
+        "goal": job["goal"],
+        "model": job["model"],
+        "thread_id": job["thread_id"],
+        "status": "error" if error else "ok",
+        "elapsed_seconds": round(elapsed, 3),
+    }
+    if state is not None:
+        record.update(
+            {
+                "should_terminate": state.get("should_terminate"),
+                "reason": state.get("reason"),
+                "successful_payload": state.get("successful_payload"),
+                "tries": state.get("tries"),
+            }
+        )
+    if error:
+        record["error"] = error
+    return record
+
+
+async def run_job(
+    job: dict,
+    single_pass: bool,
+    speculative_critic: bool,
+    direct_attacker: str | None,
+    out_path: str,
+    write_lock: asyncio.Lock,
+) -> dict:
+    start = time.perf_counter()
+    print(f"[batch] starting {job['id']}: {job['url']} ({job['model']})")
+    try:
+        state = await run_campaign(
+            job["url"],
+            job["goal"],
+            job["model"],
+            single_pass=job.get("single_pass", single_pass),
+            thread_id=job["thread_id"],
+            speculative_critic=job.get("speculative_critic", speculative_critic),
+            direct_attacker=job.get("direct_attacker", direct_attacker),
+        )
+        record = result_record(job, state, time.perf_counter() - start)
+    except Exception as e:
+        traceback.print_exc()
+        record = result_record(job, None, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+
+    metrics.observe("batch.job_seconds", record["elapsed_seconds"])
+    async with write_lock:
+        with open(out_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+    print(f"[batch] finished {job['id']}: {record['status']} in {record['elapsed_seconds']:.1f}s")
+    return record
+
+
+async def run_batch(
+    jobs: list[dict],
+    out_path: str,
+    single_pass: bool = False,
+    speculative_critic: bool = False,
+    direct_attacker: str | None = None,
+) -> list[dict]:
+    write_lock = asyncio.Lock()
+    try:
+        return await asyncio.gather(
+            *(run_job(job, single_pass, speculative_critic, direct_attacker, out_path, write_lock) for job in jobs)
+        )
+    finally:
+        await startup.wait()
+        await mcp_pool.close()
+        await http_client.close()
+        await checkpoints.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run many pentest campaigns concurrently")
+    parser.add_argument("jobs", help="JSONL or JSON array of {url, goal, model} jobs")
+    parser.add_argument("--out", default="batch_results.jsonl", help="Result records (JSONL, appended)")
+    parser.add_argument("--max-llm", type=int, default=limits.llm_limit, help="Concurrent LLM requests")
+    parser.add_argument("--max-per-host", type=int, default=limits.per_host_limit, help="Concurrent HTTP requests per target host")
+    parser.add_argument("--max-rps-per-host", type=float, default=limits.per_host_rate,
+                        help="Ceiling of the adaptive per-host request rate, or the fixed rate with "
+                             "--fixed-rate (0 = no cap)")
+    parser.add_argument("--fixed-rate", action="store_true",
+                        help="Turn off adaptive (AIMD) per-host rate control")
+    parser.add_argument("--max-browsers", type=int, default=limits.browser_limit, help="Concurrent browser sessions")
+    parser.add_argument("--single-pass", action="store_true", help="Run every job in single-pass mode")
+    parser.add_argument("--speculative-critic", action="store_true", help="Overlap the critic with the exploit evaluator")
+    parser.add_argument("--direct-attacker", nargs="?", const="json", choices=DIRECT_ATTACKER_ENCODINGS,
+                        help="Send planned payloads directly in this encoding instead of running the attacker agent")
+    parser.add_argument("--profiles", help="JSON file of per-node model/option profiles")
+    parser.add_argument("--trace", help="Append JSONL trace spans to this file (summarize with tracing.py)")
+    parser.add_argument("--record", help="Record all LLM and HTTP traffic to this cassette file")
+    parser.add_argument("--replay", help="Serve LLM and HTTP traffic from a recorded cassette")
+    parser.add_argument("--replay-latency", choices=("recorded", "zero"), default="recorded",
+                        help="Replay responses after their recorded latency, or immediately")
+    parser.add_argument(
+        "--ollama-host",
+        action="append",
+        dest="ollama_hosts",
+        help="Ollama base URL; repeat to route LLM requests across several servers",
+    )
+    return parser.parse_args(argv)
+
+
+async def main():
+    args = parse_args()
+    limits.configure(
+        llm=args.max_llm,
+        per_host=args.max_per_host,
+        browser=args.max_browsers,
+        per_host_rate=args.max_rps_per_host,
+        adaptive_rate=not args.fixed_rate and limits.adaptive_rate,
+    )
+    if args.ollama_hosts:
+        llm_pool.configure(args.ollama_hosts)
+    if args.profiles:
+        model_profiles.load(args.profiles)
+    if args.trace:
+        tracer.configure(args.trace)
+    if args.record or args.replay:
+        recorder.configure(record=args.record, replay=args.replay, latency=args.replay_latency)
+    jobs = load_jobs(args.jobs)
+
+    print(f"\n{'='*80}")
+    print(f"BATCH: {len(jobs)} jobs -> {args.out}")
+    print(f"  LLM requests: {args.max_llm}, per-host HTTP: {args.max_per_host}, browsers: {args.max_browsers}")
+    print(f"  Ollama endpoints: {', '.join(e.base_url for e in llm_pool.endpoints)}")
+    print(f"{'='*80}\n")
+
+    start = time.perf_counter()
+    records = await run_batch(
+        jobs,
+        args.out,
+        single_pass=args.single_pass,
+        speculative_critic=args.speculative_critic,
+        direct_attacker=args.direct_attacker,
+    )
+    failed = sum(1 for record in records if record["status"] == "error")
+
+    print(f"\n{'='*80}")
+    print(f"BATCH COMPLETE: {len(records) - failed} ok, {failed} failed in {time.perf_counter() - start:.1f}s")
+    print(f"{'='*80}\n")
+    print_structured_output_stats()
+    model_profiles.print_latency_report()
+    metrics.print_summary()
+    tracer.close()
+    recorder.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,26 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from metrics import metrics
+
+
+# A leaf module: the LLM client marks first tokens here without importing
+# startup (which imports the agents package).
+_campaign_clock: ContextVar[Optional[dict]] = ContextVar("campaign_clock", default=None)
+
+
+def start_campaign_clock() -> None:
+    """Start timing the current campaign (its asyncio context) from now."""
+    _campaign_clock.set({"start": time.perf_counter(), "first_token": None})
+
+
+def mark_llm_token() -> None:
+    """Called on every first streamed LLM chunk; records the campaign's time to first token once."""
+    clock = _campaign_clock.get()
+    if clock is None or clock["first_token"] is not None:
+        return
+    clock["first_token"] = time.perf_counter()
+    elapsed = clock["first_token"] - clock["start"]
+    metrics.observe("startup.time_to_first_llm_token", elapsed)
+    print(f"[startup] time to first LLM token: {elapsed:.2f}s")
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Optional
+
+import aiosqlite
+import httpx
+from langchain_core.exceptions import OutputParserException
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import RetryPolicy
+from pydantic import ValidationError
+
+from limits import host_of
+
+
+CHECKPOINT_DB = os.environ.get("CHECKPOINT_DB", "checkpoints.db")
+
+
+def new_thread_id(url: str) -> str:
+    return f"{host_of(url)}-{uuid.uuid4().hex[:12]}"
+
+
+def _retryable(exc: Exception) -> bool:
+    # Malformed model output and transport failures are worth another try;
+    # bad code (KeyError, other ValueErrors, ...) is not.
+    return isinstance(exc, (
+        OutputParserException,
+        ValidationError,
+        json.JSONDecodeError,
+        httpx.TransportError,
+        ConnectionError,
+        TimeoutError,
+    ))
+
+
+# Structurer and evaluator nodes are one LLM call each, so retrying them in
+# place is cheap. Agent nodes run whole tool-using ReAct loops and get a
+# single extra attempt.
+STRUCTURER_RETRY = RetryPolicy(max_attempts=3, initial_interval=1.0, retry_on=_retryable)
+AGENT_RETRY = RetryPolicy(max_attempts=2, initial_interval=2.0, retry_on=_retryable)
+
+
+class CampaignCheckpoints:
+    """
+    Process-wide SQLite checkpointer for the pentest graph. The state is
+    saved after every node, keyed by thread id, so an interrupted campaign
+    can be resumed from its last completed node.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB) -> None:
+        self.path = path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._saver: Optional[AsyncSqliteSaver] = None
+        self._lock = asyncio.Lock()
+
+    async def saver(self) -> AsyncSqliteSaver:
+        async with self._lock:
+            if self._saver is None:
+                self._conn = await aiosqlite.connect(self.path)
+                self._saver = AsyncSqliteSaver(self._conn)
+                await self._saver.setup()
+        return self._saver
+
+    async def connection(self) -> aiosqlite.Connection:
+        """The checkpoint database connection, for state stored next to the checkpoints."""
+        await self.saver()
+        return self._conn
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._conn is not None:
+                await self._conn.close()
+            self._conn = None
+            self._saver = None
+
+
+checkpoints = CampaignCheckpoints()
@@ -0,0 +1,189 @@
+import asyncio
+import contextvars
+import importlib.util
+import os
+import threading
+import time
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+
+from limits import limits
+from metrics import metrics
+from replay import recorder
+from session_store import session_store
+from tracing import tracer
+
+
+DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 15))
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", 20))
+KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+MAX_RESPONSE_BYTES = int(os.environ.get("HTTP_MAX_RESPONSE_BYTES", 2_000_000))
+HTTP2 = os.environ.get("HTTP2", "").lower() in ("1", "true", "yes")
+USER_AGENT = "Mozilla/5.0 (compatible; PentestScanner/1.0)"
+
+# The stored body is already decoded, so these no longer describe it.
+_WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+T = TypeVar("T")
+
+
+def _record(response: httpx.Response, content: bytes = b"", truncated: bool = False, elapsed: float = 0.0) -> dict:
+    return {
+        "status": response.status_code,
+        "method": response.request.method,
+        "url": str(response.url),
+        "headers": [[k, v] for k, v in response.headers.multi_items() if k.lower() not in _WIRE_HEADERS],
+        "body": content.decode(response.encoding or "utf-8", errors="replace"),
+        "truncated": truncated,
+        "elapsed_ms": round(elapsed * 1000),
+        "history": [_record(r) for r in response.history],
+    }
+
+
+def _rebuild(record: dict) -> httpx.Response:
+    response = httpx.Response(
+        record["status"],
+        headers=record["headers"],
+        content=record["body"].encode("utf-8"),
+        request=httpx.Request(record["method"], record["url"]),
+        history=[_rebuild(r) for r in record["history"]],
+        extensions={"truncated": record["truncated"], "elapsed_ms": record.get("elapsed_ms", 0)},
+    )
+    response.encoding = "utf-8"
+    return response
+
+
+class SharedHttpClient:
+    """
+    One process-wide httpx.AsyncClient, so concurrent tool calls reuse
+    pooled keep-alive connections to the target instead of opening a new one
+    per request. Cookies go to and come from the current campaign's jar
+    (session_store.jar forwards to it). The client is bound to the event
+    loop that first used it and recreated if a later asyncio.run() asks for it.
+
+    Synchronous callers go through run_sync(), which schedules the request on
+    the client's loop rather than starting a loop of their own, so the client
+    and the per-host semaphores are never shared between loops.
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background: Optional[asyncio.AbstractEventLoop] = None
+        self._background_lock = threading.Lock()
+        self.http2 = HTTP2
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            print("[http] HTTP2 requested but the h2 package is not installed; using HTTP/1.1")
+            self.http2 = False
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                http2=self.http2,
+                follow_redirects=False,
+                cookies=session_store.jar,
+                headers={"User-Agent": USER_AGENT},
+            )
+            self._loop = loop
+        return self._client
+
+    def _owning_loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop the client lives on, else a background loop kept for sync callers."""
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            return loop
+        with self._background_lock:
+            if self._background is None:
+                self._background = asyncio.new_event_loop()
+                threading.Thread(target=self._background.run_forever, name="http-client-loop", daemon=True).start()
+            return self._background
+
+    def run_sync(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Run ``coro`` on the client's event loop from a worker thread and wait
+        for it, with the caller's context (campaign, trace span).
+        """
+        loop = self._owning_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("run_sync() would block the HTTP client's own event loop; await the coroutine instead")
+
+        context = contextvars.copy_context()
+
+        async def in_caller_context():
+            return await asyncio.create_task(coro, context=context)
+
+        return asyncio.run_coroutine_threadsafe(in_caller_context(), loop).result()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        follow_redirects: bool = True,
+        max_bytes: int = MAX_RESPONSE_BYTES,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send one request under the per-host concurrency cap and request
+        rate (reporting its outcome back to the rate), as an "http" trace
+        span and through the traffic recorder. The body is streamed and cut
+        off at ``max_bytes``; ``response.extensions`` has "truncated" and the
+        exchange's "elapsed_ms" (not counting the wait for a host slot).
+        """
+        async def call():
+            start = time.perf_counter()
+            async with self.get().stream(method, url, follow_redirects=follow_redirects, **kwargs) as response:
+                content, truncated = bytearray(), False
+                async for chunk in response.aiter_bytes():
+                    content += chunk
+                    if len(content) > max_bytes:
+                        del content[max_bytes:]
+                        truncated = True
+                        break
+            if truncated:
+                metrics.incr("http.truncated_bodies")
+            return _record(response, bytes(content), truncated, time.perf_counter() - start)
+
+        body = kwargs.get("json", kwargs.get("data", kwargs.get("params")))
+        with tracer.span("http", method, url=url) as span:
+            queued_at = time.perf_counter()
+            async with limits.host(url):
+                await limits.pace(url)
+                span.set(queued=time.perf_counter() - queued_at, rate=limits.current_rate(url))
+                try:
+                    record = await recorder.text("http_async", {"method": method, "url": url, "body": body}, call)
+                except httpx.TransportError:
+                    limits.feedback(url, error=True)
+                    raise
+            response = _rebuild(record)
+            session_store.extract(response)
+            session_store.sync(url, "http")
+            limits.feedback(
+                url, response.status_code, record["elapsed_ms"] / 1000, retry_after=response.headers.get("retry-after")
+            )
+            span.set(status=response.status_code, bytes=len(response.content), truncated=record["truncated"])
+        return response
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.is_closed and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+http_client = SharedHttpClient()
@@ -0,0 +1,240 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from metrics import metrics
+from tracing import tracer
+
+
+ADAPTIVE_RATE = os.environ.get("ADAPTIVE_RATE", "1").lower() not in ("0", "false", "no")
+AIMD_INITIAL_RATE = float(os.environ.get("AIMD_INITIAL_RATE", 10))
+AIMD_MIN_RATE = float(os.environ.get("AIMD_MIN_RATE", 0.5))
+AIMD_MAX_RATE = float(os.environ.get("AIMD_MAX_RATE", 100))
+AIMD_INCREASE = float(os.environ.get("AIMD_INCREASE", 1.0))
+AIMD_DECREASE = float(os.environ.get("AIMD_DECREASE", 0.5))
+# A response this many times slower than the host's usual latency counts as congestion.
+AIMD_LATENCY_FACTOR = float(os.environ.get("AIMD_LATENCY_FACTOR", 4))
+DECREASE_COOLDOWN = 1.0
+THROTTLE_STATUSES = {429, 502, 503, 504}
+
+
+def host_of(url: str) -> str:
+    parsed = urlparse(url)
+    return parsed.netloc or parsed.path.split("/")[0] or url
+
+
+class HostRate:
+    """
+    Request rate for one host, adjusted by additive increase /
+    multiplicative decrease: each healthy response raises the rate by about
+    AIMD_INCREASE req/s per second of traffic, and a throttled, failed or
+    unusually slow one cuts it by AIMD_DECREASE (at most once a second, so
+    one burst of errors counts once).
+    """
+
+    def __init__(self, rate: float, max_rate: float, adaptive: bool) -> None:
+        self.rate = min(rate, max_rate)
+        self.max_rate = max_rate
+        self.adaptive = adaptive
+        self.next_slot = 0.0
+        self.usual_latency: Optional[float] = None
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.reported = self.rate
+
+    def reserve(self, now: float) -> float:
+        """Take the next request slot; returns how long to wait for it."""
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + 1.0 / self.rate
+        return slot - now
+
+    def feedback(
+        self,
+        now: float,
+        status: Optional[int],
+        latency: Optional[float],
+        error: bool,
+        retry_after: Optional[float],
+    ) -> Optional[str]:
+        """Adjust the rate for one response; returns the reason if it was cut."""
+        if retry_after:
+            self.next_slot = max(self.next_slot, now + retry_after)
+        if not self.adaptive:
+            return None
+
+        reason = None
+        if error:
+            reason = "error"
+        elif status in THROTTLE_STATUSES:
+            reason = f"status {status}"
+        elif latency is not None and self.usual_latency and latency > AIMD_LATENCY_FACTOR * max(self.usual_latency, 0.05):
+            reason = f"latency {latency:.2f}s"
+        elif latency is not None:
+            # Tracks the low end of the latency, drifting up slowly if the host gets slower.
+            if self.usual_latency is None or latency < self.usual_latency:
+                self.usual_latency = latency
+            else:
+                self.usual_latency += 0.05 * (latency - self.usual_latency)
+
+        if reason is None:
+            self.rate = min(self.max_rate, self.rate + AIMD_INCREASE / self.rate)
+            return None
+        if now - self.last_decrease < DECREASE_COOLDOWN:
+            return None
+        self.rate = max(AIMD_MIN_RATE, self.rate * AIMD_DECREASE)
+        self.last_decrease = now
+        self.decreases += 1
+        return reason
+
+
+class ConcurrencyLimits:
+    """
+    Process-wide caps shared by every campaign running in this process:
+    concurrent LLM requests, in-flight HTTP requests per target host, the
+    request rate per target host and open browser sessions.
+
+    The per-host rate is adaptive (AIMD, see HostRate) unless disabled, in
+    which case ``per_host_rate`` is a fixed cap (0 = none). Every HTTP path
+    takes a slot with pace()/pace_sync() and reports the outcome with
+    feedback(); rate changes are written to the trace as "rate" spans.
+    """
+
+    def __init__(
+        self,
+        llm: int = 4,
+        per_host: int = 4,
+        browser: int = 2,
+        per_host_rate: float = 0.0,
+        adaptive_rate: bool = True,
+    ) -> None:
+        self._rate_lock = threading.Lock()
+        self._rates: dict[str, HostRate] = {}
+        self.configure(llm=llm, per_host=per_host, browser=browser, per_host_rate=per_host_rate, adaptive_rate=adaptive_rate)
+
+    def configure(
+        self,
+        llm: int | None = None,
+        per_host: int | None = None,
+        browser: int | None = None,
+        per_host_rate: float | None = None,
+        adaptive_rate: bool | None = None,
+    ) -> None:
+        if llm is not None:
+            self.llm_limit = llm
+            self.llm = asyncio.Semaphore(llm)
+        if per_host is not None:
+            self.per_host_limit = per_host
+            self._hosts: dict[str, asyncio.Semaphore] = {}
+        if browser is not None:
+            self.browser_limit = browser
+            # Selenium is synchronous, so browser sessions are capped with a
+            # thread semaphore. Create browsers off the event loop thread.
+            self.browser = threading.BoundedSemaphore(browser)
+        if per_host_rate is not None:
+            # Requests per second per host: the fixed cap, or the ceiling of
+            # the adaptive rate; 0 means no cap.
+            self.per_host_rate = per_host_rate
+        if adaptive_rate is not None:
+            self.adaptive_rate = adaptive_rate
+        if per_host_rate is not None or adaptive_rate is not None:
+            with self._rate_lock:
+                self._rates = {}
+
+    def host(self, url: str) -> asyncio.Semaphore:
+        """Semaphore bounding in-flight requests to the host of ``url``."""
+        host = host_of(url)
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._hosts[host]
+
+    def _rate(self, host: str) -> Optional[HostRate]:
+        if not self.adaptive_rate and self.per_host_rate <= 0:
+            return None
+        if host not in self._rates:
+            if self.adaptive_rate:
+                ceiling = self.per_host_rate if self.per_host_rate > 0 else AIMD_MAX_RATE
+                self._rates[host] = HostRate(AIMD_INITIAL_RATE, ceiling, adaptive=True)
+            else:
+                self._rates[host] = HostRate(self.per_host_rate, self.per_host_rate, adaptive=False)
+        return self._rates[host]
+
+    def _reserve(self, url: str) -> float:
+        with self._rate_lock:
+            rate = self._rate(host_of(url))
+            return rate.reserve(time.monotonic()) if rate else 0.0
+
+    async def pace(self, url: str) -> None:
+        """Wait for the next request slot of the host of ``url``."""
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pace_sync(self, url: str) -> None:
+        """pace() for requests sent from worker threads."""
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def send_sync(self, url: str, send):
+        """Run a blocking request ``send()`` in the host's next slot and report how it went."""
+        self.pace_sync(url)
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception:
+            self.feedback(url, error=True)
+            raise
+        self.feedback(url, response.status_code, time.perf_counter() - start, retry_after=response.headers.get("Retry-After"))
+        return response
+
+    def feedback(
+        self,
+        url: str,
+        status: Optional[int] = None,
+        latency: Optional[float] = None,
+        error: bool = False,
+        retry_after: Optional[str] = None,
+    ) -> None:
+        """Report how a request to the host of ``url`` went."""
+        try:
+            pause = float(retry_after) if retry_after else None
+        except ValueError:
+            pause = None  # HTTP-date form; the decrease alone has to do
+        host = host_of(url)
+        with self._rate_lock:
+            rate = self._rate(host)
+            if rate is None:
+                return
+            before = rate.rate
+            reason = rate.feedback(time.monotonic(), status, latency, error, pause)
+            # Report every cut, and growth once it adds up to a quarter.
+            if reason is None and rate.rate < rate.reported * 1.25:
+                return
+            previous = before if reason else rate.reported
+            rate.reported = rate.rate
+            current, decreases = rate.rate, rate.decreases
+        if reason is not None:
+            metrics.incr("rate_control.decreases")
+            print(f"[rate] {host}: {previous:.1f} -> {current:.1f} req/s ({reason})")
+        tracer.start_span(
+            "rate", host, rate=round(current, 2), previous=round(previous, 2),
+            reason=reason or "increase", decreases=decreases,
+        ).end()
+
+    def current_rate(self, url: str) -> Optional[float]:
+        """The host's current request rate, or None if it is not paced."""
+        with self._rate_lock:
+            rate = self._rate(host_of(url))
+            return round(rate.rate, 2) if rate else None
+
+
+limits = ConcurrencyLimits(
+    llm=int(os.environ.get("MAX_CONCURRENT_LLM", 4)),
+    per_host=int(os.environ.get("MAX_REQUESTS_PER_HOST", 4)),
+    browser=int(os.environ.get("MAX_BROWSER_SESSIONS", 2)),
+    per_host_rate=float(os.environ.get("MAX_REQUESTS_PER_SECOND_PER_HOST", 0)),
+    adaptive_rate=ADAPTIVE_RATE,
+)
@@ -1,9 +1,12 @@
 import sys
+import argparse
+import time
 from typing import TypedDict, Union, Optional, Any, List
 import json
 import asyncio
 import warnings
 import nest_asyncio
+import requests
 
 from langchain_ollama.chat_models import ChatOllama
 from agents.prompts import (
@@ -15,13 +18,24 @@ from agents.prompts import (
     report_writer_agent_prompt, 
     supervisor_agent_prompt
 )
+from agents.llm_pool import llm_pool
+from agents.profiles import model_profiles
+from agents.registry import registry_for
+from agents.prompt_budget import budget_state
+from agents.final_answer import (
+    extract_final_answer,
+    final_answer_message,
+    final_answer_text,
+    make_final_answer_tool,
+)
 from agents.outputs import(
     ExploitEvaluatorOutput, 
     AttackerOutput, 
     PlannerOutput, 
     CriticOutput,
     ScannerInputOutput,
-    call_ollama_with_json
+    call_ollama_with_json,
+    print_structured_output_stats,
 )
 from langchain_core.exceptions import OutputParserException
 from langgraph.graph import END, START, StateGraph
@@ -30,6 +44,20 @@ from langgraph_supervisor import create_supervisor
 from pydantic import Field
 from langchain_core.messages import HumanMessage, AIMessage
 
+from attempt_store import CampaignAttempts, attempt_store
+from http_client import http_client
+from checkpoints import AGENT_RETRY, STRUCTURER_RETRY, checkpoints, new_thread_id
+from limits import limits
+from replay import recorder
+from response_diff import response_diff
+from session_store import session_store
+from startup import startup
+from success_detector import success_detector
+from tracing import tool_trace_handler, tracer
+from mcp_client import mcp_pool
+from metrics import metrics
+from payload_index import MAX_REPLANS, PayloadIndex
+
 from tools.all_tools import (
     PentestState,
     attacker_tools,
@@ -38,15 +66,11 @@ from tools.all_tools import (
     report_writer_tools,
     scanner_input_tools,  # NEW: tools for generating scanner inputs (no actual scanner)
 )
+from tools.fire_payloads import as_attempts, fire_payloads
 
 nest_asyncio.apply()
 warnings.filterwarnings("ignore", category=ResourceWarning)
 
-if len(sys.argv) < 3:
-    print("Usage: python main.py <url> <model>")
-    sys.exit(1)
-
-
 class ScannerStructurerState(TypedDict):
     url: str
     goal: str
@@ -69,9 +93,16 @@ async def run_scanner_tool(scanner_inputs: dict) -> str:
     endpoint = scanner_inputs['endpoint']
     fields = scanner_inputs['fields']
 
-    
-
-    scan_report = await scanner_tool.arun(endpoint, fields)
+    with tracer.span("scanner", scanner_tool.name, url=endpoint, fields=fields) as span:
+        async with limits.host(endpoint):
+            # The scanner library sends its own requests; only its start is paced.
+            await limits.pace(endpoint)
+            scan_report = await recorder.text(
+                "scanner",
+                {"url": endpoint, "fields": fields},
+                lambda: scanner_tool.arun({"url": endpoint, "fields": fields}),
+            )
+        span.set(report_chars=len(scan_report))
     
     print(f"\n{'='*80}")
     print("SCANNER TOOL EXECUTION COMPLETE")
@@ -81,25 +112,324 @@ async def run_scanner_tool(scanner_inputs: dict) -> str:
     return scan_report
 
 
-async def main():
-    MODEL = sys.argv[2]
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Automated NoSQL injection red teaming")
+    parser.add_argument("url", help="Target URL")
+    parser.add_argument("model", help="Ollama model name")
+    parser.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="Agents return their structured output through a typed final_answer "
+             "tool; the structurer nodes only run when that output fails validation.",
+    )
+    parser.add_argument(
+        "--ollama-host",
+        action="append",
+        dest="ollama_hosts",
+        help="Ollama base URL; repeat to spread requests across several servers "
+             "(default: $OLLAMA_HOSTS or $OLLAMA_HOST or localhost)",
+    )
+    parser.add_argument(
+        "--speculative-critic",
+        action="store_true",
+        help="Start the critic alongside the exploit evaluator and cancel it if "
+             "the evaluator ends the loop",
+    )
+    parser.add_argument(
+        "--direct-attacker",
+        nargs="?",
+        const="json",
+        choices=("json", "form", "query"),
+        help="Send the planner's payloads directly (concurrently, no LLM) instead of "
+             "running the attacker agent and its structurer; the value is the request "
+             "encoding (default: json)",
+    )
+    parser.add_argument(
+        "--profiles",
+        help="JSON file of per-node model/option profiles (default: $MODEL_PROFILES or model_profiles.json)",
+    )
+    parser.add_argument("--trace", help="Append JSONL trace spans to this file (default: $TRACE_FILE)")
+    parser.add_argument("--record", help="Record all LLM and HTTP traffic to this cassette file (default: $RECORD_FILE)")
+    parser.add_argument("--replay", help="Serve LLM and HTTP traffic from a recorded cassette (default: $REPLAY_FILE)")
+    parser.add_argument(
+        "--replay-latency",
+        choices=("recorded", "zero"),
+        default="recorded",
+        help="Replay responses after their recorded latency, or immediately",
+    )
+    parser.add_argument(
+        "--thread-id",
+        help="Checkpoint thread to resume (printed at the start of every run); "
+             "a new id is generated when omitted",
+    )
+    return parser.parse_args(argv)
 
-    async def planner(state: PentestState):
-        """Planner agent returns raw natural language output."""
-        planner_agent = create_react_agent(
-            model=ChatOllama(model=MODEL, temperature=0, verbose=False),
-            prompt=planner_agent_prompt,
-            name="planner_agent",
-            tools=await planner_tools(),
+
+def _planned_count(plans: list) -> int:
+    return sum(len(p.get("payloads") or []) for p in plans if isinstance(p, dict))
+
+
+def planner_updates(result: dict, payload_index: PayloadIndex | None = None, replan: bool = True) -> dict:
+    """
+    The planner's plans, minus payloads already sent. If that leaves nothing
+    to send, ``payloads`` is empty and the recommendation sends the planner
+    back for new ones (with ``replan`` False the unfiltered plans go through
+    instead, so the loop cannot stall on the planner).
+    """
+    final_output = result.get("final_output", result)
+    
+    if isinstance(final_output, dict):
+        final_output = [final_output]
+    
+    if not isinstance(final_output, list):
+        raise ValueError(f"Planner structurer did not return payloads in a valid list format. Got type: {type(final_output)}")
+    
+    if payload_index is not None:
+        filtered = payload_index.filter_plans(final_output)
+        if _planned_count(filtered) or not _planned_count(final_output):
+            final_output = filtered
+        elif replan:
+            metrics.incr("payload_index.replans")
+            print("[payload_index] every planned payload was already tried; asking the planner again")
+            return {
+                "payloads": [],
+                "raw_planner_output": None,
+                "recommendation": {
+                    "decision": "replan",
+                    "reasoning": "Every payload in the last plan had already been sent to its endpoint.",
+                    "suggestions": "Plan payloads that are not in the already-tried list, e.g. the next "
+                                   "step of a blind extraction or a different operator or field.",
+                },
+            }
+        else:
+            print("[payload_index] planner keeps repeating tried payloads; sending the plan as is")
+    
+    return {
+        "payloads": final_output,
+        "raw_planner_output": None,
+    }
+
+
+def attacker_updates(state: PentestState, result: dict, attempts: CampaignAttempts) -> dict:
+    if "final_output" not in result or not isinstance(result["final_output"], list):
+        raise ValueError(f"Attacker structurer did not return valid attempts. Got keys: {list(result.keys()) if isinstance(result, dict) else 'N/A'}")
+    
+    # Deltas against the endpoint baselines, recorded as the tools got the responses.
+    response_diff.annotate(result["final_output"])
+    new_refs = [attempts.upsert(attempt) for attempt in result["final_output"] if isinstance(attempt, dict)]
+    
+    return {
+        "attempts": list(dict.fromkeys(state["attempts"] + new_refs)),
+        "raw_attacker_output": None,
+    }
+
+
+def critic_updates(state: PentestState, result: dict, attempts: CampaignAttempts) -> dict:
+    if "final_output" in result:
+        final_output = result["final_output"]
+    elif "analysis" in result and "recommendation" in result:
+        final_output = result
+    elif "decision" in result:
+        # CriticOutput: the per-attempt analysis is merged into the attempt
+        # store, the rest is the planner's recommendation.
+        recommendation = dict(result)
+        final_output = {"analysis": recommendation.pop("analysis", []), "recommendation": recommendation}
+    else:
+        raise ValueError(f"Critic structurer: unexpected structure. Keys: {list(result.keys())}")
+    
+    if not isinstance(final_output, dict):
+        raise ValueError(f"Final output is not a dict. Type: {type(final_output)}")
+    
+    if "analysis" not in final_output:
+        raise ValueError(f"Final output missing 'analysis' key. Keys: {list(final_output.keys())}")
+        
+    if "recommendation" not in final_output:
+        raise ValueError(f"Final output missing 'recommendation' key. Keys: {list(final_output.keys())}")
+    
+    if not isinstance(final_output["analysis"], list):
+        final_output["analysis"] = [final_output["analysis"]]
+    
+    if not isinstance(final_output["recommendation"], dict):
+        raise ValueError(f"Recommendation is not a dict. Type: {type(final_output['recommendation'])}")
+    
+    for analysis_entry in final_output["analysis"]:
+        if not isinstance(analysis_entry, dict):
+            print(f"⚠ Warning: Skipping non-dict analysis entry: {analysis_entry}")
+            continue
+        attempts.merge(analysis_entry)
+    
+    return {
+        "recommendation": final_output["recommendation"],
+        "raw_critic_output": None,
+    }
+
+
+def _fetch(url: str) -> str:
+    try:
+        with tracer.span("http", "GET", url=url) as span:
+            r = limits.send_sync(url, lambda: recorder.http("GET", url, lambda: requests.get(
+                url,
+                timeout=10,
+                headers={
+                    "User-Agent": "Mozilla/5.0 (compatible; PentestScanner/1.0)"
+                }
+            )))
+            span.set(status=r.status_code, bytes=len(r.content))
+        r.raise_for_status()
+        return r.text
+    except Exception as e:
+        return f"[ERROR FETCHING URL] {e}"
+
+
+async def fetch_initial_scrape(url: str) -> str:
+    """
+    Fetch initial unauthenticated website scrape.
+    Intentionally simple: no JS, no auth, no crawling.
+    """
+    async with limits.host(url):
+        return await asyncio.to_thread(_fetch, url)
+
+
+async def run_campaign(
+    url: str,
+    goal: str,
+    model: str,
+    single_pass: bool = False,
+    thread_id: str | None = None,
+    speculative_critic: bool = False,
+    direct_attacker: str | None = None,
+) -> dict:
+    """
+    Run one campaign (see _run_campaign) inside a "campaign" trace span and
+    with its own cookie jar and success detector findings, so concurrent
+    campaigns against one host do not share sessions or results.
+    """
+    thread_id = thread_id or new_thread_id(url)
+    with (
+        tracer.span("campaign", url, goal=goal, model=model, thread_id=thread_id),
+        session_store.campaign(thread_id),
+        success_detector.campaign(thread_id),
+    ):
+        return await _run_campaign(url, goal, model, single_pass, thread_id, speculative_critic, direct_attacker)
+
+
+async def _run_campaign(
+    url: str,
+    goal: str,
+    model: str,
+    single_pass: bool,
+    thread_id: str,
+    speculative_critic: bool,
+    direct_attacker: str | None,
+) -> dict:
+    """
+    Run one campaign (scrape -> scanner inputs -> scanner -> pentest loop ->
+    report) and return the final pentest state.
+
+    The pentest loop is checkpointed after every node under ``thread_id``;
+    passing the id of an interrupted campaign resumes it from its last
+    completed node instead of starting over. With ``speculative_critic``
+    the critic runs concurrently with the exploit evaluator. With
+    ``direct_attacker`` (a request encoding) the planned payloads are sent
+    without the attacker agent and its structurer.
+    """
+    MODEL = model
+    SINGLE_PASS = single_pass
+    MODE = "single-pass" if SINGLE_PASS else "two-pass"
+    registry = registry_for(MODEL)
+    # Model warm-up, RAG load and MCP boot run in the background while the
+    # scrape and scanner-input call below go ahead.
+    startup.begin_campaign(MODEL)
+    iteration_clock = {"start": None}
+    detector_cursor = {"findings": 0}
+    payload_index = PayloadIndex()
+    # Consecutive plans that were sent back because nothing in them was new.
+    replans = {"count": 0}
+    # State carries attempt refs; the attempts themselves live here.
+    campaign_attempts = await attempt_store.campaign(thread_id)
+
+    def with_attempts(state):
+        """``state`` with its attempt refs resolved, for prompts and detectors."""
+        return {**state, "attempts": campaign_attempts.resolve(state["attempts"])}
+
+    async def record_attack(state, result):
+        updates = attacker_updates(state, result, campaign_attempts)
+        payload_index.record_attempts(result["final_output"])
+        await campaign_attempts.flush()
+        return updates
+
+    async def record_critique(state, result):
+        updates = critic_updates(state, result, campaign_attempts)
+        await campaign_attempts.flush()
+        return updates
+
+    def node_model_options(node):
+        model, options = model_profiles.resolve(node, MODEL)
+        return {"model": model, **options}
+
+    async def structured_call(node, prompt, schema_class):
+        """call_ollama_with_json on the model and options of ``node``'s profile."""
+        model, options = model_profiles.resolve(node, MODEL)
+        return await call_ollama_with_json(model, prompt, schema_class, model_options=options)
+
+    def timed(node, fn):
+        """Record the node's wall time as node_latency.<node> and as a trace span."""
+        async def run(state):
+            with metrics.timer(f"node_latency.{node}"), tracer.span("node", node, iteration=state.get("tries")):
+                return await fn(state)
+        return run
+
+    async def run_phase_agent(name, prompt, tools_key, tools_factory, schema_class, state, budget_node=None):
+        """
+        Run one ReAct agent. In single-pass mode the agent also gets a typed
+        final_answer tool; returns (last message, validated result or None,
+        raw text for the structurer). With ``budget_node`` the prompt-bound
+        state sections are fitted to that node's token budget first.
+        """
+        agent = await registry.agent(
+            name,
+            prompt=prompt,
+            tools_key=tools_key,
+            tools_factory=tools_factory,
             state_schema=PentestState,
-            debug=True,
+            extra_tools=[make_final_answer_tool(schema_class)] if SINGLE_PASS else None,
+            model_options=node_model_options(name),
+        )
+        
+        if budget_node is not None:
+            state = {**state, **budget_state(budget_node, state)}
+        
+        resp = await agent.ainvoke(state, {"callbacks": [tool_trace_handler]})
+        last_message = resp["messages"][-1]
+        
+        if not SINGLE_PASS:
+            return last_message, None, last_message.content
+        
+        result = extract_final_answer(resp["messages"], schema_class)
+        return final_answer_message(resp["messages"]), result, final_answer_text(resp["messages"])
+
+    def plan_updates(result: dict) -> dict:
+        updates = planner_updates(result, payload_index, replan=replans["count"] < MAX_REPLANS)
+        replans["count"] = 0 if _planned_count(updates["payloads"]) else replans["count"] + 1
+        return updates
+
+    async def planner(state: PentestState):
+        """Planner agent returns raw natural language output, or its PlannerOutput in single-pass mode."""
+        if iteration_clock["start"] is None:
+            iteration_clock["start"] = time.perf_counter()
+        
+        # The planner sees a compact "already tried" digest, not the raw attempts.
+        digest_state = {**state, "attempts": payload_index.digest()}
+        last_message, result, raw = await run_phase_agent(
+            "planner_agent", planner_agent_prompt, "planner", planner_tools, PlannerOutput, digest_state
         )
         
-        resp = await planner_agent.ainvoke(state)
+        if result is not None:
+            return {"messages": [last_message], **plan_updates(result)}
         
         return {
-            "messages": [resp["messages"][-1]],
-            "raw_planner_output": resp["messages"][-1].content,
+            "messages": [last_message],
+            "raw_planner_output": raw,
         }
     
     async def planner_structurer(state: PentestState):
@@ -107,20 +437,8 @@ async def main():
         content = state["raw_planner_output"]
         
         try:
-            result = await call_ollama_with_json(MODEL, content, PlannerOutput)
-            
-            final_output = result.get("final_output", {})
-            
-            if isinstance(final_output, dict):
-                final_output = [final_output]
-            
-            if not isinstance(final_output, list):
-                raise ValueError(f"Planner structurer did not return payloads in a valid list format. Got type: {type(final_output)}")
-                        
-            return {
-                "payloads": final_output,
-                "raw_planner_output": None,
-            }
+            result = await structured_call("planner_structurer", content, PlannerOutput)
+            return plan_updates(result)
         except Exception as e:
             print(f"\n=== ERROR IN PLANNER_STRUCTURER ===")
             print(f"Error: {e}")
@@ -130,40 +448,36 @@ async def main():
             raise
 
     async def attacker(state: PentestState):
-        """Attacker agent returns raw natural language output (no structured output)."""
-        attacker_agent = create_react_agent(
-            model=ChatOllama(model=MODEL, temperature=0, verbose=False),
-            prompt=attacker_agent_prompt,
-            name="attacker_agent",
-            tools=attacker_tools(),
-            state_schema=PentestState,
-            debug=True,
+        """Attacker agent returns raw natural language output, or its AttackerOutput in single-pass mode."""
+        last_message, result, raw = await run_phase_agent(
+            "attacker_agent", attacker_agent_prompt, "attacker", attacker_tools, AttackerOutput, state
         )
         
-        resp = await attacker_agent.ainvoke(state)
+        if result is not None:
+            return {"messages": [last_message], **(await record_attack(state, result))}
         
         return {
-            "messages": [resp["messages"][-1]],
-            "raw_attacker_output": resp["messages"][-1].content,
+            "messages": [last_message],
+            "raw_attacker_output": raw,
             "attempts": state["attempts"],
         }
     
+    async def direct_attacker_node(state: PentestState):
+        """Send the planned payloads concurrently and build the AttackerOutput without an LLM."""
+        results = await fire_payloads(state["payloads"], state.get("entry_point") or state["url"], direct_attacker)
+        result = {"final_output": as_attempts(results, state["url"])}
+        hits = sum(1 for r in results if r.get("signals"))
+        summary = f"Sent {len(results)} payloads ({direct_attacker}); {hits} with success signals."
+        print(f"[direct attacker] {summary}")
+        return {"messages": [AIMessage(content=summary)], **(await record_attack(state, result))}
+
     async def attacker_structurer(state: PentestState):
         """Structure attacker output using Ollama JSON mode."""
         content = state["raw_attacker_output"]
         
         try:
-            result = await call_ollama_with_json(MODEL, content, AttackerOutput)
-            
-            if "final_output" not in result or not isinstance(result["final_output"], list):
-                raise ValueError(f"Attacker structurer did not return valid attempts. Got keys: {list(result.keys()) if isinstance(result, dict) else 'N/A'}")
-            
-            new_attempts = result["final_output"]
-            
-            return {
-                "attempts": state["attempts"] + new_attempts,
-                "raw_attacker_output": None,
-            }
+            result = await structured_call("attacker_structurer", content, AttackerOutput)
+            return await record_attack(state, result)
         except Exception as e:
             print(f"\n=== ERROR IN ATTACKER_STRUCTURER ===")
             print(f"Error: {e}")
@@ -172,72 +486,34 @@ async def main():
             print(f"=====================================\n")
             raise
 
-    async def critic(state: PentestState):
-        """Critic agent returns raw natural language output."""
-        critic_agent = create_react_agent(
-            model=ChatOllama(model=MODEL, temperature=0, verbose=False),
-            prompt=critic_agent_prompt,
-            name="critic_agent",
-            tools=await planner_tools(),
-            state_schema=PentestState,
-            debug=True,
+    async def run_critic(state: PentestState):
+        """The critic agent's (last message, CriticOutput or None, raw text); records nothing."""
+        return await run_phase_agent(
+            "critic_agent", critic_agent_prompt, "planner", planner_tools, CriticOutput, with_attempts(state),
+            budget_node="critic_agent",
         )
-        
-        resp = await critic_agent.ainvoke(state)
+
+    async def critic_outcome(state: PentestState, last_message, result, raw):
+        """Record a single-pass critique, or hand the raw text to the critic structurer."""
+        if result is not None:
+            return {"messages": [last_message], **(await record_critique(state, result))}
         
         return {
-            "messages": [resp["messages"][-1]],
-            "raw_critic_output": resp["messages"][-1].content,
+            "messages": [last_message],
+            "raw_critic_output": raw,
         }
+
+    async def critic(state: PentestState):
+        """Critic agent returns raw natural language output, or its CriticOutput in single-pass mode."""
+        return await critic_outcome(state, *(await run_critic(state)))
     
     async def critic_structurer(state: PentestState):
         """Structure critic output using Ollama JSON mode."""
         content = state["raw_critic_output"]
         
         try:
-            result = await call_ollama_with_json(MODEL, content, CriticOutput)
-            
-            if "final_output" in result:
-                final_output = result["final_output"]
-            elif "analysis" in result and "recommendation" in result:
-                final_output = result
-            else:
-                raise ValueError(f"Critic structurer: unexpected structure. Keys: {list(result.keys())}")
-            
-            if not isinstance(final_output, dict):
-                raise ValueError(f"Final output is not a dict. Type: {type(final_output)}")
-            
-            if "analysis" not in final_output:
-                raise ValueError(f"Final output missing 'analysis' key. Keys: {list(final_output.keys())}")
-                
-            if "recommendation" not in final_output:
-                raise ValueError(f"Final output missing 'recommendation' key. Keys: {list(final_output.keys())}")
-            
-            if not isinstance(final_output["analysis"], list):
-                final_output["analysis"] = [final_output["analysis"]]
-            
-            if not isinstance(final_output["recommendation"], dict):
-                raise ValueError(f"Recommendation is not a dict. Type: {type(final_output['recommendation'])}")
-                        
-            c = state["attempts"].copy()
-            
-            for analysis_entry in final_output["analysis"]:
-                if not isinstance(analysis_entry, dict):
-                    print(f"⚠ Warning: Skipping non-dict analysis entry: {analysis_entry}")
-                    continue
-                    
-                for attempt_entry in c:
-                    if (
-                        analysis_entry.get("page_url") == attempt_entry.get("page_url")
-                        and analysis_entry.get("payloads") == attempt_entry.get("payloads")
-                    ):
-                        attempt_entry.update(analysis_entry)
-            
-            return {
-                "attempts": c,
-                "recommendation": final_output["recommendation"],
-                "raw_critic_output": None,
-            }
+            result = await structured_call("critic_structurer", content, CriticOutput)
+            return await record_critique(state, result)
         except Exception as e:
             print(f"\n=== ERROR IN CRITIC_STRUCTURER ===")
             print(f"Error: {e}")
@@ -252,21 +528,42 @@ async def main():
             raise
 
     async def exploit_evaluator(state: PentestState):
-        """Exploit evaluator using Ollama JSON mode for structured output."""
+        """
+        Exploit evaluator. Conclusive success-detector findings decide
+        directly; otherwise Ollama JSON mode decides, with any weaker
+        detector signals included in the prompt.
+        """
+        resolved = with_attempts(state)
+        success_detector.scan_attempts(state["url"], resolved["attempts"])
+        findings, detector_cursor["findings"] = success_detector.findings_for(
+            state["url"], detector_cursor["findings"]
+        )
+        signals = "\n".join(f"- {finding.describe()}" for finding in findings) or "- none"
+        budgeted = budget_state("exploit_evaluator", resolved)
         prompt = f"""
 {exploit_evaluator_agent_prompt}
 
 [CURRENT STATE]
-Attempts: {state['attempts']}
+Attempts: {json.dumps(budgeted.get('attempts', []), default=str)}
+(An attempt's response_delta is how its response differs from the endpoint's response to junk values.)
 Tries: {state['tries']}
 Goal: {state['goal']}
 
+[DETERMINISTIC DETECTOR SIGNALS]
+{signals}
+
 Analyze the attempts and decide if the loop should terminate.
 NOTE: Do NOT terminate to request re-scanning. The scanner has already run and cannot be called again.
 """
         
         try:
-            result = await call_ollama_with_json(MODEL, prompt, ExploitEvaluatorOutput)
+            result = success_detector.verdict(findings)
+            if result is not None:
+                metrics.incr("success_detector.short_circuits")
+                print(f"[success_detector] conclusive finding, skipping the evaluator LLM")
+            else:
+                metrics.incr("success_detector.llm_fallbacks")
+                result = await structured_call("exploit_evaluator_agent", prompt, ExploitEvaluatorOutput)
             
             if "reason" not in result:
                 raise ValueError("Exploit Evaluator did not provide a reason for termination")
@@ -282,6 +579,13 @@ NOTE: Do NOT terminate to request re-scanning. The scanner has already run and c
             print(f"  Reason: {reason}")
             print(f"  Try #{state['tries'] + 1}")
             print(f"{'='*60}\n")
+            registry.print_iteration_report(state["tries"] + 1)
+            
+            if iteration_clock["start"] is not None:
+                elapsed = time.perf_counter() - iteration_clock["start"]
+                metrics.observe(f"iteration_latency.{MODE}", elapsed)
+                print(f"[latency] iteration {state['tries'] + 1} ({MODE}): {elapsed:.2f}s")
+            iteration_clock["start"] = time.perf_counter()
 
             return {
                 "messages": [AIMessage(content=str(result))],
@@ -299,6 +603,23 @@ NOTE: Do NOT terminate to request re-scanning. The scanner has already run and c
             print(f"===================================\n")
             raise
 
+    def after_planner(state: PentestState):
+        if state.get("raw_planner_output"):
+            return "planner_structurer"
+        return after_planner_structurer(state)
+
+    def after_planner_structurer(state: PentestState):
+        # Nothing new to send: back to the planner, at most MAX_REPLANS times in a row.
+        if not _planned_count(state["payloads"]) and 0 < replans["count"] <= MAX_REPLANS:
+            return "planner_agent"
+        return "attacker_agent"
+
+    def after_attacker(state: PentestState):
+        return "attacker_structurer" if state.get("raw_attacker_output") else "exploit_evaluator_agent"
+
+    def after_critic(state: PentestState):
+        return "critic_structurer" if state.get("raw_critic_output") else "planner_agent"
+
     def exploit_evaluator_decision(state: PentestState):
         """
         Route decision after exploit evaluator.
@@ -309,56 +630,141 @@ NOTE: Do NOT terminate to request re-scanning. The scanner has already run and c
         else:
             return "critic_agent"
 
+    async def timed_critic(state: PentestState):
+        start = time.perf_counter()
+        outputs = await run_critic(state)
+        return outputs, time.perf_counter() - start
+
+    async def evaluator_with_speculative_critic(state: PentestState):
+        """
+        Run the exploit evaluator and the critic concurrently. The critic
+        works from the attempts, not the evaluator's verdict, so it is
+        started speculatively and cancelled if the evaluator ends the loop.
+        Its critique is only recorded once the evaluator has let the loop
+        continue.
+        """
+        critic_task = asyncio.create_task(timed_critic(state))
+        metrics.incr("speculative_critic.started")
+        start = time.perf_counter()
+        try:
+            evaluation = await exploit_evaluator(state)
+        except BaseException:
+            critic_task.cancel()
+            raise
+        evaluator_seconds = time.perf_counter() - start
+
+        if exploit_evaluator_decision({**state, **evaluation}) == "end":
+            critic_task.cancel()
+            try:
+                await critic_task
+            except BaseException:
+                pass
+            metrics.incr("speculative_critic.wasted")
+            print("[speculative] evaluator ended the loop; critic discarded")
+            return evaluation
+
+        outputs, critic_seconds = await critic_task
+        metrics.incr("speculative_critic.used")
+        metrics.observe("speculative_critic.overlap_seconds", min(evaluator_seconds, critic_seconds))
+        critique = await critic_outcome(state, *outputs)
+        return {
+            **evaluation,
+            **critique,
+            "messages": evaluation["messages"] + critique["messages"],
+        }
+
+    def after_speculative_evaluation(state: PentestState):
+        if exploit_evaluator_decision(state) == "end":
+            return "end"
+        return after_critic(state)
+
 
     # ============================================================================
     # PHASE 2 GRAPH: PENTEST LOOP (NO SCANNER)
     # ============================================================================
     pentest_subgraph = StateGraph(PentestState)
-    pentest_subgraph.add_node("planner_agent", planner)
-    pentest_subgraph.add_node("planner_structurer", planner_structurer)
-    pentest_subgraph.add_node("attacker_agent", attacker)
-    pentest_subgraph.add_node("attacker_structurer", attacker_structurer)
-    pentest_subgraph.add_node("critic_agent", critic)
-    pentest_subgraph.add_node("critic_structurer", critic_structurer)
-    pentest_subgraph.add_node("exploit_evaluator_agent", exploit_evaluator)
+    pentest_subgraph.add_node("planner_agent", timed("planner_agent", planner), retry=AGENT_RETRY)
+    pentest_subgraph.add_node("planner_structurer", timed("planner_structurer", planner_structurer), retry=STRUCTURER_RETRY)
+    if direct_attacker:
+        pentest_subgraph.add_node("attacker_agent", timed("attacker_agent", direct_attacker_node), retry=AGENT_RETRY)
+    else:
+        pentest_subgraph.add_node("attacker_agent", timed("attacker_agent", attacker), retry=AGENT_RETRY)
+    pentest_subgraph.add_node("attacker_structurer", timed("attacker_structurer", attacker_structurer), retry=STRUCTURER_RETRY)
+    pentest_subgraph.add_node("critic_structurer", timed("critic_structurer", critic_structurer), retry=STRUCTURER_RETRY)
+    if speculative_critic:
+        pentest_subgraph.add_node("exploit_evaluator_agent", timed("exploit_evaluator_agent", evaluator_with_speculative_critic), retry=AGENT_RETRY)
+    else:
+        pentest_subgraph.add_node("critic_agent", timed("critic_agent", critic), retry=AGENT_RETRY)
+        pentest_subgraph.add_node("exploit_evaluator_agent", timed("exploit_evaluator_agent", exploit_evaluator), retry=STRUCTURER_RETRY)
 
     # Start directly at planner (scanner already ran externally)
+    # Structurer nodes are skipped when a single-pass agent already returned
+    # validated structured output (its raw_*_output is then None).
     pentest_subgraph.add_edge(START, "planner_agent")
-    pentest_subgraph.add_edge("planner_agent", "planner_structurer")
-    pentest_subgraph.add_edge("planner_structurer", "attacker_agent")
-    pentest_subgraph.add_edge("attacker_agent", "attacker_structurer")
-    pentest_subgraph.add_edge("attacker_structurer", "exploit_evaluator_agent")
     pentest_subgraph.add_conditional_edges(
-        "exploit_evaluator_agent",
-        exploit_evaluator_decision,
-        {"end": END, "critic_agent": "critic_agent"},
+        "planner_agent",
+        after_planner,
+        {"planner_structurer": "planner_structurer", "attacker_agent": "attacker_agent", "planner_agent": "planner_agent"},
+    )
+    pentest_subgraph.add_conditional_edges(
+        "planner_structurer",
+        after_planner_structurer,
+        {"attacker_agent": "attacker_agent", "planner_agent": "planner_agent"},
+    )
+    pentest_subgraph.add_conditional_edges(
+        "attacker_agent",
+        after_attacker,
+        {"attacker_structurer": "attacker_structurer", "exploit_evaluator_agent": "exploit_evaluator_agent"},
     )
-    pentest_subgraph.add_edge("critic_agent", "critic_structurer")
+    pentest_subgraph.add_edge("attacker_structurer", "exploit_evaluator_agent")
+    if speculative_critic:
+        # The evaluator node also runs the critic, so it routes straight to
+        # the critic structurer (or the planner) when the loop continues.
+        pentest_subgraph.add_conditional_edges(
+            "exploit_evaluator_agent",
+            after_speculative_evaluation,
+            {"end": END, "critic_structurer": "critic_structurer", "planner_agent": "planner_agent"},
+        )
+    else:
+        pentest_subgraph.add_conditional_edges(
+            "exploit_evaluator_agent",
+            exploit_evaluator_decision,
+            {"end": END, "critic_agent": "critic_agent"},
+        )
+        pentest_subgraph.add_conditional_edges(
+            "critic_agent",
+            after_critic,
+            {"critic_structurer": "critic_structurer", "planner_agent": "planner_agent"},
+        )
     pentest_subgraph.add_edge("critic_structurer", "planner_agent")
     
-    pentest_agents = pentest_subgraph.compile(name="pentest_agents")
+    pentest_agents = pentest_subgraph.compile(
+        name="pentest_agents",
+        checkpointer=await checkpoints.saver(),
+    )
+    config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 100}
+    checkpoint = await pentest_agents.aget_state(config)
 
     # ============================================================================
     # PHASE 3: REPORT WRITER
     # ============================================================================
-    report_writer_agent = create_react_agent(
-        model=ChatOllama(model=MODEL, temperature=0.3),
+    report_writer_agent = await registry.agent(
+        "report_writer_agent",
         prompt=report_writer_agent_prompt,
-        name="report_writer_agent",
-        tools=report_writer_tools(),
+        tools_key="report_writer",
+        tools_factory=report_writer_tools,
         state_schema=PentestState,
-        debug=True,
+        temperature=0.3,
+        model_options=node_model_options("report_writer_agent"),
     )
 
     # ============================================================================
     # MAIN EXECUTION FLOW
     # ============================================================================
-    url = sys.argv[1]
-    goal = input('Input goal: ')
-    
     print(f"\n{'='*80}")
     print(f"TARGET URL: {url}")
     print(f"GOAL: {goal}")
+    print(f"THREAD: {thread_id} (resume with --thread-id {thread_id})")
     print(f"{'='*80}\n")
 
     
@@ -380,8 +786,8 @@ NOTE: Do NOT terminate to request re-scanning. The scanner has already run and c
 {state['website_scrape']}
 """
 
-        result = await call_ollama_with_json(
-            MODEL,
+        result = await structured_call(
+            "scanner_input_structurer",
             prompt,
             ScannerInputOutput,
         )
@@ -390,63 +796,77 @@ NOTE: Do NOT terminate to request re-scanning. The scanner has already run and c
             "scanner_tool_inputs": result["scanner_tool_inputs"]
         }
 
-    graph = StateGraph(ScannerStructurerState)
-    graph.add_node("scanner_input_structurer", scanner_input_structurer)
+    async def initial_pentest_state() -> dict:
+        """Scrape the target, derive scanner inputs and run the scanner."""
+        website_scrape = await fetch_initial_scrape(url)
 
-    graph.add_edge(START, "scanner_input_structurer")
-    graph.add_edge("scanner_input_structurer", END)
+        graph = StateGraph(ScannerStructurerState)
+        graph.add_node("scanner_input_structurer", timed("scanner_input_structurer", scanner_input_structurer))
+
+        graph.add_edge(START, "scanner_input_structurer")
+        graph.add_edge("scanner_input_structurer", END)
+
+        workflow = graph.compile()
+
+        state = await workflow.ainvoke(
+            {
+                "messages": [
+                    HumanMessage(content="Generate structured scanner inputs from website scrape")
+                ],
+                "url": url,
+                "goal": goal,
+                "website_scrape": website_scrape,
+                "scanner_tool_inputs": None,
+            }
+        )
+        scanner_inputs = state["scanner_tool_inputs"]
 
-    workflow = graph.compile()
+        initial_scan_report = await run_scanner_tool(scanner_inputs)
 
-    state = await workflow.ainvoke(
-        {
+        return {
             "messages": [
-                HumanMessage(content="Generate structured scanner inputs from website scrape")
+                HumanMessage(content=f"Target URL: {url}\nGoal: {goal}"),
+                AIMessage(content=f"Scanner Report:\n{initial_scan_report}")
             ],
+            "tries": 0,
+            "should_terminate": False,
+            "reason": "",
             "url": url,
-            "goal": goal,
-            "website_scrape": website_scrape,
-            "scanner_tool_inputs": None,
+            "attempts": [],
+            "recommendation": {},
+            "successful_payload": None,
+            "payloads": [],
+            "structured_response": None,
+            "raw_attacker_output": None,
+            "raw_planner_output": None,
+            "raw_critic_output": None,
+            "initial_scan_report": initial_scan_report,  # Pass the scan report
+            "goal": goal
         }
-    )
-    scanner_inputs = state["scanner_tool_inputs"]
-    
 
-    
-    initial_scan_report = await run_scanner_tool(scanner_inputs)
-
-    
-    flag = True
-    while flag:
+    if checkpoint.values and not checkpoint.next:
+        print(f"[checkpoint] {thread_id} already finished its pentest loop; going straight to the report")
+        pentest_result = checkpoint.values
+    elif checkpoint.values:
+        payload_index.record_attempts(campaign_attempts.resolve(checkpoint.values.get("attempts", [])))
+        print(f"[checkpoint] resuming {thread_id} at {', '.join(checkpoint.next)} (try #{checkpoint.values.get('tries', 0) + 1})")
+        pentest_result = None
+        pentest_input = None
+    else:
+        pentest_result = None
+        pentest_input = await initial_pentest_state()
+
+    while pentest_result is None:
         try:
-            pentest_result = await pentest_agents.ainvoke(
-                {
-                    "messages": [
-                        HumanMessage(content=f"Target URL: {url}\nGoal: {goal}"),
-                        AIMessage(content=f"Scanner Report:\n{initial_scan_report}")
-                    ],
-                    "tries": 0,
-                    "should_terminate": False,
-                    "reason": "",
-                    "url": url,
-                    "attempts": [],
-                    "recommendation": {},
-                    "successful_payload": None,
-                    "payloads": [],
-                    "structured_response": None,
-                    "raw_attacker_output": None,
-                    "raw_planner_output": None,
-                    "raw_critic_output": None,
-                    "initial_scan_report": initial_scan_report,  # Pass the scan report
-                    "goal": goal
-                },
-                {"recursion_limit": 100},
-            )
-            flag = False
+            pentest_result = await pentest_agents.ainvoke(pentest_input, config)
         except OutputParserException as e:
             print("\n--- INVALID JSON FROM MODEL ---")
             print(e.llm_output)
             print("--------------------------------")
+            # Continue from the last checkpoint rather than from tries 0:
+            # only the failed node runs again.
+            print(f"[checkpoint] resuming {thread_id} from its last completed node")
+            pentest_input = None
     
     # ============================================================================
     # STEP 4: Generate report
@@ -455,12 +875,50 @@ NOTE: Do NOT terminate to request re-scanning. The scanner has already run and c
     print("STEP 4: GENERATING REPORT")
     print(f"{'='*80}\n")
     
-    await report_writer_agent.ainvoke(pentest_result)
+    pentest_result = with_attempts(pentest_result)
+    with metrics.timer("node_latency.report_writer_agent"), tracer.span("node", "report_writer_agent"):
+        await report_writer_agent.ainvoke(pentest_result, {"callbacks": [tool_trace_handler]})
     
     print(f"\n{'='*80}")
     print("PENTEST COMPLETE")
     print(f"{'='*80}\n")
 
+    return pentest_result
+
+
+async def main():
+    args = parse_args()
+    if args.ollama_hosts:
+        llm_pool.configure(args.ollama_hosts)
+    if args.profiles:
+        model_profiles.load(args.profiles)
+    if args.trace:
+        tracer.configure(args.trace)
+    if args.record or args.replay:
+        recorder.configure(record=args.record, replay=args.replay, latency=args.replay_latency)
+    goal = input('Input goal: ')
+
+    try:
+        await run_campaign(
+            args.url,
+            goal,
+            args.model,
+            single_pass=args.single_pass,
+            thread_id=args.thread_id,
+            speculative_critic=args.speculative_critic,
+            direct_attacker=args.direct_attacker,
+        )
+    finally:
+        await startup.wait()
+        await mcp_pool.close()
+        await http_client.close()
+        await checkpoints.close()
+        print_structured_output_stats()
+        model_profiles.print_latency_report()
+        metrics.print_summary()
+        tracer.close()
+        recorder.close()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
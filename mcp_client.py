@@ -1,10 +1,16 @@
+import asyncio
+import hashlib
 import json
+import os
+import time
 
 from dotenv import load_dotenv
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_core.tools import StructuredTool, ToolException
 from langchain_openai import ChatOpenAI
 # from langchain_ollama import ChatOllama
 from langchain_ollama.chat_models import ChatOllama
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import get_default_environment, stdio_client
 
 
 load_dotenv()
@@ -13,6 +19,9 @@ load_dotenv()
 # model = ChatOllama(model="mistral:7b-instruct")
 model=ChatOllama(model="qwen3:14b")
 
+MCP_CACHE_DIR = os.environ.get("MCP_CACHE_DIR", ".mcp_cache")
+MCP_CALL_TIMEOUT = float(os.environ.get("MCP_CALL_TIMEOUT", 120))
+
 
 def load_mcp_servers_from_json(json_path):
     with open(json_path, "r") as f:
@@ -26,9 +35,248 @@ def load_mcp_servers_from_json(json_path):
     return servers
 
 
+class MCPServerHandle:
+    """
+    One long-lived stdio MCP server and its ClientSession.
+
+    The stdio transport is entered and exited inside a dedicated runner task
+    (anyio cancel scopes must be closed by the task that opened them), so the
+    session stays open across graph steps until stop() is called or the
+    server process dies.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        params: dict,
+        health_interval: float = 30.0,
+        call_timeout: float = MCP_CALL_TIMEOUT,
+    ) -> None:
+        self.key = key
+        self.params = params
+        self.health_interval = health_interval
+        self.call_timeout = call_timeout
+        self.session: ClientSession | None = None
+        self.restarts = 0
+        self._runner: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self._lock = asyncio.Lock()
+        self._last_ok = 0.0
+
+    @property
+    def fingerprint(self) -> str:
+        raw = json.dumps(self.params, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()[:16]
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.session is not None
+            and self._runner is not None
+            and not self._runner.done()
+        )
+
+    def _server_parameters(self) -> StdioServerParameters:
+        env = get_default_environment()
+        env.update(self.params.get("env") or {})
+        return StdioServerParameters(
+            command=self.params["command"],
+            args=self.params.get("args", []),
+            env=env,
+        )
+
+    async def _run(self, ready: asyncio.Future) -> None:
+        try:
+            async with stdio_client(self._server_parameters()) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._last_ok = time.monotonic()
+                    ready.set_result(None)
+                    await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"[mcp] server '{self.key}' exited: {e!r}")
+        finally:
+            self.session = None
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self.alive:
+                return
+            await self._shutdown_runner()
+            start = time.perf_counter()
+            self._stop = asyncio.Event()
+            ready = asyncio.get_running_loop().create_future()
+            self._runner = asyncio.create_task(self._run(ready), name=f"mcp:{self.key}")
+            await ready
+            print(f"[mcp] started '{self.key}' in {time.perf_counter() - start:.2f}s")
+
+    async def restart(self) -> None:
+        self.restarts += 1
+        print(f"[mcp] restarting '{self.key}' (restart #{self.restarts})")
+        async with self._lock:
+            await self._shutdown_runner()
+        await self.start()
+
+    async def check_health(self, timeout: float = 5.0) -> bool:
+        """Ping the server; restart it if the ping fails or the process is gone."""
+        if self.alive:
+            try:
+                await asyncio.wait_for(self.session.send_ping(), timeout)
+                self._last_ok = time.monotonic()
+                return True
+            except Exception as e:
+                print(f"[mcp] health check failed for '{self.key}': {e!r}")
+        await self.restart()
+        return self.alive
+
+    async def list_tools(self) -> list[dict]:
+        await self.start()
+        result = await self.session.list_tools()
+        return [
+            {
+                "name": tool.name,
+                "description": tool.description or "",
+                "inputSchema": tool.inputSchema,
+            }
+            for tool in result.tools
+        ]
+
+    async def call_tool(self, name: str, arguments: dict):
+        """Call a tool, restarting the server once if the call fails or hangs past call_timeout."""
+        if not self.alive:
+            await self.start()
+        elif time.monotonic() - self._last_ok > self.health_interval:
+            await self.check_health()
+
+        try:
+            result = await asyncio.wait_for(self.session.call_tool(name, arguments), self.call_timeout)
+        except Exception as e:
+            print(f"[mcp] call to '{self.key}.{name}' failed: {e!r}")
+            await self.restart()
+            result = await asyncio.wait_for(self.session.call_tool(name, arguments), self.call_timeout)
+        self._last_ok = time.monotonic()
+        return result
+
+    async def _shutdown_runner(self) -> None:
+        if self._runner is None:
+            return
+        if self._stop is not None:
+            self._stop.set()
+        try:
+            await asyncio.wait_for(self._runner, timeout=5)
+        except BaseException:
+            self._runner.cancel()
+        self._runner = None
+        self.session = None
+
+    async def stop(self) -> None:
+        async with self._lock:
+            await self._shutdown_runner()
+
+
+class MCPSessionPool:
+    """
+    Process-wide pool of MCP servers keyed by server key.
+
+    Each server is started at most once and reused by every get_mcp_tools()
+    caller. Tool schemas are cached on disk per server configuration, so later
+    runs build their LangChain tools without the listing handshake and only
+    boot the server when a tool is actually called.
+    """
+
+    def __init__(self, cache_dir: str = MCP_CACHE_DIR) -> None:
+        self.cache_dir = cache_dir
+        self.handles: dict[str, MCPServerHandle] = {}
+        self._tools: dict[str, list[StructuredTool]] = {}
+
+    async def handle(self, key: str, params: dict) -> MCPServerHandle:
+        """The pooled handle for ``key``; a handle with stale params is stopped and replaced."""
+        handle = self.handles.get(key)
+        if handle is not None and handle.params != params:
+            print(f"[mcp] configuration of '{key}' changed; stopping the old server")
+            await handle.stop()
+            self._tools.pop(key, None)
+            handle = None
+        if handle is None:
+            handle = MCPServerHandle(key, params)
+            self.handles[key] = handle
+        return handle
+
+    def _cache_path(self, handle: MCPServerHandle) -> str:
+        return os.path.join(self.cache_dir, f"{handle.key}-{handle.fingerprint}.json")
+
+    def _load_cached_schemas(self, handle: MCPServerHandle) -> list[dict] | None:
+        try:
+            with open(self._cache_path(handle), "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _store_schemas(self, handle: MCPServerHandle, schemas: list[dict]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._cache_path(handle), "w") as f:
+            json.dump(schemas, f, indent=2)
+
+    def _make_tool(self, handle: MCPServerHandle, schema: dict) -> StructuredTool:
+        tool_name = schema["name"]
+
+        async def call(**arguments):
+            result = await handle.call_tool(tool_name, arguments)
+            text = "\n".join(
+                block.text for block in result.content if getattr(block, "text", None)
+            )
+            if result.isError:
+                raise ToolException(text)
+            return text
+
+        return StructuredTool(
+            name=tool_name,
+            description=schema["description"],
+            args_schema=schema["inputSchema"],
+            coroutine=call,
+        )
+
+    async def tools_for(self, key: str, params: dict, refresh: bool = False) -> list[StructuredTool]:
+        handle = await self.handle(key, params)
+        if not refresh and key in self._tools:
+            return self._tools[key]
+
+        schemas = None if refresh else self._load_cached_schemas(handle)
+        if schemas is None:
+            schemas = await handle.list_tools()
+            self._store_schemas(handle, schemas)
+        else:
+            print(f"[mcp] using cached tool schemas for '{key}'")
+
+        self._tools[key] = [self._make_tool(handle, schema) for schema in schemas]
+        return self._tools[key]
+
+    async def start(self, json_path: str) -> None:
+        """Eagerly boot every server listed in ``json_path``."""
+        servers = load_mcp_servers_from_json(json_path)
+        handles = [await self.handle(key, params) for key, params in servers.items()]
+        await asyncio.gather(*(handle.start() for handle in handles))
+
+    async def check_health(self) -> dict[str, bool]:
+        keys = list(self.handles)
+        results = await asyncio.gather(*(self.handles[k].check_health() for k in keys))
+        return dict(zip(keys, results))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(handle.stop() for handle in self.handles.values()))
+
+
+mcp_pool = MCPSessionPool()
+
+
 async def get_mcp_tools(json_path="mcp.json"):
-    client = MultiServerMCPClient(load_mcp_servers_from_json(json_path))
-    tools = await client.get_tools()
+    tools = []
+    for key, params in load_mcp_servers_from_json(json_path).items():
+        tools += await mcp_pool.tools_for(key, params)
     print("Loaded tools from MCP server")
     for tool in tools:
         print(f"Tool: {tool.name}, Description: {tool.description}")
@@ -0,0 +1,60 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class RunMetrics:
+    """In-process counters and timers shared by every component of a run."""
+
+    def __init__(self) -> None:
+        self.counters: dict[str, float] = defaultdict(float)
+        self.timings: dict[str, list[float]] = defaultdict(list)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        self.timings[name].append(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def mean(self, name: str) -> float:
+        values = self.timings.get(name) or []
+        return sum(values) / len(values) if values else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "timings": {
+                name: {
+                    "count": len(values),
+                    "total": sum(values),
+                    "mean": sum(values) / len(values) if values else 0.0,
+                    "max": max(values) if values else 0.0,
+                }
+                for name, values in self.timings.items()
+            },
+        }
+
+    def print_summary(self, title: str = "RUN METRICS") -> None:
+        snap = self.snapshot()
+        print(f"\n{'='*80}")
+        print(title)
+        print(f"{'='*80}")
+        for name, value in sorted(snap["counters"].items()):
+            print(f"  {name}: {value:g}")
+        for name, stats in sorted(snap["timings"].items()):
+            print(
+                f"  {name}: n={stats['count']} mean={stats['mean']:.3f}s "
+                f"max={stats['max']:.3f}s total={stats['total']:.3f}s"
+            )
+        print(f"{'='*80}\n")
+
+
+metrics = RunMetrics()
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+from typing import Any, Optional
+from urllib.parse import unquote, urlsplit
+
+from metrics import metrics
+
+
+# Off by default: consecutive steps of a blind extraction ("^abc" then
+# "^abd") are near duplicates by any textual measure, yet both must be sent.
+NEAR_DUPLICATE_SIMILARITY = (
+    float(os.environ["PAYLOAD_NEAR_DUPLICATE_SIMILARITY"]) if os.environ.get("PAYLOAD_NEAR_DUPLICATE_SIMILARITY") else None
+)
+# How many times in a row a plan with nothing new is sent back to the planner.
+MAX_REPLANS = int(os.environ.get("PAYLOAD_MAX_REPLANS", 2))
+DIGEST_OUTCOME_CHARS = 120
+
+
+def canonical_endpoint(url: str) -> str:
+    parts = urlsplit(url or "")
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/') or '/'}"
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {unquote(str(k)).strip(): _canonical_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_canonical_value(v) for v in value]
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if text[:1] in ("{", "["):
+        try:
+            return _canonical_value(json.loads(text))
+        except ValueError:
+            pass
+    # Whitespace runs and URL-encoded operators ("%24ne") do not change what
+    # the injection does. Quotes are kept: in $where and string-concatenation
+    # contexts the quote character is the injection.
+    return re.sub(r"\s+", " ", unquote(text))
+
+
+def canonicalize(payloads: dict[str, Any]) -> str:
+    """One payload set ({field: payload}) as a canonical string."""
+    return json.dumps(
+        {str(field): _canonical_value(value) for field, value in payloads.items()},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+
+
+def _shingles(text: str) -> frozenset:
+    return frozenset(text[i:i + 3] for i in range(max(1, len(text) - 2)))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _plan_payload_sets(payload: dict) -> dict[str, Any]:
+    """A PlannerPayload's field_names/payloads lists as {field: payload}."""
+    return dict(zip(payload.get("field_names") or [], payload.get("payloads") or []))
+
+
+class PayloadIndex:
+    """
+    Fingerprints of the payloads a campaign has already sent, per (endpoint,
+    field set). Payloads are canonicalized first (JSON operator objects parsed
+    and key-sorted, whitespace collapsed, %-decoded), so a re-planned payload
+    is caught even when it is spelled differently. Only exact canonical
+    duplicates are skipped unless ``near_duplicate_similarity`` is set; then
+    sets whose character trigrams are at least that alike count as near
+    duplicates too.
+
+    Fed with each attacker round's attempts, and with all of a checkpoint's
+    attempts when a campaign resumes.
+    """
+
+    def __init__(self, near_duplicate_similarity: Optional[float] = NEAR_DUPLICATE_SIMILARITY) -> None:
+        self.similarity = near_duplicate_similarity
+        # (endpoint, fields) -> canonical payload set -> (trigrams, latest outcome)
+        self._groups: dict[tuple, dict[str, tuple[frozenset, str]]] = {}
+
+    @staticmethod
+    def _group_key(endpoint: str, payloads: dict) -> tuple:
+        return canonical_endpoint(endpoint), tuple(sorted(str(f) for f in payloads))
+
+    def record(self, endpoint: str, payloads: dict, outcome: str = "") -> None:
+        if not isinstance(payloads, dict) or not payloads:
+            return
+        canonical = canonicalize(payloads)
+        self._groups.setdefault(self._group_key(endpoint, payloads), {})[canonical] = (
+            _shingles(canonical), outcome
+        )
+
+    def record_attempts(self, attempts: list[dict]) -> None:
+        """Index AttackAttempt entries (idempotent; later outcomes replace earlier ones)."""
+        for attempt in attempts:
+            if not isinstance(attempt, dict):
+                continue
+            outcome = " | ".join(
+                str(attempt[k]) for k in ("notes", "response_excerpt") if attempt.get(k)
+            )
+            self.record(
+                attempt.get("entry_point") or attempt.get("page_url") or "",
+                attempt.get("payloads"),
+                outcome[:DIGEST_OUTCOME_CHARS],
+            )
+
+    def seen(self, endpoint: str, payloads: dict) -> Optional[str]:
+        """"exact" or "near" if this payload set was already sent to ``endpoint``, else None."""
+        group = self._groups.get(self._group_key(endpoint, payloads))
+        if not group:
+            return None
+        canonical = canonicalize(payloads)
+        if canonical in group:
+            return "exact"
+        if self.similarity is None:
+            return None
+        shingles = _shingles(canonical)
+        if any(_similarity(shingles, other) >= self.similarity for other, _ in group.values()):
+            return "near"
+        return None
+
+    def filter_plans(self, plans: list) -> list:
+        """
+        Drop planned payloads that were already sent (or repeat one planned
+        earlier in the same list); plans left without payloads are dropped.
+        """
+        planned = PayloadIndex(self.similarity)
+        kept_plans, dropped = [], 0
+        for plan in plans:
+            if not isinstance(plan, dict) or not isinstance(plan.get("payloads"), list):
+                kept_plans.append(plan)
+                continue
+            endpoint = plan.get("endpoint") or ""
+            kept = []
+            for payload in plan["payloads"]:
+                payload_sets = _plan_payload_sets(payload) if isinstance(payload, dict) else {}
+                duplicate = payload_sets and (
+                    self.seen(endpoint, payload_sets) or planned.seen(endpoint, payload_sets)
+                )
+                if duplicate:
+                    dropped += 1
+                    metrics.incr(f"payload_index.{duplicate}_duplicates")
+                    print(f"[payload_index] skipping {duplicate} duplicate: {canonicalize(payload_sets)[:120]}")
+                    continue
+                planned.record(endpoint, payload_sets)
+                kept.append(payload)
+            if kept:
+                kept_plans.append({**plan, "payloads": kept})
+        if dropped:
+            total = dropped + sum(len(p.get("payloads", [])) for p in kept_plans if isinstance(p, dict))
+            print(f"[payload_index] dropped {dropped} of {total} planned payloads as already tried")
+        return kept_plans
+
+    def digest(self) -> list[dict]:
+        """Compact "already tried" summary for the planner prompt."""
+        return [
+            {
+                "endpoint": endpoint,
+                "fields": list(fields),
+                "tried": [
+                    {"payloads": json.loads(canonical), "outcome": outcome} if outcome
+                    else {"payloads": json.loads(canonical)}
+                    for canonical, (_, outcome) in group.items()
+                ],
+            }
+            for (endpoint, fields), group in self._groups.items()
+        ]
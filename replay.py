@@ -0,0 +1,220 @@
+"""
+Record/replay of LLM and HTTP traffic, for benchmarking the orchestration
+offline and without the noise of a live model or target.
+
+    python main.py <url> <model> --record run.cassette.jsonl
+    python main.py <url> <model> --replay run.cassette.jsonl [--replay-latency zero]
+
+(or $RECORD_FILE / $REPLAY_FILE / $REPLAY_LATENCY). Recording captures every
+Ollama chat request, every HTTP exchange made by the web toolkit, the
+requests_* tools, SeleniumWrapper.make_post_request and the initial scrape,
+and every scanner run. Replay serves them back in recorded order per
+request, sleeping the recorded latency ("recorded", the default) or not at
+all ("zero"). A request that was never recorded raises ReplayMiss.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.cookies import SimpleCookie
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from metrics import metrics
+
+
+class ReplayMiss(KeyError):
+    """Raised in replay mode for a request that is not in the cassette."""
+
+
+def _strip_ids(value: Any) -> Any:
+    # Tool-call ids are random per run; they must not change the request key.
+    if isinstance(value, dict):
+        return {k: _strip_ids(v) for k, v in value.items() if k not in ("id", "tool_call_id")}
+    if isinstance(value, list):
+        return [_strip_ids(v) for v in value]
+    return value
+
+
+def request_key(kind: str, *parts: Any) -> str:
+    blob = json.dumps([kind, *(_strip_ids(p) for p in parts)], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _encode_body(content: bytes) -> dict:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode()}
+
+
+def _decode_body(record: dict) -> bytes:
+    if "body_b64" in record:
+        return base64.b64decode(record["body_b64"])
+    return record.get("body", "").encode("utf-8")
+
+
+def _response_record(response: requests.Response) -> dict:
+    return {
+        "status": response.status_code,
+        "url": response.url,
+        "headers": dict(response.headers),
+        **_encode_body(response.content),
+        "history": [_response_record(r) for r in response.history],
+    }
+
+
+def _rebuild_response(record: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = record["status"]
+    response.url = record["url"]
+    response.headers = CaseInsensitiveDict(record["headers"])
+    response._content = _decode_body(record)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+    response.history = [_rebuild_response(r) for r in record.get("history", [])]
+    if "Set-Cookie" in response.headers:
+        cookie = SimpleCookie()
+        cookie.load(response.headers["Set-Cookie"])
+        for name, morsel in cookie.items():
+            response.cookies.set(name, morsel.value)
+    return response
+
+
+class TrafficRecorder:
+    """Process-wide recorder/replayer; a pass-through unless configured."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._file = None
+        self.mode: Optional[str] = None
+        self.latency = "recorded"
+        self._entries: dict[str, deque] = {}
+
+    def configure(self, record: Optional[str] = None, replay: Optional[str] = None, latency: str = "recorded") -> None:
+        if record and replay:
+            raise ValueError("Choose either record or replay, not both")
+        if latency not in ("recorded", "zero"):
+            raise ValueError(f"Unknown replay latency '{latency}' (expected 'recorded' or 'zero')")
+        self.close()
+        self.latency = latency
+        if record:
+            self.mode = "record"
+            self._file = open(record, "a", encoding="utf-8")
+        elif replay:
+            self.mode = "replay"
+            entries = defaultdict(deque)
+            with open(replay, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["key"]].append(entry)
+            self._entries = dict(entries)
+            print(f"[replay] loaded {sum(len(v) for v in entries.values())} exchanges from {replay}")
+        else:
+            self.mode = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+
+    def _write(self, kind: str, key: str, request: dict, response: Any, latency: Any) -> None:
+        line = json.dumps(
+            {"kind": kind, "key": key, "request": request, "response": response, "latency": latency},
+            default=str,
+        )
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+        metrics.incr(f"replay.recorded.{kind}")
+
+    def _next(self, kind: str, key: str, request: dict) -> dict:
+        with self._lock:
+            queue = self._entries.get(key)
+            if not queue:
+                metrics.incr(f"replay.misses.{kind}")
+                raise ReplayMiss(f"No recorded {kind} exchange for {json.dumps(request, default=str)[:300]}")
+            # Repeated identical requests get the recorded answers in order;
+            # the last one is reused once they run out.
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        metrics.incr(f"replay.served.{kind}")
+        return entry
+
+    # ------------------------------------------------------------------ HTTP
+
+    def http(self, method: str, url: str, send: Callable[[], requests.Response], body: Any = None) -> requests.Response:
+        """A requests-level exchange (sync; called from tool threads)."""
+        if self.mode is None:
+            return send()
+        request = {"method": method, "url": url, "body": body}
+        key = request_key("http", method, url, body)
+        if self.mode == "replay":
+            entry = self._next("http", key, request)
+            if self.latency == "recorded":
+                time.sleep(entry["latency"])
+            return _rebuild_response(entry["response"])
+        start = time.perf_counter()
+        response = send()
+        self._write("http", key, request, _response_record(response), time.perf_counter() - start)
+        return response
+
+    async def text(self, kind: str, request: dict, call: Callable[[], Awaitable[Any]]) -> Any:
+        """An exchange whose result is plain text or JSON (requests_* tools, scanner)."""
+        if self.mode is None:
+            return await call()
+        key = request_key(kind, request)
+        if self.mode == "replay":
+            entry = self._next(kind, key, request)
+            if self.latency == "recorded":
+                await asyncio.sleep(entry["latency"])
+            return entry["response"]
+        start = time.perf_counter()
+        result = await call()
+        self._write(kind, key, request, result, time.perf_counter() - start)
+        return result
+
+    # ------------------------------------------------------------------- LLM
+
+    async def llm(self, chat_params: dict, stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """An Ollama chat request; recorded chunks are replayed with their timing."""
+        if self.mode is None:
+            async for part in stream():
+                yield part
+            return
+
+        from ollama import ChatResponse
+
+        key = request_key("llm", chat_params)
+        request = {"model": chat_params.get("model"), "messages": len(chat_params.get("messages") or [])}
+        if self.mode == "replay":
+            entry = self._next("llm", key, request)
+            start = time.perf_counter()
+            for part, offset in zip(entry["response"], entry["latency"]):
+                if self.latency == "recorded":
+                    await asyncio.sleep(max(0.0, offset - (time.perf_counter() - start)))
+                yield part if isinstance(part, str) else ChatResponse.model_validate(part)
+            return
+
+        parts, offsets = [], []
+        start = time.perf_counter()
+        async for part in stream():
+            parts.append(part if isinstance(part, str) else part.model_dump(mode="json"))
+            offsets.append(time.perf_counter() - start)
+            yield part
+        self._write("llm", key, request, parts, offsets)
+
+
+recorder = TrafficRecorder()
+recorder.configure(
+    record=os.environ.get("RECORD_FILE"),
+    replay=os.environ.get("REPLAY_FILE"),
+    latency=os.environ.get("REPLAY_LATENCY", "recorded"),
+)
@@ -0,0 +1,197 @@
+import difflib
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from metrics import metrics
+from payload_index import canonical_endpoint, canonicalize
+from success_detector import DEFAULT_VARIANT
+
+
+# Headers that differ between any two responses and say nothing about the payload.
+VOLATILE_HEADERS = {"date", "content-length", "etag", "last-modified", "age", "expires", "x-request-id", "cf-ray", "report-to", "nel"}
+MAX_KEY_PATHS = 12
+MAX_TEXT_SPANS = 5
+SPAN_CHARS = 120
+DIFF_TOKENS = 4000
+
+_VOLATILE_TOKEN = re.compile(r"\b[0-9a-fA-F]{16,}\b|\b\d{9,}\b")
+_TAG = re.compile(r"<[^>]+>")
+
+
+@dataclass
+class Snapshot:
+    status: Optional[int]
+    headers: dict[str, str]
+    body: str
+    json: Any = None
+
+    @classmethod
+    def of(cls, status: Optional[int], headers: Optional[dict], body: str) -> "Snapshot":
+        try:
+            parsed = json.loads(body) if body.lstrip()[:1] in ("{", "[") else None
+        except ValueError:
+            parsed = None
+        return cls(status, {k.lower(): v for k, v in (headers or {}).items()}, body, parsed)
+
+
+def _key_paths(value: Any, prefix: str = "") -> dict[str, Any]:
+    """Flatten JSON into {"user.roles[0]": leaf}."""
+    if isinstance(value, dict):
+        paths = {}
+        for key, child in value.items():
+            paths.update(_key_paths(child, f"{prefix}.{key}" if prefix else str(key)))
+        return paths or {prefix: {}}
+    if isinstance(value, list):
+        paths = {}
+        for idx, child in enumerate(value):
+            paths.update(_key_paths(child, f"{prefix}[{idx}]"))
+        return paths or {prefix: []}
+    return {prefix: value}
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= SPAN_CHARS else text[:SPAN_CHARS] + "..."
+
+
+def _tokens(body: str) -> list[str]:
+    return _VOLATILE_TOKEN.sub("#", _TAG.sub(" ", body)).split()[:DIFF_TOKENS]
+
+
+def diff(baseline: Snapshot, response: Snapshot) -> dict:
+    """Compact structured delta of ``response`` against ``baseline``."""
+    delta: dict[str, Any] = {}
+    if baseline.status is not None and response.status is not None and baseline.status != response.status:
+        delta["status"] = [baseline.status, response.status]
+
+    # Text-only tool responses have no headers; only compare when both do.
+    if baseline.headers and response.headers:
+        names = (set(baseline.headers) | set(response.headers)) - VOLATILE_HEADERS
+        headers = {
+            "added": sorted(n for n in names if n not in baseline.headers),
+            "removed": sorted(n for n in names if n not in response.headers),
+            "changed": {
+                n: [_clip(baseline.headers[n]), _clip(response.headers[n])]
+                for n in sorted(names)
+                if n in baseline.headers and n in response.headers
+                and n != "set-cookie" and baseline.headers[n] != response.headers[n]
+            },
+        }
+        headers = {k: v for k, v in headers.items() if v}
+        if headers:
+            delta["headers"] = headers
+
+    if len(baseline.body) != len(response.body):
+        delta["length"] = [len(baseline.body), len(response.body)]
+
+    if baseline.json is not None or response.json is not None:
+        before = _key_paths(baseline.json) if baseline.json is not None else {}
+        after = _key_paths(response.json) if response.json is not None else {}
+        paths = {
+            "added": {p: after[p] for p in after if p not in before},
+            "removed": sorted(p for p in before if p not in after),
+            "changed": {p: [before[p], after[p]] for p in after if p in before and before[p] != after[p]},
+        }
+        paths = {
+            kind: dict(list(v.items())[:MAX_KEY_PATHS]) if isinstance(v, dict) else v[:MAX_KEY_PATHS]
+            for kind, v in paths.items() if v
+        }
+        if paths:
+            delta["json"] = paths
+    else:
+        old, new = _tokens(baseline.body), _tokens(response.body)
+        spans = []
+        for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+            if op == "equal":
+                continue
+            span = {}
+            if i2 > i1:
+                span["-"] = _clip(" ".join(old[i1:i2]))
+            if j2 > j1:
+                span["+"] = _clip(" ".join(new[j1:j2]))
+            spans.append(span)
+            if len(spans) >= MAX_TEXT_SPANS:
+                break
+        if spans:
+            delta["text"] = spans
+
+    return delta or {"same_as_baseline": True}
+
+
+class ResponseDiffEngine:
+    """
+    Baseline responses per (endpoint, field set, variant), where the variant
+    is the "<method> <encoding>" the baseline was sent with, and the delta of
+    every attack response against its baseline, keyed by (endpoint,
+    canonical payload) so attacker_structurer can attach them to its attempts.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._baselines: dict[tuple, Snapshot] = {}
+        self._deltas: dict[tuple, dict] = {}
+
+    @staticmethod
+    def _baseline_key(url: str, fields, variant: str) -> tuple:
+        return canonical_endpoint(url), tuple(sorted(str(f) for f in fields)), variant
+
+    def has_baseline(self, url: str, fields, variant: str = DEFAULT_VARIANT) -> bool:
+        with self._lock:
+            return self._baseline_key(url, fields, variant) in self._baselines
+
+    def set_baseline(
+        self,
+        url: str,
+        fields,
+        status: Optional[int],
+        headers: Optional[dict],
+        body: str,
+        variant: str = DEFAULT_VARIANT,
+    ) -> None:
+        with self._lock:
+            self._baselines.setdefault(self._baseline_key(url, fields, variant), Snapshot.of(status, headers, body))
+
+    def observe(
+        self,
+        url: str,
+        payload: Any,
+        status: Optional[int],
+        headers: Optional[dict],
+        body: str,
+        variant: str = DEFAULT_VARIANT,
+    ) -> Optional[dict]:
+        """Diff an attack response against its baseline (same variant) and keep the delta for its attempt."""
+        if not isinstance(payload, dict) or not payload:
+            return None
+        with self._lock:
+            baseline = self._baselines.get(self._baseline_key(url, payload, variant))
+        if baseline is None:
+            metrics.incr("response_diff.no_baseline")
+            return None
+        delta = diff(baseline, Snapshot.of(status, headers, body))
+        with self._lock:
+            self._deltas[(canonical_endpoint(url), canonicalize(payload))] = delta
+        metrics.incr("response_diff.deltas")
+        return delta
+
+    def delta_for(self, url: str, payload: Any) -> Optional[dict]:
+        if not isinstance(payload, dict) or not payload:
+            return None
+        with self._lock:
+            return self._deltas.get((canonical_endpoint(url), canonicalize(payload)))
+
+    def annotate(self, attempts: list[dict]) -> None:
+        """Attach the recorded delta to each AttackAttempt as "response_delta"."""
+        for attempt in attempts:
+            if not isinstance(attempt, dict):
+                continue
+            for url in (attempt.get("entry_point"), attempt.get("page_url")):
+                delta = self.delta_for(url or "", attempt.get("payloads"))
+                if delta is not None:
+                    attempt["response_delta"] = delta
+                    break
+
+
+response_diff = ResponseDiffEngine()
@@ -258,10 +258,10 @@ Return the endpoint URL and 5 payloads.
             
             try:
                 field_names = payload_obj["field_names"]
-                payloads = payload_obj["payloads"]
+                values = payload_obj["payloads"]
 
                 parsed_payloads = []
-                for item in lst:
+                for item in values:
                     try:
                         parsed = json.loads(item)
                         parsed_payloads.append(parsed)
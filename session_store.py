@@ -0,0 +1,202 @@
+import ipaddress
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.cookiejar import CookieJar
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.cookies import RequestsCookieJar, create_cookie, get_cookie_header
+
+from limits import host_of
+from metrics import metrics
+
+
+def _cookie_domain(host: str) -> str:
+    # http.cookiejar files host-only cookies of dotless hosts under "<host>.local".
+    if "." in host:
+        return host
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        return f"{host}.local"
+
+
+class SessionStore:
+    """
+    One campaign's cookie jar, shared by its async HTTP requests (web
+    toolkit, requests_* tools, fire_payloads) and its browser's requests
+    session. Cookies are scoped by domain, so each target has its own session.
+
+    Whenever a target's cookies change, listeners get (host, changed cookie
+    names, source). The browser listens and copies the session into the
+    driver on its next navigation, so a login or bypass found by any tool
+    is reused by all of them without logging in again.
+    """
+
+    def __init__(self, name: str = "default") -> None:
+        self.name = name
+        self.jar = RequestsCookieJar()
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, dict[str, str]] = {}
+        self._listeners: list[weakref.WeakMethod | Callable] = []
+
+    def subscribe(self, listener: Callable[[str, list[str], str], None]) -> None:
+        """Call ``listener(host, changed, source)`` on every change; bound methods are held weakly."""
+        with self._lock:
+            self._listeners.append(weakref.WeakMethod(listener) if hasattr(listener, "__self__") else listener)
+
+    def cookies_for(self, url: str) -> dict[str, str]:
+        """The cookies a request to ``url`` would send."""
+        header = get_cookie_header(self.jar, requests.Request("GET", url)) or ""
+        return dict(part.split("=", 1) for part in header.split("; ") if "=" in part)
+
+    def extract(self, response: httpx.Response) -> None:
+        """
+        Store the Set-Cookie headers of ``response`` and its redirect hops.
+        The live client already did this; replayed responses never went
+        through it. Extracting twice is harmless.
+        """
+        for hop in [*response.history, response]:
+            self.extract_set_cookie(str(hop.url), hop.headers.get_list("set-cookie"))
+
+    def extract_set_cookie(self, url: str, values: list[str]) -> None:
+        """Store Set-Cookie header values received from ``url``."""
+        if values:
+            stub = httpx.Response(200, headers=[("set-cookie", v) for v in values], request=httpx.Request("GET", url))
+            httpx.Cookies(self.jar).extract_cookies(stub)
+
+    def set_cookies(self, url: str, cookies: Iterable[dict], source: str) -> None:
+        """Store cookies given as {name, value, domain?, path?, secure?} (the browser's format)."""
+        host = urlparse(url).hostname or ""
+        for cookie in cookies:
+            domain = cookie.get("domain") or _cookie_domain(host)
+            self.jar.set_cookie(create_cookie(
+                cookie["name"],
+                cookie["value"],
+                domain=domain if domain.startswith(".") else _cookie_domain(domain),
+                path=cookie.get("path", "/"),
+                secure=bool(cookie.get("secure", False)),
+            ))
+        self.sync(url, source)
+
+    def sync(self, url: str, source: str) -> None:
+        """Publish a change event if the target's cookies differ from the last ones seen."""
+        parsed = urlparse(url)
+        root = f"{parsed.scheme or 'http'}://{parsed.netloc}/"
+        current = self.cookies_for(root)
+        host = host_of(url)
+        with self._lock:
+            previous = self._snapshots.get(host, {})
+            if current == previous:
+                return
+            self._snapshots[host] = current
+            listeners = list(self._listeners)
+        changed = sorted(name for name in set(current) | set(previous) if current.get(name) != previous.get(name))
+        metrics.incr("session_store.updates")
+        print(f"[session] {host}: {', '.join(changed)} updated by {source}")
+
+        for ref in listeners:
+            listener = ref() if isinstance(ref, weakref.WeakMethod) else ref
+            if listener is not None:
+                listener(host, changed, source)
+        with self._lock:
+            self._listeners = [
+                ref for ref in self._listeners if not (isinstance(ref, weakref.WeakMethod) and ref() is None)
+            ]
+
+
+_current_store: ContextVar[Optional[SessionStore]] = ContextVar("session_store", default=None)
+
+
+class CampaignCookieJar(CookieJar):
+    """
+    A cookie jar that forwards to the current campaign's jar, so the one
+    shared httpx client (and its redirect handling) reads and stores
+    cookies per campaign.
+    """
+
+    def __init__(self, resolve: Callable[[], CookieJar]) -> None:
+        super().__init__()
+        self._resolve = resolve
+
+    def add_cookie_header(self, request) -> None:
+        self._resolve().add_cookie_header(request)
+
+    def extract_cookies(self, response, request) -> None:
+        self._resolve().extract_cookies(response, request)
+
+    def make_cookies(self, response, request):
+        return self._resolve().make_cookies(response, request)
+
+    def set_cookie_if_ok(self, cookie, request) -> None:
+        self._resolve().set_cookie_if_ok(cookie, request)
+
+    def set_cookie(self, cookie) -> None:
+        self._resolve().set_cookie(cookie)
+
+    def clear(self, domain=None, path=None, name=None) -> None:
+        self._resolve().clear(domain, path, name)
+
+    def clear_session_cookies(self) -> None:
+        self._resolve().clear_session_cookies()
+
+    def clear_expired_cookies(self) -> None:
+        self._resolve().clear_expired_cookies()
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self) -> int:
+        return len(self._resolve())
+
+
+class CampaignSessions:
+    """
+    One SessionStore per campaign. run_campaign opens its store with
+    campaign(), which makes it current in the campaign's context (the way
+    the tracer tracks the current span), so concurrent campaigns against the
+    same host never send each other's cookies. The methods below act on the
+    current campaign's store; outside a campaign a process default is used.
+    """
+
+    def __init__(self) -> None:
+        self.default = SessionStore()
+        self.jar = CampaignCookieJar(lambda: self.current().jar)
+
+    def current(self) -> SessionStore:
+        return _current_store.get() or self.default
+
+    @contextmanager
+    def campaign(self, name: str):
+        """Give the code run in this block (and the tasks it starts) a fresh cookie jar."""
+        token = _current_store.set(SessionStore(name))
+        try:
+            yield _current_store.get()
+        finally:
+            _current_store.reset(token)
+
+    def subscribe(self, listener: Callable[[str, list[str], str], None]) -> None:
+        self.current().subscribe(listener)
+
+    def cookies_for(self, url: str) -> dict[str, str]:
+        return self.current().cookies_for(url)
+
+    def extract(self, response: httpx.Response) -> None:
+        self.current().extract(response)
+
+    def extract_set_cookie(self, url: str, values: list[str]) -> None:
+        self.current().extract_set_cookie(url, values)
+
+    def set_cookies(self, url: str, cookies: Iterable[dict], source: str) -> None:
+        self.current().set_cookies(url, cookies, source)
+
+    def sync(self, url: str, source: str) -> None:
+        self.current().sync(url, source)
+
+
+session_store = CampaignSessions()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from typing import Awaitable
+
+from agents.llm_pool import llm_pool
+from agents.profiles import model_profiles
+from campaign_clock import start_campaign_clock
+from mcp_client import mcp_pool
+from metrics import metrics
+from replay import recorder
+
+
+EMBEDDING_MODEL = "nomic-embed-text"
+DEFAULT_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Only the pentest loop's tools; the scanner runs outside the MCP servers.
+MCP_CONFIGS = ("planner_mcp.json",)
+
+
+def campaign_models(default_model: str) -> dict[str, str]:
+    """Every chat model a campaign on ``default_model`` can call, with its keep_alive."""
+    models = {default_model: model_profiles.default.get("keep_alive", DEFAULT_KEEP_ALIVE)}
+    for node in model_profiles.nodes:
+        model, options = model_profiles.resolve(node, default_model)
+        models.setdefault(model, options.get("keep_alive", DEFAULT_KEEP_ALIVE))
+    return models
+
+
+class StartupOrchestrator:
+    """
+    Overlaps the slow one-time startup work with the start of a campaign:
+    loading every model in use into Ollama (with keep_alive so it stays
+    resident), the RAG vector store and the MCP servers. Each piece runs at
+    most once per process in a background task, so the initial scrape and the
+    scanner-input LLM call proceed while the rest warms up; whoever needs a
+    piece later (planner tools, first LLM call) joins the task in flight.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def _launch(self, name: str, work: Awaitable) -> None:
+        if name in self._tasks:
+            work.close()
+            return
+        self._tasks[name] = asyncio.create_task(self._timed(name, work))
+
+    async def _timed(self, name: str, work: Awaitable) -> None:
+        start = time.perf_counter()
+        try:
+            await work
+        except Exception as e:
+            print(f"[startup] {name} failed: {e!r}")
+            metrics.incr("startup.failures")
+            return
+        elapsed = time.perf_counter() - start
+        metrics.observe(f"startup.{name.split(':')[0]}_seconds", elapsed)
+        print(f"[startup] {name} ready in {elapsed:.2f}s")
+
+    async def _warm_model(self, model: str, keep_alive: str, embedding: bool = False) -> None:
+        await llm_pool.refresh(force=True)
+        endpoints = [
+            e for e in llm_pool.endpoints
+            if e.healthy and (not e.available_models or model in e.available_models)
+        ]
+        for endpoint in endpoints:
+            endpoint.outstanding += 1
+        try:
+            # An empty generate/embed request only loads the model.
+            await asyncio.gather(*(
+                endpoint.client.embed(model=model, input="", keep_alive=keep_alive)
+                if embedding else
+                endpoint.client.generate(model=model, prompt="", keep_alive=keep_alive)
+                for endpoint in endpoints
+            ))
+        finally:
+            for endpoint in endpoints:
+                endpoint.outstanding -= 1
+        for endpoint in endpoints:
+            endpoint.loaded_models.add(model)
+
+    async def _load_rag(self) -> None:
+        from tools.all_tools import get_nosqli_rag_tool
+        await asyncio.to_thread(get_nosqli_rag_tool)
+
+    def begin_campaign(self, default_model: str) -> None:
+        """Start the campaign's clock and any startup work not already running."""
+        start_campaign_clock()
+        # A replayed run never talks to Ollama, so there is nothing to warm.
+        if recorder.mode != "replay":
+            for model, keep_alive in campaign_models(default_model).items():
+                self._launch(f"model_warmup:{model}", self._warm_model(model, keep_alive))
+            self._launch(f"model_warmup:{EMBEDDING_MODEL}", self._warm_model(EMBEDDING_MODEL, DEFAULT_KEEP_ALIVE, embedding=True))
+        self._launch("rag_load", self._load_rag())
+        for config in MCP_CONFIGS:
+            self._launch(f"mcp_boot:{config}", mcp_pool.start(config))
+
+    async def wait(self) -> None:
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+startup = StartupOrchestrator()
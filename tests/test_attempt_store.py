@@ -0,0 +1,63 @@
+from attempt_store import CampaignAttempts, attempt_ref
+
+
+PAGE = "http://127.0.0.1:3000/level1/"
+
+
+def attempt(payloads, excerpt="Status: 401\nResponse: denied", page=PAGE):
+    return {
+        "entry_point": f"{page}login",
+        "page_url": page,
+        "payloads": payloads,
+        "response_excerpt": excerpt,
+        "notes": "",
+    }
+
+
+def test_ref_ignores_payload_key_order():
+    a = attempt({"username": {"$ne": None}, "password": "x"})
+    b = attempt({"password": "x", "username": {"$ne": None}})
+    assert attempt_ref(a) == attempt_ref(b)
+    assert attempt_ref(a) != attempt_ref(attempt({"username": "admin", "password": "x"}))
+
+
+def test_merge_attaches_analysis_to_the_matching_attempt():
+    attempts = CampaignAttempts("t")
+    ref = attempts.upsert(attempt({"username": {"$ne": None}}))
+    other = attempts.upsert(attempt({"username": "admin"}))
+
+    merged = attempts.merge({"page_url": PAGE, "payloads": {"username": {"$ne": None}}, "analysis": "filtered"})
+    assert merged == ref
+    assert attempts.resolve([ref])[0]["analysis"] == "filtered"
+    assert "analysis" not in attempts.resolve([other])[0]
+
+
+def test_merge_of_unknown_attempt_is_ignored():
+    attempts = CampaignAttempts("t")
+    attempts.upsert(attempt({"username": "admin"}))
+    assert attempts.merge({"page_url": PAGE, "payloads": {"username": "root"}, "analysis": "?"}) is None
+    assert attempts.merge({"page_url": f"{PAGE}other", "payloads": {"username": "admin"}, "analysis": "?"}) is None
+
+
+def test_resolve_keeps_order_and_skips_unknown_refs():
+    attempts = CampaignAttempts("t")
+    first = attempts.upsert(attempt({"username": "a"}))
+    second = attempts.upsert(attempt({"username": "b"}))
+    resolved = attempts.resolve([second, "0" * 16, first])
+    assert [a["payloads"] for a in resolved] == [{"username": "b"}, {"username": "a"}]
+
+
+def test_new_response_clears_stale_analysis():
+    attempts = CampaignAttempts("t")
+    payloads = {"username": {"$ne": None}}
+    ref = attempts.upsert(attempt(payloads))
+    attempts.merge({"page_url": PAGE, "payloads": payloads, "analysis": "rejected with 401"})
+
+    # Re-sending with the same response keeps the analysis.
+    assert attempts.upsert(attempt(payloads)) == ref
+    assert attempts.resolve([ref])[0]["analysis"] == "rejected with 401"
+
+    attempts.upsert(attempt(payloads, excerpt="Status: 200\nResponse: welcome back"))
+    stored = attempts.resolve([ref])[0]
+    assert stored["response_excerpt"].startswith("Status: 200")
+    assert "analysis" not in stored
@@ -0,0 +1,35 @@
+import asyncio
+from contextvars import ContextVar
+
+import pytest
+
+from http_client import SharedHttpClient
+
+
+campaign: ContextVar[str] = ContextVar("campaign", default="none")
+
+
+async def where():
+    return asyncio.get_running_loop(), campaign.get()
+
+
+def test_sync_callers_share_one_background_loop():
+    client = SharedHttpClient()
+    first, _ = client.run_sync(where())
+    second, _ = client.run_sync(where())
+    assert first is second
+
+
+def test_worker_threads_run_on_the_client_loop_with_their_context():
+    client = SharedHttpClient()
+
+    async def main():
+        client.get()
+        campaign.set("a")
+        loop, name = await asyncio.to_thread(client.run_sync, where())
+        with pytest.raises(RuntimeError):
+            client.run_sync(where())
+        await client.close()
+        return loop is asyncio.get_running_loop(), name
+
+    assert asyncio.run(main()) == (True, "a")
@@ -0,0 +1,79 @@
+import pytest
+
+from limits import (
+    AIMD_DECREASE,
+    AIMD_MIN_RATE,
+    DECREASE_COOLDOWN,
+    ConcurrencyLimits,
+    HostRate,
+)
+
+
+URL = "http://127.0.0.1:3000/level1/login"
+
+
+def healthy(rate, now, count):
+    for i in range(count):
+        assert rate.feedback(now + i * 0.01, 200, 0.05, error=False, retry_after=None) is None
+
+
+def test_healthy_responses_raise_the_rate():
+    rate = HostRate(10, 100, adaptive=True)
+    healthy(rate, 0.0, 1)
+    assert rate.rate > 10
+    previous = rate.rate
+    healthy(rate, 1.0, 50)
+    assert rate.rate > previous
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_throttling_cuts_the_rate_multiplicatively(status):
+    rate = HostRate(40, 100, adaptive=True)
+    assert rate.feedback(10.0, status, 0.05, error=False, retry_after=None) == f"status {status}"
+    assert rate.rate == pytest.approx(40 * AIMD_DECREASE)
+    # A burst of errors within the cooldown counts once.
+    assert rate.feedback(10.0 + DECREASE_COOLDOWN / 2, status, 0.05, error=False, retry_after=None) is None
+    assert rate.rate == pytest.approx(40 * AIMD_DECREASE)
+    rate.feedback(10.0 + DECREASE_COOLDOWN, status, 0.05, error=False, retry_after=None)
+    assert rate.rate == pytest.approx(40 * AIMD_DECREASE ** 2)
+    assert rate.decreases == 2
+
+
+def test_rate_never_drops_below_the_minimum():
+    rate = HostRate(1, 100, adaptive=True)
+    for i in range(20):
+        rate.feedback(10.0 + i * DECREASE_COOLDOWN, 503, None, error=False, retry_after=None)
+    assert rate.rate == AIMD_MIN_RATE
+
+
+def test_rate_never_exceeds_the_per_host_ceiling():
+    limits = ConcurrencyLimits(per_host_rate=12, adaptive_rate=True)
+    for _ in range(500):
+        limits.feedback(URL, 200, 0.05)
+    assert limits.current_rate(URL) == 12
+
+    rate = HostRate(50, 12, adaptive=True)
+    assert rate.rate == 12
+    healthy(rate, 0.0, 100)
+    assert rate.rate == 12
+
+
+def test_fixed_rate_does_not_adapt():
+    limits = ConcurrencyLimits(per_host_rate=5, adaptive_rate=False)
+    for status in (200, 429, 503, 200):
+        limits.feedback(URL, status, 0.05)
+    limits.feedback(URL, error=True)
+    assert limits.current_rate(URL) == 5
+
+
+def test_no_rate_without_a_cap_or_adaptation():
+    limits = ConcurrencyLimits(per_host_rate=0, adaptive_rate=False)
+    assert limits.current_rate(URL) is None
+
+
+def test_reserve_spaces_slots_and_honours_retry_after():
+    rate = HostRate(4, 4, adaptive=False)
+    assert [rate.reserve(0.0) for _ in range(3)] == [0.0, 0.25, 0.5]
+    rate.feedback(0.0, 429, None, error=False, retry_after=2.0)
+    assert rate.rate == 4
+    assert rate.reserve(0.0) == 2.0
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+llm_cache_module = pytest.importorskip("agents.llm_cache")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return llm_cache_module.LLMResponseCache(path=str(tmp_path / "cache.db"))
+
+
+def test_concurrent_identical_calls_share_one_computation(cache):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"decision": "replan", "suggestions": ["a"]}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("k", "m", "CriticOutput", compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r == {"decision": "replan", "suggestions": ["a"]} for r in results)
+    # Each caller gets its own copy.
+    results[1]["suggestions"].append("b")
+    assert results[2]["suggestions"] == ["a"]
+    assert cache.get("k") == {"decision": "replan", "suggestions": ["a"]}
+
+
+def test_failed_computation_is_not_cached(cache):
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ValueError("bad json")
+
+    async def run():
+        return await asyncio.gather(
+            *(cache.get_or_compute("k", "m", "CriticOutput", failing) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert cache.get("k") is None
+    assert not cache._inflight
+
+    async def compute():
+        return {"ok": True}
+
+    assert asyncio.run(cache.get_or_compute("k", "m", "CriticOutput", compute)) == {"ok": True}
+    assert cache.get("k") == {"ok": True}
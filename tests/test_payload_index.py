@@ -0,0 +1,55 @@
+from payload_index import PayloadIndex, canonicalize
+
+
+URL = "http://127.0.0.1:3000/level2/login"
+
+
+def plan(*values, field="password"):
+    return {
+        "endpoint": URL,
+        "payloads": [{"field_names": [field], "payloads": [v], "description": ""} for v in values],
+    }
+
+
+def test_canonicalize_ignores_spelling():
+    assert canonicalize({"u": '{"$ne": null}'}) == canonicalize({"u": {"$ne": None}})
+    assert canonicalize({"u": "%24ne"}) == canonicalize({"u": "$ne"})
+    assert canonicalize({"u": "a  b"}) == canonicalize({"u": "a b"})
+    assert canonicalize({"b": 1, "a": 2}) == canonicalize({"a": 2, "b": 1})
+
+
+def test_canonicalize_keeps_quote_style():
+    assert canonicalize({"u": "a\"b"}) != canonicalize({"u": "a'b"})
+    assert canonicalize({"u": "' || '1'=='1"}) != canonicalize({"u": "\" || \"1\"==\"1"})
+
+
+def test_seen_exact_and_near():
+    index = PayloadIndex()
+    index.record(URL, {"password": {"$regex": "^S3cure-Adm1n-P"}})
+    assert index.seen(URL + "/", {"password": '{"$regex": "^S3cure-Adm1n-P"}'}) == "exact"
+    assert index.seen(URL, {"password": {"$regex": "^S3cure-Adm1n-Pa"}}) is None
+    assert index.seen(URL, {"username": {"$regex": "^S3cure-Adm1n-P"}}) is None
+
+    near = PayloadIndex(near_duplicate_similarity=0.85)
+    near.record(URL, {"password": {"$regex": "^S3cure-Adm1n-P"}})
+    assert near.seen(URL, {"password": {"$regex": "^S3cure-Adm1n-Pa"}}) == "near"
+
+
+def test_filter_plans_keeps_blind_extraction_steps():
+    index = PayloadIndex()
+    index.record(URL, {"password": {"$regex": "^S3cure-Adm1n-P"}})
+    index.record(URL, {"password": {"$where": "this.password.length > 5"}})
+    kept = index.filter_plans([plan(
+        {"$regex": "^S3cure-Adm1n-Pa"},
+        {"$regex": "^S3cure-Adm1n-Pb"},
+        {"$where": "this.password.length > 6"},
+    )])
+    assert len(kept[0]["payloads"]) == 3
+
+
+def test_filter_plans_drops_exact_duplicates():
+    index = PayloadIndex()
+    index.record(URL, {"password": {"$ne": None}})
+    kept = index.filter_plans([plan('{"$ne": null}', {"$gt": ""}, {"$gt": ""})])
+    assert [p["payloads"] for p in kept[0]["payloads"]] == [[{"$gt": ""}]]
+    assert index.filter_plans([plan({"$ne": None})]) == []
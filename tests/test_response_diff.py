@@ -0,0 +1,83 @@
+import json
+
+from response_diff import ResponseDiffEngine, Snapshot, diff
+
+
+URL = "http://127.0.0.1:3000/level1/login"
+JSON_HEADERS = {"Content-Type": "application/json", "Date": "Mon, 01 Jan 2024 00:00:00 GMT"}
+HTML_HEADERS = {"Content-Type": "text/html"}
+DENIED = json.dumps({"error": "invalid credentials"})
+LOGIN_PAGE = "<html><body><h1>Login</h1><p>Invalid username or password</p></body></html>"
+
+
+def test_identical_responses_are_same_as_baseline():
+    baseline = Snapshot.of(401, JSON_HEADERS, DENIED)
+    # Volatile headers and volatile tokens do not count as differences.
+    response = Snapshot.of(401, {**JSON_HEADERS, "Date": "Tue, 02 Jan 2024 00:00:00 GMT"}, DENIED)
+    assert diff(baseline, response) == {"same_as_baseline": True}
+    html = Snapshot.of(200, HTML_HEADERS, LOGIN_PAGE.replace("Login", "Login 1700000001"))
+    assert diff(Snapshot.of(200, HTML_HEADERS, LOGIN_PAGE.replace("Login", "Login 1700000000")), html) == {
+        "same_as_baseline": True
+    }
+
+
+def test_length_change_is_reported():
+    delta = diff(Snapshot.of(200, None, "abc def"), Snapshot.of(200, None, "abc def ghi"))
+    assert delta["length"] == [7, 11]
+    assert delta["text"] == [{"+": "ghi"}]
+    assert "status" not in delta
+
+
+def test_status_change_is_reported():
+    delta = diff(Snapshot.of(401, JSON_HEADERS, DENIED), Snapshot.of(500, JSON_HEADERS, DENIED))
+    assert delta == {"status": [401, 500]}
+
+
+def test_structural_json_difference():
+    baseline = Snapshot.of(401, JSON_HEADERS, DENIED)
+    response = Snapshot.of(
+        200,
+        {**JSON_HEADERS, "Set-Cookie": "session=abc"},
+        json.dumps({"user": {"name": "admin", "roles": ["admin"]}, "error": None}),
+    )
+    delta = diff(baseline, response)
+    assert delta["status"] == [401, 200]
+    assert delta["headers"] == {"added": ["set-cookie"]}
+    assert delta["json"]["added"] == {"user.name": "admin", "user.roles[0]": "admin"}
+    assert delta["json"]["changed"] == {"error": ["invalid credentials", None]}
+    assert "text" not in delta
+
+
+def test_structural_html_difference():
+    welcome = "<html><body><h1>Dashboard</h1><p>Welcome back admin</p></body></html>"
+    delta = diff(Snapshot.of(200, HTML_HEADERS, LOGIN_PAGE), Snapshot.of(200, HTML_HEADERS, welcome))
+    assert "json" not in delta
+    # Markup is dropped; only the changed words are reported.
+    assert delta["text"] == [{"-": "Login Invalid username or password", "+": "Dashboard Welcome back admin"}]
+    assert delta["length"] == [len(LOGIN_PAGE), len(welcome)]
+
+
+def test_annotate_attaches_deltas_per_variant():
+    engine = ResponseDiffEngine()
+    fields = ["username", "password"]
+    engine.set_baseline(URL, fields, 401, JSON_HEADERS, DENIED)
+    engine.set_baseline(URL, fields, 200, HTML_HEADERS, LOGIN_PAGE, variant="POST form")
+
+    payload = {"username": {"$ne": None}, "password": {"$ne": None}}
+    assert engine.observe(URL, payload, 200, JSON_HEADERS, json.dumps({"token": "t"}))["status"] == [401, 200]
+    form_payload = {"username": "admin", "password": "x"}
+    assert engine.observe(URL, form_payload, 200, HTML_HEADERS, LOGIN_PAGE, variant="POST form") == {
+        "same_as_baseline": True
+    }
+    # No baseline for this field set.
+    assert engine.observe(URL, {"q": "x"}, 200, JSON_HEADERS, DENIED) is None
+
+    attempts = [
+        {"entry_point": URL, "page_url": "http://127.0.0.1:3000/level1/", "payloads": dict(reversed(payload.items()))},
+        {"entry_point": URL, "page_url": "http://127.0.0.1:3000/level1/", "payloads": form_payload},
+        {"entry_point": URL, "page_url": "http://127.0.0.1:3000/level1/", "payloads": {"q": "x"}},
+    ]
+    engine.annotate(attempts)
+    assert attempts[0]["response_delta"]["json"]["added"] == {"token": "t"}
+    assert attempts[1]["response_delta"] == {"same_as_baseline": True}
+    assert "response_delta" not in attempts[2]
@@ -1,5 +1,7 @@
 from typing import TypedDict, Optional, Union, Annotated
+import asyncio
 import os
+import threading
 from langchain_chroma import Chroma
 import json
 from langchain_core.documents import Document
@@ -25,9 +27,12 @@ from tools.selenium.selenium import (
     SeleniumWrapper,
 )
 from langchain.tools.base import BaseTool
-from typing import List
+from artifacts import artifact_store
+from http_client import http_client
+from typing import Any, Dict, List
 from mcp_client import get_mcp_tools
-from tools.web_toolkit import Toolkit
+from tools.fire_payloads import FirePayloadsTool
+from tools.web_toolkit import Toolkit, ensure_form_baseline, observe_response
 
 class PentestState(AgentStateWithStructuredResponse):
     tries: int
@@ -35,7 +40,7 @@ class PentestState(AgentStateWithStructuredResponse):
     reason: str
     url: str
     entry_point: str
-    attempts: list[dict[str, Union[dict, str]]]
+    attempts: list[str]  # refs into the campaign's attempt_store
     recommendation: dict
     successful_payload: Union[None, dict[str, str]]
     payloads: list
@@ -167,14 +172,54 @@ def rag(json_path: str, name: str, description: str):
     print("RAG initialization complete!")
     return retriever_tool
 
-nosqli_rag_tool = rag(
-    json_path="nosqli_docs.json", 
-    name="retrieve_nosqli_information",
-    description="Search and return information about NoSQL Injection and payloads from NoSQL Injection Cheat Sheets.",
-)
+_rag_lock = threading.Lock()
+_nosqli_rag_tool = None
+
+
+def get_nosqli_rag_tool():
+    """Build the NoSQLi retriever tool on first use (the vector store load is slow)."""
+    global _nosqli_rag_tool
+    with _rag_lock:
+        if _nosqli_rag_tool is None:
+            _nosqli_rag_tool = rag(
+                json_path="nosqli_docs.json", 
+                name="retrieve_nosqli_information",
+                description="Search and return information about NoSQL Injection and payloads from NoSQL Injection Cheat Sheets.",
+            )
+    return _nosqli_rag_tool
+
+class HostLimitedRequestsWrapper(TextRequestsWrapper):
+    """
+    TextRequestsWrapper whose async requests go through the shared HTTP
+    client (per-host caps and rate, "http" spans, traffic recorder, the
+    shared session cookies) and whose responses are fed to the success
+    detector. Large responses reach the agent as artifact digests.
+    """
+
+    async def _request(self, method: str, url: str, data: Any = None, **kwargs) -> str:
+        variant = await ensure_form_baseline(url, data, method=method) if isinstance(data, dict) and data else None
+        response = await http_client.request(method, url, json=data, headers=self.headers, **kwargs)
+        observe_response(url, response, payload=data, variant=variant or f"{method} json")
+        return artifact_store.offload(response.text, source=f"{method} {url}", status=response.status_code)
+
+    async def aget(self, url: str, **kwargs):
+        return await self._request("GET", url, **kwargs)
+
+    async def apost(self, url: str, data: Dict[str, Any], **kwargs):
+        return await self._request("POST", url, data, **kwargs)
+
+    async def apatch(self, url: str, data: Dict[str, Any], **kwargs):
+        return await self._request("PATCH", url, data, **kwargs)
+
+    async def aput(self, url: str, data: Dict[str, Any], **kwargs):
+        return await self._request("PUT", url, data, **kwargs)
+
+    async def adelete(self, url: str, **kwargs):
+        return await self._request("DELETE", url, **kwargs)
+
 
 requests_tools = RequestsToolkit(
-    requests_wrapper=TextRequestsWrapper(headers={}),
+    requests_wrapper=HostLimitedRequestsWrapper(headers={}),
     allow_dangerous_requests=True,
 ).get_tools()
 
@@ -199,12 +244,16 @@ async def scanner_input_tools():
     )
 
 async def planner_tools():
-    return (await get_mcp_tools("planner_mcp.json")) + [search_tool, nosqli_rag_tool]
+    mcp_tools, nosqli_rag_tool = await asyncio.gather(
+        get_mcp_tools("planner_mcp.json"),
+        asyncio.to_thread(get_nosqli_rag_tool),
+    )
+    return mcp_tools + [search_tool, nosqli_rag_tool]
 
 def attacker_tools():
     web_toolkit = Toolkit()
     web_tools = web_toolkit.get_tools()
-    return web_tools + requests_tools
+    return web_tools + [FirePayloadsTool()] + requests_tools
 
 def report_writer_tools():
     return file_management_tools + [search_tool]
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import asyncio
+import json
+from typing import Any, ClassVar, Dict, List, Literal, Optional, Type
+
+import httpx
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from http_client import http_client
+from response_diff import response_diff
+from success_detector import success_detector
+from tools.web_toolkit import encoded_request, ensure_form_baseline
+
+
+EXCERPT_CHARS = 300
+
+
+def decode_value(value: Any) -> Any:
+    """Planner payloads often carry operator objects as JSON strings; send them as objects."""
+    if isinstance(value, str) and value.strip()[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def planned_requests(payloads: List[Dict[str, Any]], endpoint: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Flatten PlannerOutput entries ({endpoint, payloads}), PlannerPayload
+    entries ({field_names, payloads, description}) or plain {field: value}
+    mappings into one {endpoint, data, description} per request.
+    """
+    requests = []
+    for item in payloads:
+        if not isinstance(item, dict):
+            continue
+        if isinstance(item.get("payloads"), list) and "field_names" not in item:
+            requests.extend(planned_requests(item["payloads"], item.get("endpoint") or endpoint))
+        elif "field_names" in item:
+            data = {
+                field: decode_value(value)
+                for field, value in zip(item.get("field_names") or [], item.get("payloads") or [])
+            }
+            requests.append({"endpoint": endpoint, "data": data, "description": item.get("description", "")})
+        else:
+            requests.append({"endpoint": endpoint, "data": {k: decode_value(v) for k, v in item.items()}, "description": ""})
+    return [r for r in requests if r["endpoint"] and r["data"]]
+
+
+async def send_payload(url: str, data: Dict[str, Any], encoding: str = "json") -> Dict[str, Any]:
+    """Send one payload set over the shared client; returns status, headers, body and elapsed_ms."""
+    method, kwargs = encoded_request(data, encoding)
+    response = await http_client.request(method, url, follow_redirects=False, **kwargs)
+    return {
+        "status": response.status_code,
+        "headers": dict(response.headers),
+        "body": response.text,
+        "elapsed_ms": response.extensions["elapsed_ms"],
+    }
+
+
+async def fire_payloads(
+    payloads: List[Dict[str, Any]],
+    endpoint: Optional[str] = None,
+    encoding: str = "json",
+) -> List[Dict[str, Any]]:
+    """
+    Send every planned payload concurrently (within the per-host caps) and
+    return one compact result per payload, with the success detector's
+    signals and the delta against the endpoint's baseline. Baselines are
+    taken with the same method and encoding as the attack.
+    """
+    requests = planned_requests(payloads, endpoint)
+    baselines = {(r["endpoint"], tuple(sorted(r["data"])), encoding): r for r in requests}
+    await asyncio.gather(*(ensure_form_baseline(r["endpoint"], r["data"], encoding) for r in baselines.values()))
+    variant = f"{encoded_request({}, encoding)[0]} {encoding}"
+
+    async def fire(index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+        url, data = request["endpoint"], request["data"]
+        result = {"index": index, "endpoint": url, "payloads": data, "encoding": encoding, "variant": variant}
+        if request["description"]:
+            result["description"] = request["description"]
+        try:
+            response = await send_payload(url, data, encoding)
+        except httpx.HTTPError as e:
+            return {**result, "error": f"{type(e).__name__}: {e}"}
+
+        body, headers = response["body"], response["headers"]
+        set_cookie = headers.get("set-cookie") or headers.get("Set-Cookie")
+        finding = success_detector.scan(
+            url,
+            body,
+            status=response["status"],
+            headers={"Set-Cookie": set_cookie} if set_cookie else None,
+            payload=data,
+            location=headers.get("location") or headers.get("Location"),
+            variant=variant,
+        )
+        delta = response_diff.observe(url, data, response["status"], headers, body, variant)
+        result.update(
+            status=response["status"],
+            length=len(body),
+            elapsed_ms=response["elapsed_ms"],
+            excerpt=body[:EXCERPT_CHARS],
+        )
+        if delta is not None:
+            result["response_delta"] = delta
+        if finding is not None:
+            result["signals"] = finding.signals
+            result["confidence"] = round(finding.confidence, 3)
+        return result
+
+    return await asyncio.gather(*(fire(i, r) for i, r in enumerate(requests)))
+
+
+def as_attempts(results: List[Dict[str, Any]], page_url: str) -> List[Dict[str, Any]]:
+    """fire_payloads results as AttackerOutput ``final_output`` entries."""
+    attempts = []
+    for result in results:
+        if "error" in result:
+            notes = f"{result['encoding']} request failed: {result['error']}"
+        else:
+            notes = f"{result['encoding']} request: status {result['status']}, {result['length']} bytes in {result['elapsed_ms']} ms"
+        if result.get("signals"):
+            notes += "; success signals: " + ", ".join(sorted(result["signals"]))
+        if result.get("description"):
+            notes += f"; tests: {result['description']}"
+        attempts.append({
+            "entry_point": result["endpoint"],
+            "page_url": page_url or result["endpoint"],
+            "payloads": result["payloads"],
+            "response_excerpt": result.get("excerpt", ""),
+            "notes": notes,
+            # Which baseline the detector compares the excerpt with.
+            "variant": result["variant"],
+        })
+    return attempts
+
+
+class FirePayloadsArgs(BaseModel):
+    payloads: List[Dict[str, Any]] = Field(
+        description="The planner's payloads list ({field_names, payloads, description} entries), "
+                    "whole PlannerOutput objects ({endpoint, payloads}), or plain {field: value} objects"
+    )
+    endpoint: Optional[str] = Field(default=None, description="Target URL, unless every entry carries its own endpoint")
+    encoding: Literal["json", "form", "query"] = Field(
+        default="json", description="Send each payload as a JSON body, a form body or GET query parameters"
+    )
+
+
+class FirePayloadsTool(BaseTool):
+    name: str = "fire_payloads"
+    description: str = (
+        "Sends a whole list of planned payloads at once, concurrently, and returns one compact JSON "
+        "result per payload (status, length, excerpt, success signals and the difference from a "
+        "baseline response). Prefer this over submitting payloads one by one."
+    )
+    args_schema: ClassVar[Type[BaseModel]] = FirePayloadsArgs
+
+    def _run(self, payloads: List[Dict[str, Any]], endpoint: Optional[str] = None, encoding: str = "json") -> str:
+        return http_client.run_sync(self._arun(payloads, endpoint, encoding))
+
+    async def _arun(self, payloads: List[Dict[str, Any]], endpoint: Optional[str] = None, encoding: str = "json") -> str:
+        results = await fire_payloads(payloads, endpoint, encoding)
+        if not results:
+            return "No payloads to send: give an endpoint and entries with field_names and payloads."
+        return json.dumps(results, default=str)
@@ -19,6 +19,9 @@ import validators
 from bs4 import BeautifulSoup
 from pydantic import BaseModel, Field
 
+from limits import host_of, limits
+from replay import recorder
+from session_store import session_store
 from tools.selenium.logging_actionchains import LoggingActionChains
 from tools.selenium.logging_webdriver import LoggingWebDriver
 from tools.selenium.selenium_code_generator import (
@@ -51,6 +54,9 @@ class SeleniumWrapper:
 
     def __init__(self, headless: bool = False) -> None:
         """Initialize Selenium and start interactive session."""
+        # Blocks until a browser slot is free (see limits.browser).
+        limits.browser.acquire()
+        self._holds_browser_slot = True
         chrome_options = Options()
 
         chrome_options.binary_location = "/usr/bin/chromium"
@@ -66,18 +72,61 @@ class SeleniumWrapper:
 
         clear_selenium_commands_log()
 
-        self.driver = LoggingWebDriver(options=chrome_options, service=service)
+        try:
+            self.driver = LoggingWebDriver(options=chrome_options, service=service)
+        except BaseException:
+            # Chrome never started: give the slot back now rather than in __del__.
+            self._holds_browser_slot = False
+            limits.browser.release()
+            raise
         self.driver.implicitly_wait(10)  # Wait 5 seconds for elements to load
         self.session = requests.Session()  # For making HTTP requests
+        # The campaign's cookie jar, shared with its HTTP tools and (via events) the browser.
+        self._sessions = session_store.current()
+        self.session.cookies = self._sessions.jar
+        self._stale_hosts: set[str] = set()
+        self._sessions.subscribe(self._on_session_change)
+
+    def _on_session_change(self, host: str, changed: List[str], source: str) -> None:
+        if source != "browser":
+            self._stale_hosts.add(host)
+
+    def _push_cookies(self, url: str) -> None:
+        """Copy the session's cookies for ``url`` into the browser (must be on its domain)."""
+        self._stale_hosts.discard(host_of(url))
+        for name, value in self._sessions.cookies_for(url).items():
+            self.driver.add_cookie({"name": name, "value": value, "path": "/"})
+
+    def _publish_cookies(self) -> None:
+        url = self.driver.current_url
+        if url.startswith("http"):
+            self._sessions.set_cookies(url, self.driver.get_cookies(), "browser")
+
+    def _navigate(self, url: str) -> None:
+        """driver.get(url), carrying over session cookies other tools got for its host."""
+        stale = host_of(url) in self._stale_hosts
+        if stale and host_of(self.driver.current_url) == host_of(url):
+            self._push_cookies(url)
+            stale = False
+        self.driver.get(url)
+        if stale:
+            # add_cookie only works on the cookie's own domain: load, set, reload.
+            self._push_cookies(url)
+            self.driver.get(url)
 
     def __del__(self) -> None:
         """Close Selenium session."""
         # output driver_logs to selenium_commands.log file
 
-        self.driver.close()
-        self.session.close()
-        wipe_selenium_code()
-        generate_selenium_code("selenium_commands.log", "selenium_code.py")
+        try:
+            self.driver.close()
+            self.session.close()
+            wipe_selenium_code()
+            generate_selenium_code("selenium_commands.log", "selenium_code.py")
+        finally:
+            if getattr(self, "_holds_browser_slot", False):
+                self._holds_browser_slot = False
+                limits.browser.release()
 
     def make_post_request(self, url: str, data: Optional[Dict[str, Any]] = None, 
                          json_data: Optional[Dict[str, Any]] = None, 
@@ -93,7 +142,7 @@ class SeleniumWrapper:
             json_data: JSON data to send (for application/json)
             headers: Additional headers to include in the request
             cookies: Additional cookies to include in the request
-            include_session_cookies: Whether to include cookies from the current browser session
+            include_session_cookies: Whether to send the shared session's cookies
             
         Returns:
             String containing the response status code and text/content
@@ -110,24 +159,21 @@ class SeleniumWrapper:
         if headers:
             request_headers.update(headers)
         
-        # Prepare cookies
-        request_cookies = {}
-        
-        if include_session_cookies:
-            # Get cookies from the current browser session
-            selenium_cookies = self.driver.get_cookies()
-            for cookie in selenium_cookies:
-                request_cookies[cookie['name']] = cookie['value']
+        # Session cookies come from the shared jar (self.session.cookies);
+        # these are only extra ones for this request.
+        request_cookies = dict(cookies or {})
+        send = self.session.post if include_session_cookies else requests.post
         
-        if cookies:
-            request_cookies.update(cookies)
-        
-        # Make the POST request
+        # Make the POST request (paced per host, through the traffic recorder)
+        def post(**kwargs):
+            return limits.send_sync(
+                url, lambda: recorder.http("POST", url, lambda: send(url, **kwargs), body=json_data or data)
+            )
+
         try:
             if json_data:
                 # Send as JSON
-                response = self.session.post(
-                    url, 
+                response = post(
                     json=json_data, 
                     headers=request_headers,
                     cookies=request_cookies if request_cookies else None,
@@ -135,8 +181,7 @@ class SeleniumWrapper:
                 )
             elif data:
                 # Send as form data
-                response = self.session.post(
-                    url, 
+                response = post(
                     data=data, 
                     headers=request_headers,
                     cookies=request_cookies if request_cookies else None,
@@ -144,8 +189,7 @@ class SeleniumWrapper:
                 )
             else:
                 # Send empty POST request
-                response = self.session.post(
-                    url, 
+                response = post(
                     headers=request_headers,
                     cookies=request_cookies if request_cookies else None,
                     timeout=30
@@ -164,11 +208,13 @@ class SeleniumWrapper:
             else:
                 result += f"Response Text: {response.text[:2000]}...\n" if len(response.text) > 2000 else f"Response Text: {response.text}\n"
             
-            # Update browser cookies if needed
-            if include_session_cookies:
-                # Update Selenium cookies with response cookies
-                for name, value in response.cookies.items():
-                    self.driver.add_cookie({'name': name, 'value': value})
+            if include_session_cookies and response.raw is None:
+                # Replayed responses never went through the session's jar.
+                for hop in [*response.history, response]:
+                    if hop.headers.get("Set-Cookie"):
+                        self._sessions.extract_set_cookie(hop.url, [hop.headers["Set-Cookie"]])
+            # The browser picks the new cookies up on its next navigation.
+            self._sessions.sync(url, "requests")
             
             return result
             
@@ -319,7 +365,7 @@ class SeleniumWrapper:
         if url:
             try:
                 self.driver.switch_to.window(self.driver.window_handles[-1])
-                self.driver.get(url)
+                self._navigate(url)
             except Exception:
                 return (
                     f"Cannot load website {url}. Make sure you input the correct and"
@@ -329,6 +375,8 @@ class SeleniumWrapper:
         # Let driver wait for website to load
         WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
         time.sleep(5)
+        # Logins done in the browser (clicks, form fills) become everyone's session.
+        self._publish_cookies()
 
 
         try:
@@ -439,7 +487,7 @@ class SeleniumWrapper:
         if url and url != self.driver.current_url and url.startswith("http"):
             try:
                 self.driver.switch_to.window(self.driver.window_handles[-1])
-                self.driver.get(url)
+                self._navigate(url)
                 # Let driver wait for website to load
                 time.sleep(5)
                 WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
@@ -638,7 +686,7 @@ class PostRequestInput(BaseModel):
     
     include_session_cookies: bool = Field(
         default=True,
-        description="Whether to include cookies from the current browser session"
+        description="Whether to include the shared session cookies (browser and HTTP tools)"
     )
 
 
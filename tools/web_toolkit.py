@@ -1,13 +1,94 @@
 from __future__ import annotations
-from typing import List, Dict, Any, Type, ClassVar
+from typing import List, Dict, Any, Optional, Type, ClassVar
 from pydantic import BaseModel
 from langchain_community.agent_toolkits.base import BaseToolkit
 from langchain_core.tools import BaseTool
 from pydantic.v1 import Extra
 
-import requests
+import asyncio
+import hashlib
+import httpx
 from bs4 import BeautifulSoup
 
+from artifacts import artifact_store
+from http_client import http_client
+from response_diff import response_diff
+from success_detector import DEFAULT_VARIANT, success_detector
+
+
+def observe_response(url: str, response: httpx.Response, payload: Any = None, variant: str = DEFAULT_VARIANT) -> None:
+    """
+    Hand a response to the success detector, including cookies set along
+    redirects, and diff attack responses against the endpoint's baseline
+    for the same ``variant`` (see ensure_form_baseline).
+    """
+    cookies = [c for r in [*response.history, response] for c in r.headers.get_list("set-cookie")]
+    status = (response.history or [response])[0].status_code
+    success_detector.scan(
+        url,
+        response.text,
+        status=status,
+        headers={"Set-Cookie": ", ".join(cookies)} if cookies else None,
+        payload=payload,
+        location=str(response.url) if response.history else None,
+        variant=variant,
+    )
+    response_diff.observe(url, payload, status, _first_headers(response), response.text, variant)
+
+
+def _first_headers(response: httpx.Response) -> dict:
+    # The first hop's headers carry Location and Set-Cookie of a login redirect.
+    return dict((response.history or [response])[0].headers)
+
+
+def encode_form(data: Dict[str, Any]) -> List[tuple]:
+    """Form/query pairs; operator objects become ``field[$op]=value`` as qs-style parsers expect."""
+    pairs = []
+    for field, value in data.items():
+        if isinstance(value, dict):
+            pairs.extend((f"{field}[{op}]", "" if v is None else str(v)) for op, v in value.items())
+        elif isinstance(value, list):
+            pairs.extend((f"{field}[]", str(v)) for v in value)
+        else:
+            pairs.append((field, "" if value is None else str(value)))
+    return pairs
+
+
+def encoded_request(data: Dict[str, Any], encoding: str = "json", method: Optional[str] = None) -> tuple[str, Dict[str, Any]]:
+    """(method, http_client.request kwargs) sending ``data`` as a JSON body, a form body or a query string."""
+    if encoding == "json":
+        return method or "POST", {"json": data}
+    if encoding == "form":
+        return method or "POST", {"data": dict(encode_form(data))}
+    if encoding == "query":
+        return method or "GET", {"params": encode_form(data)}
+    raise ValueError(f"unknown request encoding {encoding!r} (expected json, form or query)")
+
+
+async def ensure_form_baseline(url: str, data: Dict[str, Any], encoding: str = "json", method: Optional[str] = None) -> str:
+    """
+    Record how the endpoint answers a submission with junk values for the
+    same fields, sent the same way as the attack (method and encoding), and
+    return that baseline's variant key for the detector and the diff engine.
+    """
+    method, _ = encoded_request(data, encoding, method)
+    variant = f"{method} {encoding}"
+    if success_detector.has_baseline(url, variant) and response_diff.has_baseline(url, data, variant):
+        return variant
+    # Derived from the field, not random, so recorded runs replay the same probe.
+    probe = {key: f"zz{hashlib.sha256(f'{url}|{key}'.encode()).hexdigest()[:8]}" for key in data}
+    _, kwargs = encoded_request(probe, encoding, method)
+    try:
+        response = await http_client.request(method, url, timeout=10, **kwargs)
+    except httpx.HTTPError:
+        return variant
+    first = (response.history or [response])[0]
+    if not success_detector.has_baseline(url, variant):
+        cookies = {c.split("=", 1)[0].strip() for r in [*response.history, response] for c in r.headers.get_list("set-cookie")}
+        success_detector.set_baseline(url, first.status_code, response.text, cookies, variant)
+    response_diff.set_baseline(url, data, first.status_code, _first_headers(response), response.text, variant)
+    return variant
+
 
 class FetchPageArgs(BaseModel):
     url: str
@@ -34,19 +115,30 @@ class SubmitFormArgs(BaseModel):
     data: Dict[str, Any] = {}
 
 
+class ReadArtifactArgs(BaseModel):
+    handle: str
+    start: int = 0
+    length: int = 2000
+    selector: Optional[str] = None
+
+
 # --- Tools ---
 class FetchPageTool(BaseTool):
     name: str = "fetch_page"
-    description: str = "Fetches a web page HTML via GET request and returns the HTML as a string."
+    description: str = (
+        "Fetches a web page HTML via GET request and returns the HTML as a string. "
+        "Large pages come back as a digest with an artifact handle."
+    )
     args_schema: ClassVar[Type[BaseModel]] = FetchPageArgs
 
     def _run(self, url: str) -> str:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.text
+        return http_client.run_sync(self._arun(url))
 
     async def _arun(self, url: str) -> str:
-        return self._run(url)
+        response = await http_client.request("GET", url)
+        observe_response(url, response)
+        response.raise_for_status()
+        return artifact_store.offload(response.text, source=f"GET {url}", status=response.status_code)
 
 
 class ExtractTextTool(BaseTool):
@@ -55,7 +147,7 @@ class ExtractTextTool(BaseTool):
     args_schema: ClassVar[Type[BaseModel]] = ExtractTextArgs
 
     def _run(self, html: str) -> str:
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(artifact_store.resolve(html), "html.parser")
         return soup.get_text(separator="\n", strip=True)
 
     async def _arun(self, html: str) -> str:
@@ -64,11 +156,11 @@ class ExtractTextTool(BaseTool):
 
 class ExtractHTMLTool(BaseTool):
     name: str = "extract_html"
-    description: str = "Returns the full HTML (input unchanged)."
+    description: str = "Returns the full HTML (input unchanged); large HTML comes back as an artifact digest."
     args_schema: ClassVar[Type[BaseModel]] = ExtractHTMLArgs
 
     def _run(self, html: str) -> str:
-        return html
+        return artifact_store.offload(artifact_store.resolve(html))
 
     async def _arun(self, html: str) -> str:
         return self._run(html)
@@ -80,7 +172,7 @@ class ExtractLinksTool(BaseTool):
     args_schema: ClassVar[Type[BaseModel]] = ExtractLinksArgs
 
     def _run(self, html: str) -> List[str]:
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(artifact_store.resolve(html), "html.parser")
         return [a["href"] for a in soup.find_all("a", href=True)]
 
     async def _arun(self, html: str) -> List[str]:
@@ -93,7 +185,7 @@ class ParseFormTool(BaseTool):
     args_schema: ClassVar[Type[BaseModel]] = ParseFormArgs
 
     def _run(self, html: str) -> Dict[str, str]:
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(artifact_store.resolve(html), "html.parser")
         form = soup.find("form")
         if not form:
             return {}
@@ -110,11 +202,36 @@ class SubmitFormTool(BaseTool):
     args_schema: ClassVar[Type[BaseModel]] = SubmitFormArgs
 
     def _run(self, url: str, data: Dict[str, Any] = {}) -> str:
-        response = requests.post(url, json=data)
-        return f"Status: {response.status_code}\nResponse: {response.text}"
+        return http_client.run_sync(self._arun(url, data))
 
     async def _arun(self, url: str, data: Dict[str, Any] = {}) -> str:
-        return self._run(url, data)
+        variant = await ensure_form_baseline(url, data)
+        response = await http_client.request("POST", url, json=data)
+        observe_response(url, response, payload=data, variant=variant)
+        return artifact_store.offload(
+            f"Status: {response.status_code}\nResponse: {response.text}",
+            source=f"POST {url}",
+            status=response.status_code,
+        )
+
+
+class ReadArtifactTool(BaseTool):
+    name: str = "read_artifact"
+    description: str = (
+        "Reads part of a large tool output stored as an artifact. Args: handle (\"artifact:<hash>\" "
+        "from the digest), start and length (character range, default the first 2000), and an "
+        "optional CSS selector (e.g. \"form\", \"#error\") to read only the matching elements."
+    )
+    args_schema: ClassVar[Type[BaseModel]] = ReadArtifactArgs
+
+    def _run(self, handle: str, start: int = 0, length: int = 2000, selector: Optional[str] = None) -> str:
+        try:
+            return artifact_store.read(handle, start, length, selector)
+        except KeyError as e:
+            return str(e)
+
+    async def _arun(self, handle: str, start: int = 0, length: int = 2000, selector: Optional[str] = None) -> str:
+        return await asyncio.to_thread(self._run, handle, start, length, selector)
 
 
 class Toolkit(BaseToolkit):
@@ -129,5 +246,6 @@ class Toolkit(BaseToolkit):
             ExtractHTMLTool(),
             ExtractLinksTool(),
             ParseFormTool(),
-            SubmitFormTool()
+            SubmitFormTool(),
+            ReadArtifactTool(),
         ]
@@ -0,0 +1,301 @@
+"""
+Lightweight run tracing: nested spans written as JSON Lines.
+
+Spans are nested through a context variable, so a span opened inside a
+graph node (LLM request, tool call, HTTP request, scanner call) records the
+node as its parent, across asyncio tasks and asyncio.to_thread. Tracing is
+off unless a file is configured ($TRACE_FILE or --trace).
+
+Summarize a trace into a per-iteration critical-path breakdown:
+    python tracing.py trace.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "kind", "name", "attrs", "start", "_t0")
+
+    def __init__(self, tracer: "Tracer", kind: str, name: str, parent: Optional["Span"], attrs: dict) -> None:
+        self.tracer = tracer
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        self.tracer._write({
+            "trace": self.trace_id,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": self.start,
+            "duration": time.perf_counter() - self._t0,
+            "status": "error" if error else "ok",
+            "error": f"{type(error).__name__}: {error}" if error else None,
+            "attrs": self.attrs,
+        })
+
+
+class _NoopSpan:
+    span_id = None
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Process-wide JSONL span writer; a no-op until configured with a path."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self._file = None
+        self.configure(path)
+
+    def configure(self, path: Optional[str]) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.path = path
+            self._file = open(path, "a", encoding="utf-8") if path else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def current(self):
+        return _current_span.get() or NOOP_SPAN
+
+    def start_span(self, kind: str, name: str, **attrs: Any):
+        """Open a child of the current span without making it current (for generators)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, kind, name, _current_span.get(), attrs)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs: Any):
+        """Open a span as a child of the current one and make it current."""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = Span(self, kind, name, _current_span.get(), attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(e)
+            raise
+        else:
+            span.end()
+        finally:
+            _current_span.reset(token)
+
+    def close(self) -> None:
+        self.configure(None)
+
+
+tracer = Tracer(os.environ.get("TRACE_FILE"))
+
+
+class ToolTraceHandler(BaseCallbackHandler):
+    """
+    Opens a "tool" span for every LangChain tool call. Runs inline, so the
+    span becomes current inside the tool and its HTTP calls nest under it.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._spans: dict[Any, tuple] = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        if not tracer.enabled:
+            return
+        parent = _current_span.get()
+        span = Span(tracer, "tool", (serialized or {}).get("name", "tool"), parent, {"input_chars": len(str(input_str))})
+        self._spans[run_id] = (span, parent)
+        _current_span.set(span)
+
+    def _finish(self, run_id, error=None, **attrs) -> None:
+        span, parent = self._spans.pop(run_id, (None, None))
+        if span is None:
+            return
+        span.set(**attrs)
+        span.end(error)
+        _current_span.set(parent)
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._finish(run_id, output_chars=len(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id, error=error)
+
+
+tool_trace_handler = ToolTraceHandler()
+
+
+# ============================================================================
+# SUMMARY
+# ============================================================================
+# Where the wall time of each iteration went. When spans of several kinds
+# overlap, the segment is attributed to the first kind in this list, so the
+# breakdown adds up to wall time and shows what the loop was waiting on.
+CRITICAL_PATH_KINDS = ("llm", "scanner", "http", "tool")
+
+
+def load_spans(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _attribute(interval: tuple, descendants: list[dict]) -> dict[str, float]:
+    """Split ``interval`` by the highest-priority span kind active in each segment."""
+    start, end = interval
+    edges = {start, end}
+    for span in descendants:
+        edges.add(min(max(span["start"], start), end))
+        edges.add(min(max(span["start"] + span["duration"], start), end))
+    edges = sorted(edges)
+    totals = defaultdict(float)
+    for left, right in zip(edges, edges[1:]):
+        mid = (left + right) / 2
+        active = {s["kind"] for s in descendants if s["start"] <= mid < s["start"] + s["duration"]}
+        kind = next((k for k in CRITICAL_PATH_KINDS if k in active), "other")
+        totals[kind] += right - left
+    return totals
+
+
+def summarize(spans: list[dict]) -> list[dict]:
+    """Per trace, per iteration: wall time and its critical-path breakdown."""
+    children = defaultdict(list)
+    for span in spans:
+        children[span["parent"]].append(span)
+
+    def descendants(span_id: str) -> list[dict]:
+        found, stack = [], list(children.get(span_id, []))
+        while stack:
+            span = stack.pop()
+            found.append(span)
+            stack.extend(children.get(span["id"], []))
+        return found
+
+    summaries = []
+    for root in (s for s in spans if s["parent"] is None):
+        nodes = [s for s in descendants(root["id"]) if s["kind"] == "node"]
+        loop_start = min((n["start"] for n in nodes if n["attrs"].get("iteration") is not None), default=None)
+
+        groups = defaultdict(list)
+        for node in nodes:
+            iteration = node["attrs"].get("iteration")
+            if iteration is None:
+                iteration = "setup" if loop_start is None or node["start"] < loop_start else "report"
+            groups[iteration].append(node)
+        # Top-level work outside graph nodes (initial scrape, scanner) is setup.
+        loose = [s for s in children.get(root["id"], []) if s["kind"] != "node"]
+        groups["setup"].extend(loose)
+
+        iterations = []
+        for iteration, members in groups.items():
+            start = min(s["start"] for s in members)
+            end = max(s["start"] + s["duration"] for s in members)
+            below = [d for m in members for d in descendants(m["id"])] + [m for m in members if m["kind"] != "node"]
+            breakdown = _attribute((start, end), below)
+            by_node = defaultdict(float)
+            for member in members:
+                by_node[member["name"]] += member["duration"]
+            iterations.append({
+                "iteration": iteration,
+                "wall": end - start,
+                "breakdown": dict(breakdown),
+                "nodes": dict(by_node),
+                "llm_calls": sum(1 for d in below if d["kind"] == "llm"),
+                "http_calls": sum(1 for d in below if d["kind"] == "http"),
+            })
+
+        # Last adaptive rate per host (see limits.HostRate).
+        rates = {}
+        for span in sorted((d for d in descendants(root["id"]) if d["kind"] == "rate"), key=lambda s: s["start"]):
+            rates[span["name"]] = {"rate": span["attrs"].get("rate"), "decreases": span["attrs"].get("decreases", 0)}
+
+        order = {"setup": -1, "report": float("inf")}
+        iterations.sort(key=lambda it: order.get(it["iteration"], it["iteration"]))
+        summaries.append({
+            "trace": root["trace"],
+            "name": root["name"],
+            "attrs": root["attrs"],
+            "duration": root["duration"],
+            "status": root["status"],
+            "iterations": iterations,
+            "rates": rates,
+        })
+    return summaries
+
+
+def print_summary(summaries: list[dict]) -> None:
+    columns = (*CRITICAL_PATH_KINDS, "other")
+    for summary in summaries:
+        print(f"\n{'='*80}")
+        print(f"TRACE {summary['trace']}: {summary['name']} ({summary['status']}, {summary['duration']:.1f}s)")
+        for key, value in summary["attrs"].items():
+            print(f"  {key}: {value}")
+        print(f"{'='*80}")
+        print(f"  {'iteration':<10} {'wall':>8} " + " ".join(f"{c:>8}" for c in columns) + "   calls (llm/http)")
+        for it in summary["iterations"]:
+            cells = " ".join(f"{it['breakdown'].get(c, 0.0):>7.1f}s" for c in columns)
+            print(f"  {str(it['iteration']):<10} {it['wall']:>7.1f}s {cells}   {it['llm_calls']}/{it['http_calls']}")
+            slowest = sorted(it["nodes"].items(), key=lambda kv: -kv[1])[:3]
+            print("             slowest: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in slowest))
+        for host, rate in summary["rates"].items():
+            print(f"  rate {host}: {rate['rate']} req/s ({rate['decreases']} decreases)")
+        print(f"{'='*80}\n")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize a JSONL run trace")
+    parser.add_argument("trace", help="Trace file written with --trace / $TRACE_FILE")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summaries = summarize(load_spans(args.trace))
+    if args.json:
+        json.dump(summaries, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        print_summary(summaries)
+
+
+if __name__ == "__main__":
+    main()